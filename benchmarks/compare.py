@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.compare
+    ~~~~~~~~~~~~~~~~~~
+
+    Compare two result files written by benchmarks/run.py, typically from
+    two commits::
+
+        git checkout master
+        python benchmarks/run.py --output before.json
+        git checkout my-branch
+        python benchmarks/run.py --output after.json
+        python benchmarks/compare.py before.json after.json
+
+    A table with the old and new time of every benchmark is printed. The exit
+    status is 1 if a benchmark got slower by more than --threshold, so it can
+    be used in continuous integration.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import argparse
+import json
+import sys
+
+
+def _key(result):
+    return result['kind'], result['name'], result['size']
+
+
+def _describe(key):
+    kind, name, size = key
+    if kind == 'feed':
+        return "%s, %d episodes" % (name, size)
+    return name
+
+
+def compare(old, new):
+    """Pair up the results of two runs.
+
+    :param old: The results of the first run, as loaded from JSON.
+    :param new: The results of the second run.
+    :returns: List of (key, old seconds, new seconds, ratio) tuples for the
+        benchmarks found in both runs, where ratio is new divided by old.
+    """
+    old_results = dict((_key(r), r) for r in old['results'])
+    rows = []
+    for result in new['results']:
+        previous = old_results.get(_key(result))
+        if previous is None:
+            continue
+        old_seconds, new_seconds = previous['seconds'], result['seconds']
+        ratio = new_seconds / old_seconds if old_seconds else float('inf')
+        rows.append((_key(result), old_seconds, new_seconds, ratio))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compare two runs of benchmarks/run.py.')
+    parser.add_argument('old', help='results of the first run')
+    parser.add_argument('new', help='results of the second run')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='fail if a benchmark takes more than this '
+                             'many times as long (default: 1.2)')
+    args = parser.parse_args(argv)
+
+    with open(args.old) as fd:
+        old = json.load(fd)
+    with open(args.new) as fd:
+        new = json.load(fd)
+
+    print("%-36s %12s %12s %8s" % ("benchmark", "old (ms)", "new (ms)",
+                                   "change"))
+    slower = []
+    for key, old_seconds, new_seconds, ratio in compare(old, new):
+        flag = ""
+        if ratio > args.threshold:
+            slower.append(key)
+            flag = "  slower"
+        print("%-36s %12.4f %12.4f %7.2fx%s" % (
+            _describe(key), old_seconds * 1000, new_seconds * 1000, ratio,
+            flag))
+    print("old: %s (Python %s)" % (old.get('commit'), old.get('python')))
+    print("new: %s (Python %s)" % (new.get('commit'), new.get('python')))
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.import_time
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Measure how long ``import podgen`` takes in a fresh interpreter, and check
+    that the slow dependencies are only imported when they're used.
+
+    Run it from the root of the repository::
+
+        python benchmarks/import_time.py --runs 20 --max-ms 100
+
+    The results are printed as JSON. The exit status is 1 if a lazily
+    imported module was imported, or if the median time exceeds --max-ms.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+LAZY_MODULES = ['requests', 'tinytag', 'dateutil.parser', 'sqlite3',
+                'brotli', 'podgen.loader', 'podgen.media_cache',
+                'podgen.batch', 'podgen.websub', 'podgen.server']
+"""Modules which ``import podgen`` must not import."""
+
+_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import podgen
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, [m for m in %r if m in sys.modules]]))
+""" % (LAZY_MODULES,)
+
+
+def measure_once():
+    """Import podgen in a new interpreter.
+
+    :returns: Tuple with the seconds spent importing, and the list of lazily
+        imported modules which were imported anyway.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + [p for p in [env.get('PYTHONPATH')] if p])
+    output = subprocess.check_output([sys.executable, '-c', _SCRIPT],
+                                     env=env)
+    seconds, imported = json.loads(output.decode('ascii'))
+    return seconds, imported
+
+
+def measure(runs):
+    """Import podgen ``runs`` times, each in a new interpreter.
+
+    :returns: Dictionary with the results, ready to be dumped as JSON.
+    """
+    times = []
+    imported = set()
+    for _ in range(runs):
+        seconds, modules = measure_once()
+        times.append(seconds * 1000)
+        imported.update(modules)
+    times.sort()
+    return {
+        'benchmark': 'import_time',
+        'python': sys.version.split()[0],
+        'runs': runs,
+        'median_ms': times[len(times) // 2],
+        'min_ms': times[0],
+        'max_ms': times[-1],
+        'eagerly_imported': sorted(imported),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Measure the time it takes to import podgen.')
+    parser.add_argument('--runs', type=int, default=10,
+                        help='number of interpreters to start (default: 10)')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if the median time is above this')
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    print(json.dumps(result, indent=2, sort_keys=True))
+    if result['eagerly_imported']:
+        return 1
+    if args.max_ms is not None and result['median_ms'] > args.max_ms:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
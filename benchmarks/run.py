@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.run
+    ~~~~~~~~~~~~~~
+
+    Measure the time and memory it takes to create, generate and write
+    feeds of synthetic podcasts with different numbers of episodes, along with
+    the time taken by the small functions called for every episode.
+
+    Run it from the root of the repository, optionally with the sizes to
+    try::
+
+        python benchmarks/run.py --output before.json
+        python benchmarks/run.py --sizes 10,1000,100000,1000000
+
+    Nothing is downloaded, so it runs offline. The results are written as
+    JSON, which benchmarks/compare.py can compare.
+
+    Each feed is measured in these stages:
+
+    construct
+        Creating the Podcast, Episode, Media and Person objects. The random
+        values they're given are made before this stage.
+    render
+        Creating the lxml tree with :meth:`.Podcast._create_rss`.
+    serialize_cold
+        Generating the feed bytes with no cached items.
+    serialize_warm
+        Generating the feed bytes again, using the cached items.
+    write
+        Writing the feed to a file with :meth:`.Podcast.rss_file`.
+
+    The time of a stage is the best of a few runs for small feeds, and of one
+    run for large feeds. Memory is measured in a separate run, since tracing
+    it slows Python down: ``peak_traced_bytes`` is how much more memory Python
+    allocated at the most during the stage (lxml's own memory isn't traced),
+    and ``max_rss_bytes`` is the highest memory use of the whole process so
+    far.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytz
+from lxml import etree
+
+from podgen import Media, Category
+from podgen.util import formatRFC2822
+import podgen.util
+
+from synthetic import create_podcast, create_podcast_data, build_podcast
+
+DEFAULT_SIZES = [10, 1000, 100000]
+FULL_SIZES = DEFAULT_SIZES + [1000000]
+
+STAGES = ['construct', 'render', 'serialize_cold', 'serialize_warm',
+          'write']
+
+
+def _clear_item_caches(podcast):
+    for episode in podcast.episodes:
+        episode._rss_cache = None
+
+
+def _run_stages(data, filename, measure):
+    """Run every stage once for a new podcast made from ``data``, calling
+    ``measure(stage, function)`` to run each."""
+    podcast = measure('construct', lambda: build_podcast(data))
+    measure('render', podcast._create_rss)
+    _clear_item_caches(podcast)
+    measure('serialize_cold', podcast.rss_bytes)
+    measure('serialize_warm', podcast.rss_bytes)
+    measure('write', lambda: podcast.rss_file(filename))
+
+
+def time_stages(data, filename, repeat):
+    """Return the best time in seconds of each stage over ``repeat`` runs."""
+    best = {}
+
+    def measure(stage, function):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best[stage] = min(best.get(stage, seconds), seconds)
+        return result
+
+    for _ in range(repeat):
+        _run_stages(data, filename, measure)
+    return best
+
+
+def _max_rss():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes, except on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def measure_memory(data, filename):
+    """Return (peak traced bytes, max RSS bytes) of each stage."""
+    memory = {}
+
+    def measure(stage, function):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        memory[stage] = (peak, _max_rss())
+        return result
+
+    _run_stages(data, filename, measure)
+    return memory
+
+
+def _time_call(function, minimum=0.2):
+    """Return the seconds one call of ``function`` takes, called as many
+    times as needed to take at least ``minimum`` seconds in total."""
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        seconds = timer.timeit(number)
+        if seconds >= minimum:
+            break
+        number *= 10
+    return min([seconds] + [timer.timeit(number) for _ in range(2)]) / number
+
+
+def time_functions():
+    """Return the seconds per call of the functions which are called for
+    every episode."""
+    podcast = create_podcast(100)
+    episodes = list(podcast.episodes)
+    start = datetime.datetime(2016, 1, 1, tzinfo=pytz.utc)
+    dates = [start + datetime.timedelta(hours=i) for i in range(1000)]
+
+    def format_uncached():
+        podgen.util._rfc2822_cache.clear()
+        for date in dates:
+            formatRFC2822(date)
+
+    results = {
+        'rss_entry': _time_call(
+            lambda: [e.rss_entry() for e in episodes]) / len(episodes),
+        'Media.__init__': _time_call(lambda: Media(
+            "https://example.com/episodes/1.mp3", 123456789)),
+        'Category.__init__': _time_call(
+            lambda: Category("Technology", "Podcasting")),
+        'formatRFC2822': _time_call(lambda: formatRFC2822(start)),
+        'formatRFC2822_uncached': _time_call(format_uncached) / len(dates),
+    }
+    return results
+
+
+def _get_commit():
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=_ROOT,
+            stderr=open(os.devnull, 'w'))
+        return output.decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat=None, memory=True, log=None):
+    """Run the benchmarks.
+
+    :param sizes: The numbers of episodes to try.
+    :type sizes: list of int
+    :param repeat: The number of times to run the stages of each size, or
+        None to run small feeds 5 times and large feeds once.
+    :type repeat: int or None
+    :param memory: Whether to measure the memory use too.
+    :type memory: bool
+    :param log: File to write progress to.
+    :returns: Dictionary with the results, ready to be dumped as JSON.
+    """
+    results = []
+    directory = tempfile.mkdtemp(prefix='podgen-benchmark-')
+    filename = os.path.join(directory, 'feed.rss')
+    try:
+        for size in sizes:
+            runs = repeat or (5 if size <= 1000 else 1)
+            # The random values are made up front, so only PodGen is timed
+            data = create_podcast_data(size)
+            times = time_stages(data, filename, runs)
+            usage = measure_memory(data, filename) if memory else {}
+            del data
+            for stage in STAGES:
+                peak, max_rss = usage.get(stage, (None, None))
+                results.append({
+                    'kind': 'feed',
+                    'name': stage,
+                    'size': size,
+                    'seconds': times[stage],
+                    'peak_traced_bytes': peak,
+                    'max_rss_bytes': max_rss,
+                })
+                if log is not None:
+                    log.write("%8d episodes  %-15s %10.4f s\n"
+                              % (size, stage, times[stage]))
+    finally:
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+        os.rmdir(directory)
+
+    for name, seconds in sorted(time_functions().items()):
+        results.append({'kind': 'function', 'name': name, 'size': None,
+                        'seconds': seconds})
+        if log is not None:
+            log.write("%-34s %10.2f us\n" % (name, seconds * 1e6))
+
+    return {
+        'commit': _get_commit(),
+        'date': datetime.datetime.now(pytz.utc).isoformat(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'lxml': '.'.join(str(i) for i in etree.LXML_VERSION),
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Measure the performance of podgen.')
+    parser.add_argument('--sizes', default=None,
+                        help='comma-separated numbers of episodes '
+                             '(default: %s)'
+                             % ",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument('--full', action='store_true',
+                        help='include a feed with a million episodes')
+    parser.add_argument('--repeat', type=int, default=None,
+                        help='number of runs of each size')
+    parser.add_argument('--no-memory', action='store_true',
+                        help="don't measure the memory use")
+    parser.add_argument('--output', default=None,
+                        help='file to write the JSON results to '
+                             '(default: standard output)')
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        sizes = [int(s) for s in args.sizes.split(',')]
+    else:
+        sizes = FULL_SIZES if args.full else DEFAULT_SIZES
+    result = run(sizes, args.repeat, not args.no_memory, log=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(result, fd, indent=2, sort_keys=True)
+    else:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
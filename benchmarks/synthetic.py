@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.synthetic
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Create podcasts with made-up, but realistic, episodes for the benchmarks.
+    The same seed always gives the same podcast.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import datetime
+import random
+
+import pytz
+
+from podgen import Podcast, Episode, Media, Person, Category
+
+_WORDS = ("podcast episode interview news week review special guest talk "
+          "music science history story update live show season finale "
+          "question answer future past python code open source community "
+          "feed audio video long short deep dive").split()
+
+_MEDIA_TYPES = [("mp3", 0.8), ("m4a", 0.15), ("mp4", 0.05)]
+
+_START = datetime.datetime(2016, 1, 1, 12, tzinfo=pytz.utc)
+
+
+def _words(rng, low, high):
+    return " ".join(rng.choice(_WORDS)
+                    for _ in range(rng.randint(low, high)))
+
+
+def _pick(rng, weighted):
+    x = rng.random()
+    for value, weight in weighted:
+        x -= weight
+        if x < 0:
+            return value
+    return weighted[-1][0]
+
+
+def create_episode_data(rng, number, date):
+    """Return the attributes of one episode as plain values, filled in the
+    way they typically are: all have a title, summary and media, most have
+    an id, and fewer have the optional fields."""
+    extension = _pick(rng, _MEDIA_TYPES)
+    # File sizes and durations vary a lot between shows, and within one
+    seconds = int(rng.lognormvariate(7.8, 0.5))
+    data = {
+        'title': "%d: %s" % (number, _words(rng, 2, 10).title()),
+        'summary': "<p>%s</p>" % _words(rng, 20, 300),
+        'media': ("https://media.example.com/episodes/%d.%s"
+                  % (number, extension),
+                  seconds * rng.choice([8000, 16000, 24000]), seconds),
+        'publication_date': date,
+    }
+    if rng.random() < 0.7:
+        data['id'] = "https://example.com/episodes/%d" % number
+    if rng.random() < 0.5:
+        data['link'] = "https://example.com/episodes/%d.html" % number
+    if rng.random() < 0.4:
+        data['long_summary'] = "<p>%s</p>" % _words(rng, 200, 1500)
+    if rng.random() < 0.3:
+        data['subtitle'] = _words(rng, 3, 8)
+    if rng.random() < 0.3:
+        data['authors'] = [(_words(rng, 2, 2).title(),
+                            "guest%d@example.com" % number)]
+    if rng.random() < 0.2:
+        data['image'] = "https://example.com/images/%d.jpg" % number
+    if rng.random() < 0.1:
+        data['explicit'] = rng.random() < 0.5
+    return data
+
+
+def create_podcast_data(episodes, seed=0):
+    """Return the attributes of a podcast with the given number of episodes
+    as plain values, for :func:`build_podcast`. The episodes are published
+    about once every three days, with the newest first.
+
+    :param episodes: The number of episodes.
+    :type episodes: int
+    :param seed: The seed of the random values.
+    :type seed: int
+    """
+    rng = random.Random(seed)
+    date = _START
+    episode_data = []
+    for number in range(episodes, 0, -1):
+        episode_data.append(create_episode_data(rng, number, date))
+        date -= datetime.timedelta(seconds=rng.randint(86400, 5 * 86400))
+    description = "A podcast made up for benchmarking. " + \
+        _words(rng, 20, 40)
+    return description, episode_data
+
+
+def build_podcast(data):
+    """Create the Podcast with the attributes from
+    :func:`create_podcast_data`.
+
+    :rtype: :class:`~podgen.Podcast`
+    """
+    description, episode_data = data
+    p = Podcast(
+        name="Synthetic Podcast",
+        website="https://example.com",
+        description=description,
+        explicit=False,
+        language="en-US",
+        authors=[Person("Jane Doe", "jane@example.com")],
+        owner=Person("Jane Doe", "jane@example.com"),
+        category=Category("Technology", "Podcasting"),
+        image="https://example.com/cover.jpg",
+        feed_url="https://example.com/feed.rss",
+        last_updated=_START,
+    )
+    episodes = []
+    for values in episode_data:
+        values = dict(values)
+        url, size, seconds = values['media']
+        values['media'] = Media(url, size,
+                                duration=datetime.timedelta(seconds=seconds))
+        if 'authors' in values:
+            values['authors'] = [Person(name, email)
+                                 for name, email in values['authors']]
+        episodes.append(Episode(**values))
+    p.episodes.extend(episodes)
+    return p
+
+
+def create_podcast(episodes, seed=0):
+    """Create a podcast with the given number of episodes.
+
+    :param episodes: The number of episodes.
+    :type episodes: int
+    :param seed: The seed of the random values.
+    :type seed: int
+    :rtype: :class:`~podgen.Podcast`
+    """
+    return build_podcast(create_podcast_data(episodes, seed))
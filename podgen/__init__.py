@@ -10,10 +10,49 @@
     :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
     :license: FreeBSD and LGPL, see license.* for more details.
 """
+import sys
+
 from .podcast import Podcast
 from .episode import Episode
+from .episode_collection import EpisodeCollection
 from .media import Media
 from .person import Person
 from .not_supported_by_itunes_warning import NotSupportedByItunesWarning
 from .category import Category
 from .util import htmlencode
+from .render_profile import RenderProfile
+
+# These are imported the first time they're used, so scripts which only
+# generate feeds start faster
+_LAZY_EXPORTS = {
+    'MediaCache': 'media_cache',
+    'render_many': 'batch',
+    'diff_episodes': 'websub',
+    'HubNotifier': 'websub',
+    'FeedServer': 'server',
+}
+
+__all__ = ['Podcast', 'Episode', 'EpisodeCollection', 'Media', 'Person',
+           'NotSupportedByItunesWarning', 'Category', 'htmlencode',
+           'RenderProfile'] + \
+    sorted(_LAZY_EXPORTS)
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name not in _LAZY_EXPORTS:
+            raise AttributeError("module %r has no attribute %r"
+                                 % (__name__, name))
+        import importlib
+        module = importlib.import_module('.' + _LAZY_EXPORTS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY_EXPORTS))
+else:
+    # Module level __getattr__ isn't supported
+    from .media_cache import MediaCache
+    from .batch import render_many
+    from .websub import diff_episodes, HubNotifier
+    from .server import FeedServer
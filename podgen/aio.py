@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.aio
+    ~~~~~~~~~~
+
+    This file contains the coroutines behind the asyncio methods of Media and
+    Podcast, like :meth:`.Media.acreate_from_server_response` and
+    :meth:`.Podcast.arss_file`, and the ASGI application returned by
+    :meth:`.FeedServer.asgi_app`. It requires Python 3.5 or newer.
+
+    Network requests are made by a shared pool of threads using requests,
+    with connections kept alive and reused for each host. Generating and
+    writing feeds is done in the event loop's default executor, unless
+    another executor is given. Either way, the event loop is never blocked.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from podgen.media import _HostSessions
+
+POOL_SIZE = 32
+"""The number of network requests which can be made at the same time, and
+the number of connections kept alive for each host. Change it before the
+first request is made."""
+
+_pool_lock = threading.Lock()
+_io_executor = None
+_sessions = None
+
+
+def _get_pool():
+    global _io_executor, _sessions
+    with _pool_lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(max_workers=POOL_SIZE)
+            _sessions = _HostSessions(POOL_SIZE)
+        return _io_executor, _sessions
+
+
+def _session_for(media_or_url, sessions):
+    """Use the Media's own Session if it has been given one, and the shared
+    Session for the host otherwise."""
+    if isinstance(media_or_url, str):
+        return sessions.get(media_or_url)
+    own_session = media_or_url.requests_session
+    if own_session is requests:
+        return sessions.get(media_or_url.url)
+    return own_session
+
+
+# asyncio.get_running_loop is new in Python 3.7. Before that,
+# get_event_loop returns the running loop when called from a coroutine.
+_get_running_loop = getattr(asyncio, 'get_running_loop',
+                            asyncio.get_event_loop)
+
+
+async def _run_io(function, *args, **kwargs):
+    executor, _ = _get_pool()
+    loop = _get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(function, *args, **kwargs))
+
+
+async def create_from_server_response(cls, url, size=None, type=None,
+                                      duration=None, requests_=None,
+                                      cache=None):
+    """See :meth:`.Media.acreate_from_server_response`."""
+    _, sessions = _get_pool()
+    return await _run_io(cls.create_from_server_response, url, size=size,
+                         type=type, duration=duration,
+                         requests_=requests_ or _session_for(url, sessions),
+                         cache=cache)
+
+
+async def download(media, destination):
+    """See :meth:`.Media.adownload`."""
+    _, sessions = _get_pool()
+    return await _run_io(media._download, destination,
+                         _session_for(media, sessions))
+
+
+async def fetch_duration(media, probe=False, cache=None):
+    """See :meth:`.Media.afetch_duration`."""
+    _, sessions = _get_pool()
+    return await _run_io(media._fetch_duration, probe, cache,
+                         _session_for(media, sessions))
+
+
+async def rss_file(podcast, filename, executor=None, **options):
+    """See :meth:`.Podcast.arss_file`."""
+    loop = _get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(
+        podcast.rss_file, filename, **options))
+
+
+async def _read_body(receive):
+    """Read the rest of the request, which the feeds don't use."""
+    while True:
+        message = await receive()
+        if message["type"] != "http.request" or \
+                not message.get("more_body", False):
+            return
+
+
+def asgi_app(server):
+    """See :meth:`.FeedServer.asgi_app`."""
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            raise ValueError("Unsupported ASGI scope type %s"
+                             % scope["type"])
+        await _read_body(receive)
+
+        headers = {}
+        for name, value in scope.get("headers", ()):
+            headers[name.decode("latin-1").lower()] = value.decode("latin-1")
+        path = scope["path"] or "/"
+        arguments = (scope["method"], path, headers)
+        if server._is_current(path):
+            response = server.respond(*arguments)
+        else:
+            loop = _get_running_loop()
+            response = await loop.run_in_executor(
+                None, functools.partial(server.respond, *arguments))
+        status, response_headers, body = response
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1"))
+                        for name, value in response_headers],
+        })
+        await send({"type": "http.response.body", "body": body})
+    return app
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.batch
+    ~~~~~~~~~~~~
+
+    This file contains render_many, which generates many feeds at once using
+    multiple processes.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import collections
+import os
+import time
+import traceback
+
+from future.utils import iteritems
+
+from podgen.util import _write_file_atomically
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+RenderResult = collections.namedtuple(
+    "RenderResult", ["filename", "seconds", "error", "traceback"])
+"""The outcome of rendering one feed with :func:`~podgen.render_many`.
+
+``filename`` is the path of the file which was (or would have been) written,
+and ``seconds`` the time spent creating and writing the feed. ``error`` is
+the exception which was raised, and ``traceback`` its formatted traceback, or
+both are :obj:`None` if the feed was written successfully.
+"""
+
+
+def _render_one(job):
+    """Create and write one feed. Runs in a worker process."""
+    filename, podcast, options = job
+    start = _clock()
+    try:
+        if callable(podcast):
+            # A factory, which lets the workers create the podcasts too
+            podcast = podcast()
+        _write_file_atomically(filename, podcast._rss_chunks(**options))
+    except Exception as e:
+        return RenderResult(filename, _clock() - start, e,
+                            traceback.format_exc())
+    return RenderResult(filename, _clock() - start, None, None)
+
+
+def render_many(podcasts, out_dir, workers=None, minimize=False,
+                encoding='UTF-8', xml_declaration=True):
+    """Generate many feeds and write them to files in ``out_dir``, using
+    multiple processes.
+
+    The podcasts are pickled and sent to the worker processes, which create
+    the RSS and write it to file themselves. Instead of a
+    :class:`~podgen.Podcast`, you may give a function which returns one. It
+    is called in the worker process, so the work of creating the Podcast
+    objects is spread out too. The function must be possible to pickle, so it
+    must be defined at the top level of a module (or be a
+    :func:`functools.partial` of such a function).
+
+    A feed which fails doesn't stop the others from being written. Instead,
+    the exception is reported in the returned list. Each file is written to
+    a temporary file first, which is renamed once complete.
+
+    Example::
+
+        >>> import podgen
+        >>> results = podgen.render_many({
+        ...     "news.rss": news_podcast,
+        ...     "sports.rss": sports_podcast,
+        ... }, "/srv/www/feeds")
+        >>> for result in results:
+        ...     if result.error:
+        ...         print("%s failed: %s" % (result.filename, result.error))
+
+    :param podcasts: Which podcasts to write, and where. Either a dictionary
+        or a sequence of (filename, podcast) pairs. The filenames are relative
+        to ``out_dir``, and each podcast is either a
+        :class:`~podgen.Podcast` or a function which returns one.
+    :type podcasts: :obj:`dict` or :obj:`list` of :obj:`tuple`
+    :param out_dir: The directory to write the feeds to.
+    :type out_dir: str
+    :param workers: The number of processes to use. Defaults to the number of
+        processors.
+    :type workers: int or None
+    :param minimize: Set to True to disable splitting the feeds into multiple
+        lines and adding properly indentation, saving bytes at the cost of
+        readability (default: False).
+    :type minimize: bool
+    :param encoding: Encoding used in the XML files (default: UTF-8).
+    :type encoding: str
+    :param xml_declaration: Whether an XML declaration should be added to
+        the output (default: True).
+    :type xml_declaration: bool
+    :returns: One :class:`~podgen.batch.RenderResult` for each feed, in the
+        same order as ``podcasts``.
+    :rtype: :obj:`list` of :class:`~podgen.batch.RenderResult`
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if isinstance(podcasts, dict):
+        podcasts = iteritems(podcasts)
+    options = dict(minimize=minimize, encoding=encoding,
+                   xml_declaration=xml_declaration)
+    jobs = [(os.path.join(out_dir, filename), podcast, options)
+            for filename, podcast in podcasts]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_render_one, job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The podcast couldn't be pickled, the worker died, or the
+                # worker's exception couldn't be sent back
+                results.append(RenderResult(job[0], None, e,
+                                            traceback.format_exc()))
+    return results
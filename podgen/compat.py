@@ -3,5 +3,8 @@
 import sys
 if sys.version_info[0] >= 3:
     string_types = str
+    from urllib.parse import urlparse, quote
 else:
     string_types = basestring
+    from urlparse import urlparse
+    from urllib import quote
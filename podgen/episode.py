@@ -12,16 +12,20 @@ import warnings
 
 from lxml import etree
 from datetime import datetime
-import dateutil.parser
 import dateutil.tz
 
 from podgen.not_supported_by_itunes_warning import NotSupportedByItunesWarning
-from podgen.util import formatRFC2822, listToHumanreadableStr
+from podgen.util import formatRFC2822, listToHumanreadableStr, \
+    _serialize_item, _parse_date_string
 from podgen.compat import string_types
 from builtins import str
 from future.utils import iteritems
 
 
+_INDEXED_ATTRIBUTES = frozenset(['id', 'media', 'publication_date'])
+"""Attributes which EpisodeCollection must know about when they change."""
+
+
 class Episode(object):
     """Class representing an episode in a podcast. Corresponds to an RSS Item.
 
@@ -59,6 +63,12 @@ class Episode(object):
         >>> episode = p.add_episode(podgen.Episode())
 
 
+    The serialized item is cached by the episode and reused until you change
+    it, so regenerating a feed only renders the episodes which have changed.
+    Changes are detected when you assign to an attribute, and when you modify
+    :attr:`.authors` or the :attr:`.media` in place. If you modify other
+    objects in place, assign them to the episode again afterwards.
+
     .. seealso::
 
        :doc:`/user/basic_usage_guide/part_2`
@@ -66,6 +76,12 @@ class Episode(object):
     """
 
     def __init__(self, **kwargs):
+        self._rss_cache = None
+        """Serialized item elements, keyed by how they were serialized."""
+        self._collections = None
+        """The EpisodeCollections which index this episode, by their id().
+        Created by the first collection the episode is added to."""
+
         # RSS
         self.__authors = []
         self.summary = None
@@ -189,6 +205,94 @@ class Episode(object):
                 raise TypeError("Keyword argument %s (with value %s) not "
                                 "recognized!" % (attribute, value))
 
+    def __setattr__(self, name, value):
+        super(Episode, self).__setattr__(name, value)
+        if not name.startswith('_'):
+            # Any public attribute may affect the rendered item. Private
+            # attributes are only changed through the public ones.
+            object.__setattr__(self, '_rss_cache', None)
+            collections = self.__dict__.get('_collections')
+            if collections:
+                indexed = name in _INDEXED_ATTRIBUTES
+                for collection in list(collections.values()):
+                    if indexed:
+                        collection._episode_changed(self)
+                    else:
+                        collection._touch()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Weak references can't be pickled, and the collections must add
+        # the unpickled episode themselves anyway
+        state.pop('_collections', None)
+        state['_rss_cache'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._collections = None
+
+    def _get_rss_stamp(self):
+        """Return the values of the mutable objects used by :meth:`.rss_entry`,
+        so changes made to them in place can be detected."""
+        media = self.__media
+        if media is None:
+            media_values = None
+        else:
+            media_values = (media.url, media.size, media.type,
+                            getattr(media, 'duration', None))
+        authors_values = tuple((a.name, a.email) for a in self.__authors)
+        return media_values, authors_values
+
+    def _rss_entry_bytes(self, nsmap, minimize=False, encoding='UTF-8'):
+        """Return the item element created by :meth:`.rss_entry`, serialized
+        the same way it would be in a feed with the given namespaces.
+
+        The result is cached until this episode is changed.
+
+        :param nsmap: The namespaces declared by the feed.
+        :type nsmap: dict
+        :param minimize: Whether the feed is minimized.
+        :type minimize: bool
+        :param encoding: The encoding used by the feed.
+        :type encoding: str
+        :returns: The encoded item, as found in the feed.
+        :rtype: bytes
+        """
+        data, slot = self._lookup_rss_entry_bytes(nsmap, minimize, encoding)
+        if data is None:
+            data = _serialize_item(self.rss_entry(), nsmap, minimize, encoding)
+            self._store_rss_entry_bytes(slot, data)
+        return data
+
+    def _lookup_rss_entry_bytes(self, nsmap, minimize, encoding):
+        """Look for a cached copy of the serialized item.
+
+        :returns: Tuple with the cached bytes, or :obj:`None` if they must be
+            created, and the slot to give :meth:`._store_rss_entry_bytes`
+            along with the bytes once they have been created.
+        """
+        key = (tuple(iteritems(nsmap)), minimize, encoding)
+        stamp = self._get_rss_stamp()
+        cache = self._rss_cache
+        if cache is None:
+            # A change made while we render replaces this dictionary, so we
+            # never store an outdated item for later use.
+            cache = {}
+            self._rss_cache = cache
+        else:
+            cached = cache.get(key)
+            if cached is not None and cached[0] == stamp:
+                return cached[1], None
+        return None, (cache, key, stamp)
+
+    @staticmethod
+    def _store_rss_entry_bytes(slot, data):
+        """Cache the serialized item, which was found to be missing by
+        :meth:`._lookup_rss_entry_bytes`."""
+        cache, key, stamp = slot
+        cache[key] = (stamp, data)
+
     def rss_entry(self):
         """Create an RSS item using lxml's etree and return it.
 
@@ -381,7 +485,7 @@ class Episode(object):
     def publication_date(self, publication_date):
         if publication_date is not None:
             if isinstance(publication_date, string_types):
-                publication_date = dateutil.parser.parse(publication_date)
+                publication_date = _parse_date_string(publication_date)
             if not isinstance(publication_date, datetime):
                 raise ValueError('Invalid datetime format')
             if publication_date.tzinfo is None:
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.episode_collection
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This file contains the EpisodeCollection class, which is the list used to
+    hold the episodes of a podcast.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import bisect
+import itertools
+import threading
+import warnings
+import weakref
+
+_change_counter = itertools.count(1)
+"""Shared source of increasing numbers, used to tell when podcasts and
+episode collections were last changed."""
+
+
+def _get_guid(episode):
+    """Return the GUID the episode will have in the feed, or :obj:`None`."""
+    guid = getattr(episode, 'id', None)
+    if guid:
+        return guid
+    media = getattr(episode, 'media', None)
+    if guid is None and media is not None:
+        return media.url
+    return None
+
+
+class _Snapshot(list):
+    """A plain list of episodes, which also tells the latest publication
+    date among them."""
+    latest_publication_date = None
+
+
+class EpisodeCollection(list):
+    """List of episodes which keeps track of their GUIDs and publication
+    dates, so episodes can be looked up by GUID and the newest episodes can be
+    found without going through all of them.
+
+    This is the type of :attr:`.Podcast.episodes`. It can be used just like
+    a list, and the episodes keep the order you give them. The extra methods
+    use indexes which are kept up to date as episodes are added and removed,
+    and as their :attr:`~.Episode.id`, :attr:`~.Episode.media` and
+    :attr:`~.Episode.publication_date` are assigned to.
+
+    .. note::
+
+        Changing the URL of an episode's media in place is not noticed, so
+        assign the media to the episode again if its URL is used as GUID.
+
+    A warning is given when an episode is added whose GUID is already used by
+    another episode in the collection.
+
+    Example::
+
+        >>> from podgen import Podcast, Episode
+        >>> p = Podcast()
+        >>> p.episodes.append(Episode(id="http://example.org/ep/1"))
+        >>> p.episodes.get("http://example.org/ep/1")
+        <podgen.episode.Episode object at 0x...>
+    """
+
+    def __init__(self, episodes=()):
+        super(EpisodeCollection, self).__init__()
+        self._entries = {}
+        """Maps id() of each episode to [count, guid, sort key] for it."""
+        self._guids = {}
+        """Maps GUIDs to the list of episodes which use them."""
+        self._dates = []
+        """Sorted list of (publication date, sequence number) tuples."""
+        self._dated_episodes = {}
+        """Maps sequence numbers in self._dates to their episodes."""
+        self._positions = {}
+        """Maps id() of each episode to the index of its first reference in
+        the list plus self._position_base, or :obj:`None` when it must be
+        built again."""
+        self._position_base = 0
+        """Lowered by one when an episode is inserted at the front, which
+        moves all the others back without changing self._positions."""
+        self._counter = itertools.count()
+        self._last_change = 0
+        """Number from _change_counter, taken when this collection or one of
+        its episodes was last changed."""
+        self._lock = threading.RLock()
+        """Held while the collection is changed or copied."""
+        self.extend(episodes)
+
+    def __reduce__(self):
+        return self.__class__, (self.snapshot(),)
+
+    # Methods for keeping the indexes up to date
+
+    def _touch(self):
+        """Record that this collection or one of its episodes changed."""
+        self._last_change = next(_change_counter)
+
+    def _add(self, episode, stacklevel=3):
+        self._touch()
+        entry = self._entries.get(id(episode))
+        if entry is not None:
+            # Already indexed, this is just another reference to it
+            entry[0] += 1
+            return
+        guid = _get_guid(episode)
+        key = None
+        publication_date = getattr(episode, 'publication_date', None)
+        if publication_date is not None:
+            key = (publication_date, next(self._counter))
+            bisect.insort(self._dates, key)
+            self._dated_episodes[key[1]] = episode
+        if guid is not None:
+            same_guid = self._guids.setdefault(guid, [])
+            if same_guid:
+                warnings.warn("More than one episode has the GUID %s" % guid,
+                              stacklevel=stacklevel)
+            same_guid.append(episode)
+        self._entries[id(episode)] = [1, guid, key]
+        if hasattr(episode, '_collections'):
+            listeners = episode._collections
+            if listeners is None:
+                listeners = weakref.WeakValueDictionary()
+                episode._collections = listeners
+            listeners[id(self)] = self
+
+    def _discard(self, episode, all_references=False):
+        self._touch()
+        entry = self._entries.get(id(episode))
+        if entry is None:
+            return
+        entry[0] -= 1
+        if entry[0] > 0 and not all_references:
+            return
+        self._unindex(episode, entry)
+        del self._entries[id(episode)]
+        listeners = getattr(episode, '_collections', None)
+        if listeners is not None:
+            listeners.pop(id(self), None)
+
+    def _unindex(self, episode, entry):
+        guid, key = entry[1], entry[2]
+        if key is not None:
+            i = bisect.bisect_left(self._dates, key)
+            del self._dates[i]
+            del self._dated_episodes[key[1]]
+        if guid is not None:
+            same_guid = self._guids[guid]
+            same_guid.remove(episode)
+            if not same_guid:
+                del self._guids[guid]
+
+    def _episode_changed(self, episode):
+        """Called by episodes in this collection when their id, media or
+        publication date is assigned to."""
+        with self._lock:
+            entry = self._entries.get(id(episode))
+            if entry is None:
+                return
+            count = entry[0]
+            self._discard(episode, all_references=True)
+            # Warn about the code which assigned to the episode
+            self._add(episode, stacklevel=4)
+            self._entries[id(episode)][0] = count
+
+    def _replace_items(self, removed, added):
+        for episode in removed:
+            self._discard(episode)
+        for episode in added:
+            self._add(episode, stacklevel=4)
+
+    def _get_position(self, episode):
+        """Return the index of the first reference to ``episode``, which must
+        be in the list. Must be called with self._lock held."""
+        if self._positions is None:
+            positions = {}
+            for i, e in enumerate(self):
+                positions.setdefault(id(e), i)
+            self._positions = positions
+            self._position_base = 0
+        return self._positions[id(episode)] - self._position_base
+
+    def _note_position(self, episode, index):
+        """Update self._positions after ``episode`` was put at ``index``."""
+        positions = self._positions
+        if positions is not None:
+            index += self._position_base
+            known = positions.get(id(episode))
+            if known is None or known > index:
+                positions[id(episode)] = index
+
+    def _forget_position(self, episode, index):
+        """Update self._positions after ``episode`` at ``index`` was removed
+        from the end of the list or replaced, and unindexed."""
+        positions = self._positions
+        index += self._position_base
+        if positions is not None and positions.get(id(episode)) == index:
+            if id(episode) in self._entries:
+                # There's another reference to it later in the list
+                self._positions = None
+            else:
+                del positions[id(episode)]
+
+    # Overridden list methods. They hold the lock so snapshots are consistent
+
+    def append(self, episode):
+        with self._lock:
+            super(EpisodeCollection, self).append(episode)
+            self._add(episode)
+            self._note_position(episode, len(self) - 1)
+
+    def extend(self, episodes):
+        episodes = list(episodes)
+        with self._lock:
+            start = len(self)
+            super(EpisodeCollection, self).extend(episodes)
+            for i, episode in enumerate(episodes):
+                self._add(episode)
+                self._note_position(episode, start + i)
+
+    def __iadd__(self, episodes):
+        self.extend(episodes)
+        return self
+
+    def __imul__(self, n):
+        with self._lock:
+            if n <= 0:
+                self.clear()
+            else:
+                self.extend(list(self) * (n - 1))
+        return self
+
+    def insert(self, index, episode):
+        with self._lock:
+            length = len(self)
+            super(EpisodeCollection, self).insert(index, episode)
+            self._add(episode)
+            if index < 0:
+                index = max(0, index + length)
+            if index >= length:
+                self._note_position(episode, length)
+            elif index == 0:
+                # The others move back one step. Lowering the base keeps
+                # their positions valid, so feeds which put the newest
+                # episode first don't need them built again
+                self._position_base -= 1
+                self._note_position(episode, 0)
+            else:
+                # The episodes after it have moved
+                self._positions = None
+
+    def remove(self, episode):
+        with self._lock:
+            del self[self.index(episode)]
+
+    def pop(self, index=-1):
+        with self._lock:
+            episode = super(EpisodeCollection, self).pop(index)
+            self._discard(episode)
+            self._removed_at(episode, index)
+        return episode
+
+    def _removed_at(self, episode, index):
+        """Update self._positions after ``episode`` at ``index`` was
+        removed."""
+        if index == -1 or index == len(self):
+            self._forget_position(episode, len(self))
+        else:
+            # The episodes after it have moved
+            self._positions = None
+
+    def clear(self):
+        del self[:]
+
+    def sort(self, *args, **kwargs):
+        with self._lock:
+            super(EpisodeCollection, self).sort(*args, **kwargs)
+            self._touch()
+            self._positions = None
+
+    def reverse(self):
+        with self._lock:
+            super(EpisodeCollection, self).reverse()
+            self._touch()
+            self._positions = None
+
+    def __setitem__(self, index, value):
+        with self._lock:
+            if isinstance(index, slice):
+                removed = self[index]
+                value = list(value)
+            else:
+                removed = [self[index]]
+            super(EpisodeCollection, self).__setitem__(index, value)
+            self._replace_items(removed, value if isinstance(index, slice)
+                                else [value])
+            if isinstance(index, slice):
+                self._positions = None
+            else:
+                if index < 0:
+                    index += len(self)
+                self._forget_position(removed[0], index)
+                self._note_position(value, index)
+
+    def __delitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                removed = self[index]
+            else:
+                removed = [self[index]]
+            super(EpisodeCollection, self).__delitem__(index)
+            self._replace_items(removed, [])
+            if isinstance(index, slice):
+                self._positions = None
+            else:
+                self._removed_at(removed[0], index)
+
+    # Python 2 uses these for simple slices
+    def __setslice__(self, i, j, sequence):
+        self.__setitem__(slice(max(0, i), max(0, j)), sequence)
+
+    def __delslice__(self, i, j):
+        self.__delitem__(slice(max(0, i), max(0, j)))
+
+    # New methods
+
+    def get(self, guid, default=None):
+        """Return the episode with the given GUID.
+
+        The GUID of an episode is its :attr:`~.Episode.id`, or the URL of its
+        :attr:`~.Episode.media` if the id is :obj:`None`.
+
+        :param guid: The GUID to look for.
+        :type guid: str
+        :param default: Value to return if no episode has that GUID.
+        :returns: The episode with the given GUID (the first one added, if
+            there are many), or ``default``.
+        """
+        same_guid = self._guids.get(guid)
+        if not same_guid:
+            return default
+        return same_guid[0]
+
+    def has_guid(self, guid):
+        """Return whether an episode with the given GUID is in this
+        collection.
+
+        :param guid: The GUID to look for.
+        :type guid: str
+        :rtype: bool
+        """
+        return guid in self._guids
+
+    def replace(self, episode):
+        """Put ``episode`` in place of the episode with the same GUID, or
+        append it if there is no such episode.
+
+        :param episode: The episode to put in this collection.
+        :type episode: :class:`~podgen.Episode`
+        :returns: The episode which was replaced, or :obj:`None`.
+        """
+        with self._lock:
+            old = self.get(_get_guid(episode))
+            if old is None:
+                self.append(episode)
+                return None
+            self[self._get_position(old)] = episode
+            return old
+
+    def remove_guid(self, guid):
+        """Remove the episode with the given GUID.
+
+        :param guid: The GUID of the episode to remove.
+        :type guid: str
+        :returns: The removed episode.
+        :raises: KeyError if no episode has the given GUID.
+        """
+        with self._lock:
+            episode = self.get(guid)
+            if episode is None:
+                raise KeyError(guid)
+            del self[self._get_position(episode)]
+            return episode
+
+    def snapshot(self, newest=None):
+        """Return a copy of this collection as a plain list, which other
+        threads can't change while you use it.
+
+        :param newest: Only include this many episodes, picking those with the
+            latest publication dates. Episodes without a publication date are
+            considered older than the rest. The episodes keep the order they
+            have in this collection. Use :obj:`None` to include all episodes.
+        :type newest: int or None
+        :returns: List of episodes. Its ``latest_publication_date`` attribute
+            is the latest publication date of the episodes in it.
+        :rtype: :obj:`list` of :class:`~podgen.Episode`
+        """
+        with self._lock:
+            if newest is None or newest >= len(self):
+                episodes = _Snapshot(self)
+                episodes.latest_publication_date = \
+                    self.latest_publication_date
+                return episodes
+
+            chosen = self.newest(newest)
+            if len(chosen) < newest:
+                # Make up for it with episodes which have no publication date
+                undated = (e for e in self
+                           if self._entries[id(e)][2] is None)
+                chosen.extend(itertools.islice(undated, newest - len(chosen)))
+            chosen_ids = set(id(e) for e in chosen)
+            episodes = _Snapshot(e for e in self if id(e) in chosen_ids)
+            # The newest episode is always chosen
+            if chosen:
+                episodes.latest_publication_date = \
+                    self.latest_publication_date
+        return episodes
+
+    def newest(self, n):
+        """Return the ``n`` episodes with the latest publication dates, newest
+        first. Episodes without a publication date are not included.
+
+        :param n: The maximum number of episodes to return.
+        :type n: int
+        :rtype: :obj:`list` of :class:`~podgen.Episode`
+        """
+        if n <= 0:
+            return []
+        with self._lock:
+            keys = self._dates[-n:]
+            return [self._dated_episodes[key[1]] for key in reversed(keys)]
+
+    @property
+    def latest_publication_date(self):
+        """The latest publication date of the episodes in this collection, or
+        :obj:`None` if no episode has a publication date.
+
+        :type: :class:`datetime.datetime`
+        """
+        with self._lock:
+            if not self._dates:
+                return None
+            return self._dates[-1][0]
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.loader
+    ~~~~~~~~~~~~~
+
+    This file contains the functions used to read existing RSS feeds into
+    Podcast, Episode and Media objects. See :meth:`.Podcast.from_file`.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import datetime
+import email.utils
+import heapq
+import io
+import itertools
+import re
+import warnings
+
+import dateutil.tz
+from lxml import etree
+
+from podgen.category import Category
+from podgen.compat import string_types
+from podgen.media import Media, _get_lazy
+from podgen.person import Person
+from podgen.util import _parse_date_string
+
+ITUNES_NS = 'http://www.itunes.com/dtds/podcast-1.0.dtd'
+DUBLIN_NS = 'http://purl.org/dc/elements/1.1/'
+CONTENT_NS = 'http://purl.org/rss/1.0/modules/content/'
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+
+_TRUE_VALUES = ('yes', 'true', 'explicit')
+_FALSE_VALUES = ('no', 'false', 'clean')
+
+_AUTHOR_TAGS = ('{%s}creator' % DUBLIN_NS, 'managingEditor',
+                '{%s}author' % ITUNES_NS)
+"""The elements the podcast's authors can be in, from most to least
+detailed."""
+
+_RSS_PERSON = re.compile(r'^(\S+@\S+)\s+\((.*)\)$')
+"""Matches "email (Name)", like the RSS author elements."""
+_DC_PERSON = re.compile(r'^(.*?)\s*<([^<>]+@[^<>]+)>$')
+"""Matches "Name <email>", like dc:creator elements made by PodGen."""
+_HTTP_URL = re.compile(r'^https?://', re.IGNORECASE)
+"""Matches the URLs which are downloaded instead of opened as files."""
+
+
+def load_podcast(podcast_class, source, newest=None):
+    """Read the RSS feed in ``source`` into a new ``podcast_class``.
+
+    See :meth:`.Podcast.from_file` for the details.
+    """
+    if isinstance(source, string_types) and _HTTP_URL.match(source):
+        # lxml won't fetch it, since it's told not to use the network
+        response = _get_lazy('requests').get(source, stream=True,
+                                             timeout=10.0)
+        try:
+            response.raise_for_status()
+            # Let urllib3 undo any gzip compression as the body is read
+            response.raw.decode_content = True
+            return _load_podcast(podcast_class, response.raw, newest)
+        finally:
+            response.close()
+    return _load_podcast(podcast_class, source, newest)
+
+
+def _load_podcast(podcast_class, source, newest):
+    podcast = podcast_class()
+    authors = dict((tag, []) for tag in _AUTHOR_TAGS)
+    # The newest episodes, as (sort key, episode) in a min-heap
+    chosen = []
+    sequence = itertools.count()
+    found_channel = False
+
+    context = etree.iterparse(source, events=('end',),
+                              resolve_entities=False, no_network=True)
+    for _, element in context:
+        parent = element.getparent()
+        if parent is None or parent.tag != 'channel':
+            continue
+        found_channel = True
+
+        if element.tag == 'item':
+            publication_date = element.find('pubDate')
+            if publication_date is not None:
+                publication_date = _parse_date(publication_date)
+            key = _get_sort_key(publication_date, next(sequence))
+            # Items which aren't kept are never read any further
+            if newest is None:
+                chosen.append((key, _read_episode(
+                    podcast.episode_class(), element, publication_date)))
+            elif len(chosen) < newest:
+                heapq.heappush(chosen, (key, _read_episode(
+                    podcast.episode_class(), element, publication_date)))
+            elif newest > 0 and key > chosen[0][0]:
+                heapq.heapreplace(chosen, (key, _read_episode(
+                    podcast.episode_class(), element, publication_date)))
+        else:
+            _read_channel_element(podcast, element, authors)
+
+        # Everything about this element has been read, so free it along with
+        # any elements before it
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+    del context
+
+    if not found_channel:
+        raise ValueError("No channel element found, so this doesn't look "
+                         "like an RSS feed")
+
+    # Use the same element PodGen would use for the authors
+    for tag in _AUTHOR_TAGS:
+        if authors[tag]:
+            if tag == '{%s}author' % ITUNES_NS:
+                # Holds the names of all authors in one string
+                authors[tag] = [Person(authors[tag][0].name or
+                                       authors[tag][0].email)]
+            podcast.authors = authors[tag]
+            break
+
+    # Put the episodes back in the order they had in the feed
+    chosen.sort(key=lambda pair: pair[0][3])
+    podcast.episodes = [episode for _, episode in chosen]
+
+    # PodGen uses the latest episode date if none is set, so only keep the
+    # channel's date if it's different
+    latest_publication_date = podcast.episodes.latest_publication_date
+    if podcast.publication_date is not None and \
+            podcast.publication_date == latest_publication_date:
+        podcast.publication_date = None
+    return podcast
+
+
+def load_podcast_from_string(podcast_class, rss, newest=None):
+    """Read the RSS feed in the :obj:`str` or :obj:`bytes` ``rss`` into a
+    new ``podcast_class``. See :meth:`.Podcast.from_rss`."""
+    if isinstance(rss, string_types) and not isinstance(rss, bytes):
+        # Drop the XML declaration's encoding, it no longer applies
+        rss = re.sub(r'^\s*<\?xml[^>]*\?>', '', rss).encode('UTF-8')
+    return load_podcast(podcast_class, io.BytesIO(rss), newest)
+
+
+def _get_sort_key(publication_date, sequence_number):
+    """Sort key which puts newer episodes last. Episodes without a
+    publication date are considered older than the rest, and those early in
+    the feed are preferred over those late in the feed."""
+    if publication_date is None:
+        return False, 0, -sequence_number, sequence_number
+    return True, publication_date, sequence_number, sequence_number
+
+
+def _assign(obj, attribute, value):
+    """Assign ``value`` to ``obj.attribute``, giving a warning instead of an
+    exception if the value isn't accepted."""
+    try:
+        setattr(obj, attribute, value)
+    except (ValueError, TypeError) as e:
+        warnings.warn("Ignoring %s from the feed, which isn't valid: %s"
+                      % (attribute, e), stacklevel=4)
+
+
+def _text(element):
+    if element.text is None:
+        return None
+    return element.text.strip()
+
+
+def _is_true(element):
+    return (_text(element) or '').lower() in _TRUE_VALUES
+
+
+def _parse_explicit(element):
+    text = (_text(element) or '').lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    return None
+
+
+def _parse_date(element):
+    text = _text(element)
+    if not text:
+        return None
+    # Feeds use RFC 2822 dates, which the email module parses much faster
+    parsed = email.utils.parsedate_tz(text)
+    if parsed is not None and parsed[9] is not None:
+        try:
+            date = datetime.datetime(*parsed[:6])
+        except ValueError:
+            pass
+        else:
+            if parsed[9] == 0:
+                return date.replace(tzinfo=dateutil.tz.tzutc())
+            return date.replace(tzinfo=dateutil.tz.tzoffset(None, parsed[9]))
+    try:
+        date = _parse_date_string(text)
+    except (ValueError, OverflowError):
+        warnings.warn("Ignoring the date %s from the feed, which couldn't be "
+                      "parsed" % text, stacklevel=4)
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=dateutil.tz.tzutc())
+    return date
+
+
+def _parse_person(text):
+    """Create a Person from the formats PodGen writes persons in."""
+    text = (text or '').strip()
+    if not text:
+        return None
+    match = _RSS_PERSON.match(text)
+    if match:
+        return Person(match.group(2) or None, match.group(1))
+    match = _DC_PERSON.match(text)
+    if match:
+        return Person(match.group(1) or None, match.group(2))
+    if '@' in text and ' ' not in text:
+        return Person(email=text)
+    return Person(text)
+
+
+def _parse_duration(text):
+    """Parse itunes:duration, which is either seconds or [[HH:]MM:]SS."""
+    try:
+        seconds = 0
+        for part in text.strip().split(':'):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return None
+    return datetime.timedelta(seconds=seconds)
+
+
+def _read_authors(element):
+    """Return the authors listed in the children of ``element``."""
+    creators = [_parse_person(_text(e))
+                for e in element.iterchildren('{%s}creator' % DUBLIN_NS)]
+    creators = [p for p in creators if p is not None]
+    if creators:
+        return creators
+    for tag in ('author', 'managingEditor', '{%s}author' % ITUNES_NS):
+        person = element.find(tag)
+        if person is not None and _text(person):
+            if tag == '{%s}author' % ITUNES_NS:
+                return [Person(_text(person))]
+            return [_parse_person(_text(person))]
+    return []
+
+
+def _read_channel_element(podcast, element, authors):
+    """Read one child of the channel into ``podcast``. Authors are added to
+    the list for their tag in ``authors``, since they're chosen among once the
+    whole channel is read."""
+    tag = element.tag
+    simple = {
+        'title': 'name',
+        'link': 'website',
+        'description': 'description',
+        'copyright': 'copyright',
+        'generator': 'generator',
+        'language': 'language',
+        '{%s}subtitle' % ITUNES_NS: 'subtitle',
+        '{%s}new-feed-url' % ITUNES_NS: 'new_feed_url',
+    }
+    if tag in simple:
+        _assign(podcast, simple[tag], _text(element))
+    elif tag == '{%s}summary' % ITUNES_NS:
+        if not podcast.description:
+            _assign(podcast, 'description', _text(element))
+    elif tag == '{%s}explicit' % ITUNES_NS:
+        _assign(podcast, 'explicit', _parse_explicit(element))
+    elif tag == 'pubDate':
+        _assign(podcast, 'publication_date', _parse_date(element))
+    elif tag == 'cloud':
+        _assign(podcast, 'cloud', tuple(element.get(attribute) for attribute
+                                        in ('domain', 'port', 'path',
+                                            'registerProcedure', 'protocol')))
+    elif tag in authors:
+        person = _parse_person(_text(element))
+        if person is not None:
+            authors[tag].append(person)
+    elif tag == 'webMaster':
+        _assign(podcast, 'web_master', _parse_person(_text(element)))
+    elif tag == 'skipHours':
+        _assign(podcast, 'skip_hours',
+                set(int(_text(h)) for h in element.iterchildren('hour')
+                    if (_text(h) or '').isdigit()))
+    elif tag == 'skipDays':
+        _assign(podcast, 'skip_days',
+                set(_text(d) for d in element.iterchildren('day')
+                    if _text(d)))
+    elif tag == '{%s}block' % ITUNES_NS:
+        _assign(podcast, 'withhold_from_itunes', _is_true(element))
+    elif tag == '{%s}complete' % ITUNES_NS:
+        _assign(podcast, 'complete', _is_true(element))
+    elif tag == '{%s}category' % ITUNES_NS and podcast.category is None:
+        subcategory = element.find('{%s}category' % ITUNES_NS)
+        try:
+            podcast.category = Category(
+                element.get('text'),
+                subcategory.get('text') if subcategory is not None else None)
+        except (ValueError, TypeError) as e:
+            warnings.warn("Ignoring category from the feed, which isn't "
+                          "valid: %s" % e, stacklevel=3)
+    elif tag == '{%s}image' % ITUNES_NS:
+        _assign(podcast, 'image', element.get('href'))
+    elif tag == 'image' and not podcast.image:
+        url = element.find('url')
+        if url is not None:
+            _assign(podcast, 'image', _text(url))
+    elif tag == '{%s}owner' % ITUNES_NS:
+        name = element.find('{%s}name' % ITUNES_NS)
+        email = element.find('{%s}email' % ITUNES_NS)
+        if name is not None and email is not None:
+            _assign(podcast, 'owner', Person(_text(name), _text(email)))
+    elif tag == '{%s}link' % ATOM_NS:
+        rel = element.get('rel')
+        if rel == 'self':
+            _assign(podcast, 'feed_url', element.get('href'))
+        elif rel == 'hub':
+            _assign(podcast, 'pubsubhubbub', element.get('href'))
+
+
+def _read_episode(episode, item, publication_date):
+    """Fill in ``episode`` with the contents of the item element, and the
+    ``publication_date`` which has been parsed already."""
+    simple = {
+        'title': 'title',
+        'link': 'link',
+        '{%s}subtitle' % ITUNES_NS: 'subtitle',
+    }
+    enclosure = None
+    duration = None
+    description = None
+    long_summary = None
+    itunes_summary = None
+    for child in item.iterchildren(tag=etree.Element):
+        tag = child.tag
+        if tag in simple:
+            _assign(episode, simple[tag], _text(child))
+        elif tag == 'description':
+            description = child.text
+        elif tag == '{%s}encoded' % CONTENT_NS:
+            long_summary = child.text
+        elif tag == '{%s}summary' % ITUNES_NS:
+            itunes_summary = child.text
+        elif tag == 'guid':
+            _assign(episode, 'id', _text(child))
+        elif tag == 'enclosure':
+            enclosure = child
+        elif tag == '{%s}duration' % ITUNES_NS:
+            duration = _parse_duration(_text(child) or '')
+        elif tag == '{%s}block' % ITUNES_NS:
+            _assign(episode, 'withhold_from_itunes', _is_true(child))
+        elif tag == '{%s}image' % ITUNES_NS:
+            _assign(episode, 'image', child.get('href'))
+        elif tag == '{%s}explicit' % ITUNES_NS:
+            _assign(episode, 'explicit', _parse_explicit(child))
+        elif tag == '{%s}isClosedCaptioned' % ITUNES_NS:
+            _assign(episode, 'is_closed_captioned', _is_true(child))
+        elif tag == '{%s}order' % ITUNES_NS:
+            try:
+                _assign(episode, 'position', int(_text(child)))
+            except (TypeError, ValueError):
+                pass
+
+    episode.publication_date = publication_date
+    _assign(episode, 'summary', description or itunes_summary)
+    if long_summary:
+        _assign(episode, 'long_summary', long_summary)
+    authors = _read_authors(item)
+    if authors:
+        episode.authors = authors
+
+    if enclosure is not None and enclosure.get('url'):
+        try:
+            media = Media(enclosure.get('url'), enclosure.get('length') or 0,
+                          enclosure.get('type') or None, duration)
+        except (ValueError, TypeError) as e:
+            warnings.warn("Ignoring enclosure from the feed, which isn't "
+                          "valid: %s" % e, stacklevel=3)
+        else:
+            episode.media = media
+            if episode.id == media.url:
+                # The default, so it keeps following the media's URL
+                episode.id = None
+    return episode
@@ -9,22 +9,55 @@
     :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
     :license: FreeBSD and LGPL, see license.* for more details.
 """
+import importlib
 import os
 import tempfile
+import threading
 import warnings
-from future.moves.urllib.parse import urlparse
+from podgen.compat import urlparse, quote
 from future.utils import raise_from
 import datetime
 
-from tinytag import TinyTag
-import requests
-
 from podgen.not_supported_by_itunes_warning import NotSupportedByItunesWarning
+from podgen.probe import probe_duration, ProbeError
 from podgen import version
 
+_LAZY_MODULES = {
+    'requests': ('requests', None),
+    'TinyTag': ('tinytag', 'TinyTag'),
+}
+"""Names in this module which are imported the first time they're used, as
+(module, attribute) pairs. requests and tinytag take a long time to import,
+and aren't needed unless media is fetched or analyzed."""
+
+
+def _get_lazy(name):
+    """Return the lazily imported ``name``, importing it if needed. Values
+    assigned to the module attribute (as done by mock.patch) are used
+    instead."""
+    try:
+        return globals()[name]
+    except KeyError:
+        pass
+    module_name, attribute = _LAZY_MODULES[name]
+    value = importlib.import_module(module_name)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+
+def __getattr__(name):
+    # Lets podgen.media.requests and podgen.media.TinyTag be used before
+    # anything has imported them (Python 3.7 and newer)
+    if name in _LAZY_MODULES:
+        return _get_lazy(name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 
 def _get_new_requests_session():
     # TODO: Change into condition about requests' version once bug is fixed
+    requests = _get_lazy('requests')
     if False:
         requests_session = requests.Session()
         requests_session.headers['User-Agent'] = "%s v%s" % \
@@ -36,6 +69,78 @@ def _get_new_requests_session():
     return requests_session
 
 
+def _get_new_pooled_session(pool_size):
+    """Create a requests Session which keeps up to ``pool_size`` connections
+    alive, so they can be reused by that many threads."""
+    requests = _get_lazy('requests')
+    requests_session = requests.Session()
+    requests_session.headers['User-Agent'] = "%s v%s" % \
+                                             (version.name, version.version_full_str)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                            pool_maxsize=pool_size)
+    requests_session.mount('http://', adapter)
+    requests_session.mount('https://', adapter)
+    return requests_session
+
+
+class _HostSessions(object):
+    """Hand out one pooled requests Session per host, creating them as they
+    are needed. Safe to use from multiple threads."""
+
+    def __init__(self, pool_size):
+        self._pool_size = pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        parsed_url = urlparse(url)
+        host = (parsed_url.scheme, parsed_url.netloc)
+        with self._lock:
+            try:
+                return self._sessions[host]
+            except KeyError:
+                session = _get_new_pooled_session(self._pool_size)
+                self._sessions[host] = session
+                return session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+def _read_duration(filename):
+    """Return the duration of the media file at ``filename`` in seconds, or
+    :obj:`None` if it cannot be read. Used in worker processes."""
+    try:
+        return _get_lazy('TinyTag').get(filename).duration
+    except Exception:
+        return None
+
+
+def _scan_media_files(path):
+    """Yield (relative path, stat result) for every media file below
+    ``path``, skipping hidden files and directories. Symbolic links are
+    followed, but each directory is only scanned once, so links to a parent
+    directory don't make the scan go on forever."""
+    scanned = set()
+    directories = [(path, ())]
+    while directories:
+        directory, parts = directories.pop()
+        stat = os.stat(directory)
+        if (stat.st_dev, stat.st_ino) in scanned:
+            continue
+        scanned.add((stat.st_dev, stat.st_ino))
+        for entry in os.scandir(directory):
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir():
+                directories.append((entry.path, parts + (entry.name,)))
+            elif entry.is_file():
+                yield parts + (entry.name,), entry.stat()
+
+
 class Media(object):
     """
     Data-oriented class representing a pointer to a media file.
@@ -101,12 +206,16 @@ class Media(object):
         self._size = None
         self._type = None
         self._duration = None
+        self._requests_session = None
 
         self.url = url
         self.size = size
         self.type = type or self.get_type(url)
         self.duration = duration
-        self.requests_session = requests_session or _get_new_requests_session()
+        self._requests_session = requests_session
+
+    @property
+    def requests_session(self):
         """The requests.Session object which shall be used. Defaults to a new
         session with PodGen as User-Agent.
 
@@ -121,6 +230,14 @@ class Media(object):
 
         :type: :class:`requests.Session`
         """
+        if self._requests_session is None:
+            # Created when first used, so requests isn't imported needlessly
+            self._requests_session = _get_new_requests_session()
+        return self._requests_session
+
+    @requests_session.setter
+    def requests_session(self, requests_session):
+        self._requests_session = requests_session
 
     @property
     def url(self):
@@ -359,7 +476,8 @@ class Media(object):
 
     @classmethod
     def create_from_server_response(cls, url, size=None, type=None,
-                                    duration=None, requests_=None):
+                                    duration=None, requests_=None,
+                                    cache=None):
         """Create new Media object, with size and/or type fetched from the
         server when not given.
 
@@ -392,10 +510,20 @@ class Media(object):
             itself, or a :class:`requests.Session` object. Defaults to a new
             :class:`~requests.Session`.
         :type requests_: :mod:`requests` or :class:`requests.Session`
+        :param cache: Cache to consult before asking the server. The duration
+            is filled in from the cache too, if known and not given.
+        :type cache: :class:`~podgen.MediaCache` or :obj:`None`
         :returns: New instance of Media with url, size and type filled in.
         :raises: The appropriate requests exceptions are thrown when networking
             errors occur. RuntimeError is thrown if some information isn't
             given and isn't found in the server's response."""
+        if cache is not None and not (size and type and duration):
+            requests_ = requests_ or _get_new_requests_session()
+            cached = cache.lookup(url, requests_)
+            size = size or cached.size
+            type = type or cached.type
+            duration = duration or cached.duration
+
         if not (size and type):
             requests_ = requests_ or _get_new_requests_session()
             r = requests_.head(url, allow_redirects=True, timeout=10.0)
@@ -416,6 +544,169 @@ class Media(object):
 
         return Media(url, size, type, duration)
 
+    @classmethod
+    def acreate_from_server_response(cls, url, size=None, type=None,
+                                     duration=None, requests_=None,
+                                     cache=None):
+        """Coroutine version of :meth:`.create_from_server_response`, for use
+        with :mod:`asyncio` (Python 3.5 and newer only).
+
+        The request is made in a background thread, so the event loop is free
+        to do other work in the meantime. Connections are kept alive and
+        shared by all the coroutines of PodGen, so creating many Media objects
+        at once with :func:`asyncio.gather` is efficient::
+
+            >>> import asyncio
+            >>> from podgen import Media
+            >>> async def create_all(urls):
+            ...     return await asyncio.gather(*[
+            ...         Media.acreate_from_server_response(url) for url in urls
+            ...     ])
+
+        The parameters are the same as for
+        :meth:`.create_from_server_response`, except that ``requests_``
+        defaults to the shared Session.
+
+        :returns: Coroutine which returns the new instance of Media.
+        """
+        from podgen import aio
+        return aio.create_from_server_response(cls, url, size, type, duration,
+                                               requests_, cache)
+
+    @classmethod
+    def create_many_from_server_responses(cls, urls, max_workers=8,
+                                          requests_=None, cache=None):
+        """Create many new Media objects at once, with size and type fetched
+        from the server using concurrent HEAD requests.
+
+        This is the same as calling :meth:`.create_from_server_response` for
+        every URL, except up to ``max_workers`` requests are made at the same
+        time, and connections to the same host are kept alive and reused.
+
+        A failure for one URL doesn't stop the others. Instead, the exception
+        takes the place of the Media object in the returned list.
+
+        Example::
+
+            >>> from podgen import Media
+            >>> media = Media.create_many_from_server_responses([
+            ...     "http://example.com/episodes/ep1.mp3",
+            ...     "http://example.com/episodes/ep2.mp3",
+            ... ])
+            >>> for m in media:
+            ...     if isinstance(m, Exception):
+            ...         print("Could not create media: %s" % m)
+
+        :param urls: The URLs at which the media can be accessed right now.
+        :type urls: iterable of :obj:`str`
+        :param max_workers: The maximum number of requests to make at the same
+            time.
+        :type max_workers: int
+        :param requests_: Either the
+            `requests <http://docs.python-requests.org/en/master/>`_ module
+            itself, or a :class:`requests.Session` object, to use for all
+            requests. Defaults to one new :class:`~requests.Session` per host,
+            keeping up to ``max_workers`` connections alive.
+        :type requests_: :mod:`requests` or :class:`requests.Session`
+        :param cache: Cache to consult before asking the server.
+        :type cache: :class:`~podgen.MediaCache` or :obj:`None`
+        :returns: List with one new instance of Media, or the exception which
+            was raised, for every URL in ``urls`` (in the same order).
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        sessions = _HostSessions(max_workers)
+
+        def create(url):
+            try:
+                return cls.create_from_server_response(
+                    url, requests_=requests_ or sessions.get(url),
+                    cache=cache)
+            except Exception as e:
+                return e
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(create, urls))
+        finally:
+            sessions.close()
+
+    @classmethod
+    def scan_directory(cls, path, base_url, max_workers=None, cache=None):
+        """Create Media objects for all media files found in a local
+        directory and its subdirectories, with size, type and duration filled
+        in.
+
+        The URL of each file is ``base_url`` followed by the file's path
+        relative to ``path``. The type is derived from the file extension
+        using :attr:`.Media.file_types`; files with other extensions, and
+        hidden files, are skipped. Durations are found using multiple
+        processes, and are left as :obj:`None` for files which can't be
+        analyzed.
+
+        Example::
+
+            >>> from podgen import Media
+            >>> media = Media.scan_directory("/srv/podcast/episodes",
+            ...                              "http://example.com/episodes/")
+
+        :param path: The directory to scan.
+        :type path: str
+        :param base_url: The URL at which ``path`` is publicly accessible.
+        :type base_url: str
+        :param max_workers: The maximum number of processes to use when
+            finding durations. Defaults to the number of processors.
+        :type max_workers: int or None
+        :param cache: Cache of durations found earlier. Files whose path,
+            modification time and size are unchanged are not analyzed again,
+            not even those whose duration couldn't be found.
+        :type cache: :class:`~podgen.MediaCache` or :obj:`None`
+        :returns: List of new Media instances, sorted by path.
+        """
+        base_url = base_url.rstrip('/') + '/'
+        found = []
+        for parts, stat in _scan_media_files(path):
+            file_extension = parts[-1].rsplit('.', 1)[-1].lower()
+            if '.' not in parts[-1] or file_extension not in cls.file_types:
+                continue
+            found.append((parts, stat, cls.file_types[file_extension]))
+        found.sort(key=lambda f: f[0])
+
+        durations = [None] * len(found)
+        to_analyze = []
+        for i, (parts, stat, _) in enumerate(found):
+            filename = os.path.abspath(os.path.join(path, *parts))
+            if cache is not None:
+                cached, durations[i] = cache._lookup_file_entry(
+                    filename, stat.st_mtime, stat.st_size)
+                if cached:
+                    continue
+            to_analyze.append((i, filename, stat))
+
+        filenames = [filename for _, filename, _ in to_analyze]
+        if len(filenames) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                seconds = list(executor.map(_read_duration, filenames))
+        else:
+            # Not worth starting any processes
+            seconds = [_read_duration(filename) for filename in filenames]
+
+        for (i, filename, stat), s in zip(to_analyze, seconds):
+            if s is not None:
+                durations[i] = datetime.timedelta(seconds=s)
+            # Files which can't be analyzed are remembered too, so they aren't
+            # opened again until they change
+            if cache is not None:
+                cache.store_file(filename, stat.st_mtime, stat.st_size,
+                                 durations[i])
+
+        return [
+            cls(base_url + '/'.join(quote(part) for part in parts),
+                stat.st_size, type, duration)
+            for (parts, stat, type), duration in zip(found, durations)
+        ]
+
     def __str__(self):
         return "Media(url=%s, size=%s, type=%s, duration=%s)" % \
                (self.url, self.size, self.type, self.duration)
@@ -425,12 +716,11 @@ class Media(object):
 
     def __getstate__(self):
         state = self.__dict__.copy()
-        del state['requests_session']
+        state['_requests_session'] = None
         return state
 
     def __setstate__(self, state):
         self.__dict__.update(state)
-        self.requests_session = _get_new_requests_session()
 
     def download(self, destination):
         """Download the media file.
@@ -449,7 +739,29 @@ class Media(object):
         :type destination: :obj:`fd` or :obj:`str`.
         """
 
-        r = self.requests_session.get(self.url, stream=True)
+        self._download(destination, self.requests_session)
+
+    def adownload(self, destination):
+        """Coroutine version of :meth:`.download`, for use with
+        :mod:`asyncio` (Python 3.5 and newer only).
+
+        The file is downloaded in a background thread. If
+        :attr:`.requests_session` hasn't been changed, a Session shared by all
+        the coroutines of PodGen is used, so connections are reused.
+
+        :param destination: Where to save the media file. Either a filename,
+            or a file-like object. The file-like object will *not* be closed by
+            PodGen.
+        :type destination: :obj:`fd` or :obj:`str`.
+        :returns: Coroutine which finishes when the file is downloaded.
+        """
+        from podgen import aio
+        return aio.download(self, destination)
+
+    def _download(self, destination, requests_session):
+        """Download the media file using the given requests module or
+        Session. See :meth:`.download`."""
+        r = requests_session.get(self.url, stream=True)
         r.raise_for_status()
         fd = None
         destination_is_fd = hasattr(destination, "write")
@@ -506,9 +818,10 @@ class Media(object):
         :type filename: str
         :returns: datetime.timedelta
         """
-        return datetime.timedelta(seconds=TinyTag.get(filename).duration)
+        return datetime.timedelta(
+            seconds=_get_lazy('TinyTag').get(filename).duration)
 
-    def fetch_duration(self):
+    def fetch_duration(self, probe=False, cache=None):
         """Download :attr:`.Media.url` locally and use it to populate
         :attr:`.Media.duration`.
 
@@ -516,15 +829,67 @@ class Media(object):
         system. Use :meth:`~.Media.populate_duration_from` otherwise.
 
         This method will take quite some time, since the media file must be
-        downloaded before it can be analyzed.
+        downloaded before it can be analyzed. Set ``probe`` to ``True`` to
+        avoid that for MP3, MP4, M4A, M4V and MOV files.
+
+        :param probe: Set to ``True`` to download only the parts of the file
+            which tell its duration, using HTTP Range requests. The whole file
+            is still downloaded if the duration can't be found that way, for
+            example if the server doesn't support Range requests or the file
+            type isn't supported (default: False).
+        :type probe: bool
+        :param cache: Cache which is consulted before anything is downloaded,
+            and which the duration is stored in afterwards.
+        :type cache: :class:`~podgen.MediaCache` or :obj:`None`
         """
+        self._fetch_duration(probe, cache, self.requests_session)
+
+    def afetch_duration(self, probe=False, cache=None):
+        """Coroutine version of :meth:`.fetch_duration`, for use with
+        :mod:`asyncio` (Python 3.5 and newer only).
+
+        The media is downloaded and analyzed in a background thread. If
+        :attr:`.requests_session` hasn't been changed, a Session shared by all
+        the coroutines of PodGen is used, so connections are reused.
+
+        :param probe: See :meth:`.fetch_duration`.
+        :type probe: bool
+        :param cache: See :meth:`.fetch_duration`.
+        :type cache: :class:`~podgen.MediaCache` or :obj:`None`
+        :returns: Coroutine which finishes when :attr:`.duration` is set.
+        """
+        from podgen import aio
+        return aio.fetch_duration(self, probe, cache)
+
+    def _fetch_duration(self, probe, cache, requests_session):
+        """Populate the duration using the given requests module or Session.
+        See :meth:`.fetch_duration`."""
+        if cache is not None:
+            cached = cache.lookup(self.url, requests_session)
+            if cached.duration is not None:
+                self.duration = cached.duration
+                return
+
+        self.duration = self._find_duration(probe, requests_session)
+        if cache is not None:
+            cache.store_duration(self.url, self.duration)
+
+    def _find_duration(self, probe, requests_session):
+        if probe:
+            try:
+                return probe_duration(requests_session, self.url,
+                                      self.file_extension, self.size)
+            except ProbeError:
+                # We must analyze the whole file after all
+                pass
+
         filename = None
         try:
             with tempfile.NamedTemporaryFile(
                     delete=False, suffix=self.file_extension) as fd:
                 filename = fd.name
-                self.download(fd)
-            self.populate_duration_from(filename)
+                self._download(fd, requests_session)
+            return self._get_duration_of(filename)
         finally:
             if filename:
                 os.remove(filename)
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.media_cache
+    ~~~~~~~~~~~~~~~~~~
+
+    This file contains the MediaCache class, which remembers the size, type
+    and duration of media files between runs.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import collections
+import datetime
+import sqlite3
+import threading
+import time
+
+
+CachedMedia = collections.namedtuple("CachedMedia",
+                                     ["size", "type", "duration"])
+"""The information :class:`~podgen.MediaCache` knows about a media file.
+Any of the fields may be :obj:`None` if not known."""
+
+
+class MediaCache(object):
+    """Persistent cache of the size, type and duration of media files, stored
+    in an SQLite database.
+
+    Give it to :meth:`.Media.create_from_server_response`,
+    :meth:`.Media.create_many_from_server_responses` or
+    :meth:`.Media.fetch_duration` to avoid asking the server about the same
+    media file over and over again, for example when a build worker restarts.
+
+    It also remembers the duration of local media files found by
+    :meth:`.Media.scan_directory`, keyed by their path, modification time and
+    size.
+
+    Entries are keyed by URL, and remember the ETag, Last-Modified and
+    Content-Length the server gave. Entries younger than ``max_age`` are
+    trusted as they are. Older entries are revalidated using a conditional
+    HEAD request, and the duration is kept only if the server says the file
+    hasn't changed. Entries which haven't been used for ``ttl`` are removed, as
+    are the least recently used entries when there are more than
+    ``max_entries`` of them.
+
+    The cache can be shared by multiple threads and processes. Example::
+
+        >>> from podgen import Media, MediaCache
+        >>> with MediaCache("/var/cache/podgen/media.sqlite") as cache:
+        ...     m = Media.create_from_server_response(
+        ...         "http://example.com/episodes/ep1.mp3", cache=cache)
+        ...     m.fetch_duration(cache=cache)
+
+    :param path: Path to the SQLite database. It is created if it doesn't
+        exist.
+    :type path: str
+    :param max_age: How long entries are trusted before they are revalidated
+        with the server.
+    :type max_age: :class:`datetime.timedelta`
+    :param ttl: How long entries are kept without being used.
+    :type ttl: :class:`datetime.timedelta`
+    :param max_entries: The maximum number of entries to keep.
+    :type max_entries: int
+    """
+
+    _EVICT_EVERY = 1000
+    """Remove old entries after this many writes."""
+
+    def __init__(self, path, max_age=datetime.timedelta(days=1),
+                 ttl=datetime.timedelta(days=30), max_entries=100000):
+        self.path = path
+        self.max_age = max_age.total_seconds()
+        self.ttl = ttl.total_seconds()
+        self.max_entries = max_entries
+        # Don't write to the database just to update the access time more
+        # often than necessary
+        self._touch_interval = min(3600.0, self.ttl / 10)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connection = sqlite3.connect(path, timeout=30.0,
+                                           check_same_thread=False,
+                                           isolation_level=None)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS media ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "content_length TEXT, size INTEGER, type TEXT, "
+                "duration REAL, validated_at REAL, accessed_at REAL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS media_accessed_at "
+                "ON media (accessed_at)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, mtime REAL, size INTEGER, "
+                "duration REAL, accessed_at REAL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS files_accessed_at "
+                "ON files (accessed_at)"
+            )
+            self._evict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Remove old entries and close the database."""
+        with self._lock:
+            if self._connection is None:
+                return
+            self._evict()
+            self._connection.close()
+            self._connection = None
+
+    def lookup(self, url, requests_):
+        """Return what is known about the media file at ``url``, asking the
+        server if the cached entry is missing or too old.
+
+        :param url: The URL of the media file.
+        :type url: str
+        :param requests_: Either the
+            `requests <http://docs.python-requests.org/en/master/>`_ module
+            itself, or a :class:`requests.Session` object, to use for the HEAD
+            request, if needed.
+        :type requests_: :mod:`requests` or :class:`requests.Session`
+        :returns: The size, type and duration of the media file.
+        :rtype: :class:`~podgen.media_cache.CachedMedia`
+        :raises: The appropriate requests exceptions are thrown when networking
+            errors occur.
+        """
+        now = time.time()
+        row = self._select(url)
+        if row is not None and now - row["validated_at"] < self.max_age:
+            if now - row["accessed_at"] > self._touch_interval:
+                self._execute("UPDATE media SET accessed_at = ? WHERE url = ?",
+                              (now, url))
+            return self._to_cached_media(row)
+
+        headers = {}
+        if row is not None:
+            if row["etag"]:
+                headers["If-None-Match"] = row["etag"]
+            if row["last_modified"]:
+                headers["If-Modified-Since"] = row["last_modified"]
+        r = requests_.head(url, allow_redirects=True, timeout=10.0,
+                           headers=headers)
+        if r.status_code == 304 and row is not None:
+            self._execute("UPDATE media SET validated_at = ?, accessed_at = ? "
+                          "WHERE url = ?", (now, now, url))
+            return self._to_cached_media(row)
+        r.raise_for_status()
+
+        validators = (r.headers.get("ETag"), r.headers.get("Last-Modified"),
+                      r.headers.get("Content-Length"))
+        duration = None
+        if row is not None and any(validators) and validators == \
+                (row["etag"], row["last_modified"], row["content_length"]):
+            # The file hasn't changed, so the duration is still correct
+            duration = row["duration"]
+        size = validators[2]
+        self._execute(
+            "INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url,) + validators + (
+                int(size) if size else None, r.headers.get("Content-Type"),
+                duration, now, now
+            )
+        )
+        return self._to_cached_media(self._select(url))
+
+    def store_duration(self, url, duration):
+        """Remember the duration of the media file at ``url``.
+
+        Nothing is stored unless :meth:`.lookup` has been used for the same URL
+        first, since the duration would otherwise be kept without any way of
+        knowing whether the file has changed.
+
+        :param url: The URL of the media file.
+        :type url: str
+        :param duration: The media file's duration.
+        :type duration: :class:`datetime.timedelta`
+        """
+        self._execute("UPDATE media SET duration = ? WHERE url = ?",
+                      (duration.total_seconds(), url))
+
+    def lookup_file(self, path, mtime, size):
+        """Return the duration of the local media file at ``path``, if it
+        hasn't changed since it was stored with :meth:`.store_file`.
+
+        :param path: Absolute path to the media file.
+        :type path: str
+        :param mtime: The file's modification time, as given by
+            :func:`os.stat`.
+        :type mtime: float
+        :param size: The file's size in bytes.
+        :type size: int
+        :returns: The file's duration, or :obj:`None` if not known or if the
+            duration couldn't be read.
+        :rtype: :class:`datetime.timedelta` or :obj:`None`
+        """
+        return self._lookup_file_entry(path, mtime, size)[1]
+
+    def _lookup_file_entry(self, path, mtime, size):
+        """Like :meth:`.lookup_file`, but tell files whose duration couldn't
+        be read apart from files which aren't in the cache.
+
+        :returns: Whether the file is in the cache, and its duration.
+        """
+        with self._lock:
+            values = self._connection.execute(
+                "SELECT duration, accessed_at FROM files "
+                "WHERE path = ? AND mtime = ? AND size = ?",
+                (path, mtime, size)
+            ).fetchone()
+        if values is None:
+            return False, None
+        duration, accessed_at = values
+        now = time.time()
+        if now - accessed_at > self._touch_interval:
+            self._execute("UPDATE files SET accessed_at = ? WHERE path = ?",
+                          (now, path))
+        if duration is None:
+            return True, None
+        return True, datetime.timedelta(seconds=duration)
+
+    def store_file(self, path, mtime, size, duration):
+        """Remember the duration of the local media file at ``path``.
+
+        :param path: Absolute path to the media file.
+        :type path: str
+        :param mtime: The file's modification time, as given by
+            :func:`os.stat`.
+        :type mtime: float
+        :param size: The file's size in bytes.
+        :type size: int
+        :param duration: The file's duration, or :obj:`None` if it couldn't
+            be read. The file is then not analyzed again by
+            :meth:`.Media.scan_directory` until it changes.
+        :type duration: :class:`datetime.timedelta` or :obj:`None`
+        """
+        if duration is not None:
+            duration = duration.total_seconds()
+        self._execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                      (path, mtime, size, duration, time.time()))
+
+    def _select(self, url):
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT etag, last_modified, content_length, size, type, "
+                "duration, validated_at, accessed_at FROM media WHERE url = ?",
+                (url,)
+            )
+            values = cursor.fetchone()
+        if values is None:
+            return None
+        return dict(zip(("etag", "last_modified", "content_length", "size",
+                         "type", "duration", "validated_at", "accessed_at"),
+                        values))
+
+    def _execute(self, sql, parameters):
+        with self._lock:
+            self._connection.execute(sql, parameters)
+            self._writes += 1
+            if self._writes % self._EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        # Must be called with self._lock held
+        for table, key in (("media", "url"), ("files", "path")):
+            self._connection.execute(
+                "DELETE FROM %s WHERE accessed_at < ?" % table,
+                (time.time() - self.ttl,)
+            )
+            self._connection.execute(
+                "DELETE FROM %s WHERE %s IN (SELECT %s FROM %s "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)"
+                % (table, key, key, table),
+                (self.max_entries,)
+            )
+
+    @staticmethod
+    def _to_cached_media(row):
+        duration = row["duration"]
+        if duration is not None:
+            duration = datetime.timedelta(seconds=duration)
+        return CachedMedia(row["size"], row["type"], duration)
@@ -12,24 +12,86 @@
 from future.utils import iteritems
 from lxml import etree
 from datetime import datetime
-import dateutil.parser
 import dateutil.tz
 from podgen.episode import Episode
+from podgen.episode_collection import EpisodeCollection, _change_counter
 from podgen.not_supported_by_itunes_warning import NotSupportedByItunesWarning
-from podgen.util import ensure_format, formatRFC2822, listToHumanreadableStr, \
-    htmlencode
+from podgen.util import ensure_format, formatRFC2822, \
+    listToHumanreadableStr, htmlencode, _is_ascii_compatible, \
+    _is_binary_file, _get_item_bounds, _serialize_item, \
+    _write_file_atomically, _hash_file, _parse_date_string
 from podgen.person import Person
+from podgen.render_profile import RenderSpan
 import podgen.version
 import sys
 from podgen.compat import string_types
 import collections
+import hashlib
+import heapq
 import inspect
+import itertools
+import mmap
+import os
+import time
 import warnings
 
 
 _feedgen_version = podgen.version.version_str
 
 
+_FEED_HISTORY_NS = 'http://purl.org/syndication/history/1.0'
+"""Namespace of the fh:archive element used by archived feeds (RFC 5005)."""
+
+_FeedPage = collections.namedtuple(
+    '_FeedPage', ['number', 'url', 'episodes', 'links', 'archived'])
+"""One page of an archived feed, with its (rel, href) atom:link pairs."""
+
+
+_WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday',
+             'Saturday', 'Sunday']
+"""The values allowed in Podcast.skip_days, in the order they're output."""
+
+
+_COPY_BLOCK_SIZE = 1024 * 1024
+"""The number of bytes copied at a time by Podcast.append_to_file."""
+
+
+_MIN_PARALLEL_ITEMS = 1000
+"""Don't start worker processes for fewer items than this."""
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def _get_etag(digest):
+    """Return the strong HTTP ETag for content with the given hash object."""
+    return '"%s"' % digest.hexdigest()
+
+
+def _observe_items(items, observer):
+    """Pass on the serialized items from ``items``, and tell the ``observer``
+    how long it took to get them."""
+    seconds = 0.0
+    count = 0
+    size = 0
+    while True:
+        start = _clock()
+        item = next(items, None)
+        seconds += _clock() - start
+        if item is None:
+            break
+        count += 1
+        size += len(item)
+        yield item
+    observer(RenderSpan('items', seconds, count, size))
+
+
+def _render_items(episodes, nsmap, minimize, encoding):
+    """Serialize the items of the given episodes. Runs in a worker process
+    when Podcast.render_workers is set."""
+    return [_serialize_item(entry.rss_entry(), nsmap, minimize, encoding)
+            for entry in episodes]
+
+
 class Podcast(object):
     """Class representing one podcast feed.
 
@@ -64,6 +126,12 @@ class Podcast(object):
     Of course, you can do this for as many (or few) attributes as you like, and
     you can still set the attributes afterwards, like always.
 
+    Generating the feed doesn't change the Podcast or its episodes (apart
+    from :attr:`.last_etag`), so many threads may generate the same feed at
+    once. Episodes may be added to or
+    removed from :attr:`.episodes` while that happens; every feed generated
+    uses a copy of the episode list taken when generation starts.
+
     :raises: TypeError if you use a keyword which isn't recognized as an
         attribute. ValueError if you use a value which isn't compatible with
         the attribute (just like when you assign it manually).
@@ -71,7 +139,10 @@ class Podcast(object):
     """
 
     def __init__(self, **kwargs):
-        self.__episodes = []
+        self.__last_change = 0
+        """Number from _change_counter, taken when a public attribute was last
+        assigned to."""
+        self.__episodes = EpisodeCollection()
         """The list used by self.episodes."""
         self.__episode_class = Episode
         """The internal value used by self.Episode."""
@@ -275,7 +346,8 @@ class Podcast(object):
         .. warning::
 
            Do NOT set this attribute if you haven't set up mechanics for
-           notifying the hub of new episodes. Doing so could make it appear to
+           notifying the hub of new episodes, for example using
+           :class:`~podgen.HubNotifier`. Doing so could make it appear to
            your listeners like there is no new content for this feed. See the
            guide.
 
@@ -317,6 +389,72 @@ class Podcast(object):
            https://docs.python.org/3/library/http.server.html
         """
 
+        self.max_episodes = None
+        """The maximum number of episodes to include in the feed, or
+        :obj:`None` to include all of them.
+
+        When set, only the episodes with the latest
+        :attr:`~.Episode.publication_date` are included, in the order they
+        have in :attr:`.episodes`. Episodes without a publication date are
+        considered older than the rest. :attr:`.episodes` itself is left
+        untouched, so you can keep your whole archive there.
+
+        :type: :obj:`int` or :obj:`None`
+        :RSS: Number of item elements
+        """
+
+        self.render_workers = None
+        """The number of processes to use when creating the episodes' items,
+        or :obj:`None` to create them in this process.
+
+        This speeds up the generation of feeds with many thousands of
+        episodes. The episodes are sent to the worker processes in chunks,
+        and the items come back serialized, so the output is the same as
+        without workers. Only the episodes which have changed since the last
+        time the feed was generated are sent, and workers are not used at all
+        unless there are many of them. The episodes must be possible to
+        pickle.
+
+        :type: :obj:`int` or :obj:`None`
+        """
+
+        self.observer = None
+        """Function which is told how long the parts of generating and
+        writing the feed take, or :obj:`None`.
+
+        It is called with a :class:`~podgen.render_profile.RenderSpan` each
+        time a part is done, in the thread which generates the feed. Use a
+        :class:`~podgen.RenderProfile` to collect them and see where the time
+        goes. Nothing is measured when this is :obj:`None`.
+
+        :type: callable or :obj:`None`
+        """
+
+        self.__last_etag = None
+        """The internal value used by self.last_etag."""
+        self.__file_etags = {}
+        """Maps absolute filenames to ((size, mtime, inode), ETag) of the
+        files written by rss_file with only_if_changed."""
+
+        self.deterministic = False
+        """Whether the same podcast should give the same feed every time.
+
+        Normally, :attr:`.last_updated` defaults to the time the feed is
+        generated, so no two feeds are the same. Set this to ``True`` to use
+        the :attr:`.publication_date` of the podcast, or the latest
+        publication date among the episodes, instead. Then the generated
+        bytes only change when the podcast or its episodes change, so
+        :attr:`.last_etag`, caches and :meth:`.rss_file`'s
+        ``only_if_changed`` option work as intended.
+
+        Since PodGen can't tell when you last changed the podcast itself, you
+        should assign :attr:`.last_updated` yourself if lastBuildDate must
+        reflect such changes.
+
+        :type: :obj:`bool`
+        :RSS: lastBuildDate
+        """
+
         # Populate the podcast with the keyword arguments
         for attribute, value in iteritems(kwargs):
             if hasattr(self, attribute):
@@ -326,6 +464,102 @@ class Podcast(object):
                                 "match any attribute in Podcast." %
                                 (attribute, value))
 
+    def __setattr__(self, name, value):
+        super(Podcast, self).__setattr__(name, value)
+        if not name.startswith('_'):
+            # Private attributes are only changed through the public ones
+            self.__last_change = next(_change_counter)
+
+    def _get_change_stamp(self):
+        """Return a value which is different after a public attribute of this
+        podcast or of one of its episodes has been assigned to, or after
+        episodes have been added, removed or reordered.
+
+        Changes made in place to mutable values, like appending to
+        :attr:`.authors` or changing an episode's :class:`~podgen.Media`, are
+        not noticed."""
+        episodes = self.__episodes
+        return (self.__last_change, id(episodes),
+                getattr(episodes, '_last_change', None))
+
+    @classmethod
+    def from_file(cls, source, newest=None):
+        """Create a new Podcast from an existing RSS feed.
+
+        The feed is read one element at a time, and each item is turned into
+        an :class:`~podgen.Episode` (of :attr:`.episode_class`) with a
+        :class:`~podgen.Media` and freed before the next one is read. Even
+        huge feeds can therefore be read without using much memory,
+        especially when only the ``newest`` episodes are kept.
+
+        All the elements PodGen generates are read back into the
+        corresponding attributes, along with a few common elements PodGen
+        doesn't use itself (like itunes:summary and the RSS image). Other
+        elements are ignored. lastBuildDate is ignored too, so the feed gets
+        a new one when it's generated again. Values which aren't accepted by
+        the attributes give a warning and are left out, so make sure the
+        mandatory attributes like :attr:`.explicit` are set before you
+        generate the feed. The XSLT processing instruction isn't read either,
+        so set :attr:`.xslt` again if the feed had one.
+
+        Example::
+
+            >>> from podgen import Podcast
+            >>> p = Podcast.from_file("feed.rss", newest=100)
+            >>> p.episodes[0].title
+            'The newest episode'
+
+        :param source: Name of the file with the feed, a binary file-like
+            object or an HTTP or HTTPS URL, which is downloaded with requests
+            as the feed is read.
+        :type source: str or fd
+        :param newest: Only keep this many episodes, picking those with the
+            latest publication dates. Episodes without a publication date are
+            considered older than the rest. The episodes keep the order they
+            have in the feed. Use :obj:`None` to keep all episodes.
+        :type newest: int or None
+        :returns: New instance of this class.
+        :raises: ValueError if the feed has no channel element, and
+            lxml.etree.XMLSyntaxError if it isn't well-formed XML. Errors
+            when downloading the feed are raised as the appropriate requests
+            exceptions.
+        """
+        from podgen.loader import load_podcast
+        return load_podcast(cls, source, newest)
+
+    @classmethod
+    def from_rss(cls, rss, newest=None):
+        """Create a new Podcast from an RSS feed given as a string, like the
+        one returned by :meth:`.rss_str` or :meth:`.rss_bytes`.
+
+        See :meth:`.from_file` for the details.
+
+        :param rss: The RSS feed.
+        :type rss: str or bytes
+        :param newest: See :meth:`.from_file`.
+        :type newest: int or None
+        :returns: New instance of this class.
+        """
+        from podgen.loader import load_podcast_from_string
+        return load_podcast_from_string(cls, rss, newest)
+
+    @property
+    def last_etag(self):
+        """A strong HTTP ETag for the feed which was generated last, or
+        :obj:`None` if no feed has been generated yet.
+
+        It is calculated from the SHA-256 hash of the generated bytes while
+        the feed is generated, so it changes exactly when the feed's content
+        changes. Use it as the ETag header when serving the feed, together
+        with :meth:`.rss_file`'s ``only_if_changed`` option. If many threads
+        generate feeds at once, this is the ETag of the one which finished
+        last.
+
+        Read-only.
+
+        :type: :obj:`str`
+        """
+        return self.__last_etag
 
     @property
     def episodes(self):
@@ -334,16 +568,20 @@ class Podcast(object):
         See :py:meth:`.add_episode` for an easy way to create new episodes and
         assign them to this podcast in one call.
 
-        :type: :obj:`list` of :class:`podgen.Episode`
+        This is an :class:`~podgen.EpisodeCollection`, which works like a list
+        but also lets you look up episodes by their GUID. Other iterables
+        assigned to this attribute are copied into a new collection.
+
+        :type: :class:`~podgen.EpisodeCollection` of :class:`podgen.Episode`
         :RSS: item elements
         """
         return self.__episodes
 
     @episodes.setter
     def episodes(self, episodes):
-        # Ensure it is a list
-        self.__episodes = list(episodes) if not isinstance(episodes, list) \
-            else episodes
+        # Ensure it is an EpisodeCollection
+        self.__episodes = episodes if isinstance(episodes, EpisodeCollection) \
+            else EpisodeCollection(episodes)
 
     @property
     def episode_class(self):
@@ -435,10 +673,46 @@ class Podcast(object):
         :returns: The root element (ie. the rss element) of the feed.
         :rtype: lxml.etree.Element
         """
-        ITUNES_NS = self._nsmap['itunes']
+        episodes = self._get_episodes_to_render()
+        feed = self._create_rss_header(episodes)
+        channel = feed.find('channel')
 
-        feed = etree.Element('rss', version='2.0', nsmap=self._nsmap)
-        channel = etree.SubElement(feed, 'channel')
+        for entry in episodes:
+            item = entry.rss_entry()
+            channel.append(item)
+
+        return feed
+
+    def _get_episodes_to_render(self):
+        """Return the episodes which shall be part of the feed, taking
+        :attr:`.max_episodes` into account."""
+        episodes = self.episodes
+        limit = self.max_episodes
+        if isinstance(episodes, EpisodeCollection):
+            # Don't let other threads change the list while we render
+            return episodes.snapshot(limit)
+
+        episodes = list(episodes)
+        if limit is None or limit >= len(episodes):
+            return episodes
+        chosen = heapq.nlargest(
+            limit,
+            (e for e in episodes if e.publication_date is not None),
+            key=lambda e: e.publication_date
+        )
+        if len(chosen) < limit:
+            # Make up for it with episodes which have no publication date
+            undated = (e for e in episodes if e.publication_date is None)
+            chosen.extend(itertools.islice(undated, limit - len(chosen)))
+
+        chosen_ids = set(id(e) for e in chosen)
+        return [e for e in episodes if id(e) in chosen_ids]
+
+    def _validate(self):
+        """Check that the mandatory attributes are set.
+
+        :raises: ValueError if one of them isn't set.
+        """
         if not (self.name and self.website and self.description
                 and self.explicit is not None):
             missing = ', '.join(([] if self.name else ['title']) +
@@ -446,6 +720,28 @@ class Podcast(object):
                                 ([] if self.description else ['description']) +
                                 ([] if self.explicit else ['itunes_explicit']))
             raise ValueError('Required fields not set (%s)' % missing)
+
+    def _create_rss_header(self, episodes, page=None):
+        """Create the RSS feed XML structure without any item elements.
+
+        This is used by :meth:`._create_rss`, and by the methods which write
+        the items one by one instead of building them all into one tree.
+
+        :param episodes: The episodes which will be part of the feed. They are
+            only used to find the channel's publication date.
+        :type episodes: :obj:`list` of :class:`podgen.Episode`
+        :param page: The page of an archived feed which is created, or
+            :obj:`None` when the whole feed is created.
+        :type page: :class:`._FeedPage` or :obj:`None`
+        :returns: The root element (ie. the rss element) of the feed, with
+            every channel element except the items.
+        :rtype: lxml.etree.Element
+        """
+        ITUNES_NS = self._nsmap['itunes']
+
+        feed = etree.Element('rss', version='2.0', nsmap=self._nsmap)
+        channel = etree.SubElement(feed, 'channel')
+        self._validate()
         title = etree.SubElement(channel, 'title')
         title.text = self.name
         link = etree.SubElement(channel, 'link')
@@ -476,10 +772,32 @@ class Podcast(object):
             language = etree.SubElement(channel, 'language')
             language.text = self.language
 
-        if self.last_updated is None:
-            lastBuildDateDate = datetime.now(dateutil.tz.tzutc())
+        lastBuildDateDate = self.last_updated
+
+        if self.publication_date is None:
+            if hasattr(episodes, 'latest_publication_date'):
+                # Known by EpisodeCollection and its snapshots
+                actual_pubDate = episodes.latest_publication_date
+            else:
+                episode_dates = [e.publication_date for e in episodes
+                                 if e.publication_date is not None]
+                if episode_dates:
+                    actual_pubDate = max(episode_dates)
+                else:
+                    actual_pubDate = None
         else:
-            lastBuildDateDate = self.last_updated
+            actual_pubDate = self.publication_date
+
+        if page is not None and page.archived and actual_pubDate:
+            # Archive pages must not change once written
+            lastBuildDateDate = actual_pubDate
+        elif lastBuildDateDate is None and self.deterministic:
+            # Only depend on the content, so the same podcast gives the same
+            # bytes every time
+            lastBuildDateDate = actual_pubDate
+        elif lastBuildDateDate is None:
+            lastBuildDateDate = datetime.now(dateutil.tz.tzutc())
+
         if lastBuildDateDate:
             lastBuildDate = etree.SubElement(channel, 'lastBuildDate')
             lastBuildDate.text = formatRFC2822(lastBuildDateDate)
@@ -509,31 +827,24 @@ class Podcast(object):
                 author = etree.SubElement(channel, 'managingEditor')
                 author.text = str(self.authors[0])
 
-        if self.publication_date is None:
-            episode_dates = [e.publication_date for e in self.episodes
-                             if e.publication_date is not None]
-            if episode_dates:
-                actual_pubDate = max(episode_dates)
-            else:
-                actual_pubDate = None
-        else:
-            actual_pubDate = self.publication_date
         if actual_pubDate:
             pubDate = etree.SubElement(channel, 'pubDate')
             pubDate.text = formatRFC2822(actual_pubDate)
 
-        if self.skip_hours:
-            # Ensure any modifications to the set are accounted for
-            self.skip_hours = self.skip_hours
+        # Check any modifications made to the sets in place, without changing
+        # this object while rendering
+        skip_hours = self.skip_hours
+        if skip_hours:
             skipHours = etree.SubElement(channel, 'skipHours')
-            for h in self.skip_hours:
+            for h in sorted(self._validate_skip_hours(skip_hours)):
                 hour = etree.SubElement(skipHours, 'hour')
                 hour.text = str(h)
-        if self.skip_days:
-            # Ensure any modifications to the set are accounted for
-            self.skip_days = self.skip_days
+        skip_days = self.skip_days
+        if skip_days:
             skipDays = etree.SubElement(channel, 'skipDays')
-            for d in self.skip_days:
+            # Days added to the set afterwards may repeat one in another case
+            for d in sorted(set(self._validate_skip_days(skip_days)),
+                            key=_WEEKDAYS.index):
                 day = etree.SubElement(skipDays, 'day')
                 day.text = d
         if self.web_master:
@@ -578,42 +889,277 @@ class Podcast(object):
             subtitle = etree.SubElement(channel, '{%s}subtitle' % ITUNES_NS)
             subtitle.text = self.subtitle
 
-        if self.feed_url:
+        self_url = self.feed_url if page is None else page.url
+        if self_url:
             link_to_self = etree.SubElement(channel, '{%s}link' % self._nsmap['atom'])
-            link_to_self.attrib['href'] = self.feed_url
+            link_to_self.attrib['href'] = self_url
             link_to_self.attrib['rel'] = 'self'
             link_to_self.attrib['type'] = 'application/rss+xml'
 
+        if page is not None:
+            for rel, href in page.links:
+                link = etree.SubElement(channel, '{%s}link' % self._nsmap['atom'])
+                link.attrib['href'] = href
+                link.attrib['rel'] = rel
+                link.attrib['type'] = 'application/rss+xml'
+            if page.archived:
+                etree.SubElement(channel, '{%s}archive' % _FEED_HISTORY_NS,
+                                 nsmap={'fh': _FEED_HISTORY_NS})
+
         if self.pubsubhubbub:
             link_to_hub = etree.SubElement(channel, '{%s}link' % self._nsmap['atom'])
             link_to_hub.attrib['href'] = self.pubsubhubbub
             link_to_hub.attrib['rel'] = 'hub'
 
-        for entry in self.episodes:
-            item = entry.rss_entry()
-            channel.append(item)
+        return feed
 
+    def _create_page_rss(self, page):
+        """Create the XML structure of one page of an archived feed.
+
+        :param page: The page to create.
+        :type page: :class:`._FeedPage`
+        :returns: The root element (ie. the rss element) of the page.
+        :rtype: lxml.etree.Element
+        """
+        feed = self._create_rss_header(page.episodes, page)
+        channel = feed.find('channel')
+        for entry in page.episodes:
+            channel.append(entry.rss_entry())
         return feed
 
-    def _add_xslt_pi(self, rss, xml_declaration):
-        """Add an XSLT processor instruction to the RSS string provided."""
-        # This is a hackish way of getting a processor instruction between
-        # the XML declaration and the RSS element; simply because lxml doesn't
-        # support processor instructions outside the root element. So we do
-        # a str.replace to replace the first newline with the processor
-        # instruction, since the XML declaration is followed by a newline.
+    def _rss_chunks(self, minimize=False, encoding='UTF-8',
+                    xml_declaration=True, page=None, digest=None,
+                    stats=None):
+        """Generate the RSS feed as a sequence of encoded byte strings, and
+        set :attr:`.last_etag` when done.
 
-        # Get the processor instruction as a string
-        pi = self._get_xslt_pi()
-        if xml_declaration:
-            return rss.replace(
-             "\n",
-             '\n%s\n' % pi,
-             1)
+        ``digest`` is the :mod:`hashlib` object which the chunks are fed to
+        (default: a new SHA-256 object). See :meth:`._generate_rss_chunks`
+        for the other parameters.
+
+        When :attr:`.observer` is set, the time spent generating the feed is
+        reported, and it and the number of bytes are added to the first two
+        elements of the ``stats`` list, if given.
+        """
+        if digest is None:
+            digest = hashlib.sha256()
+        chunks = self._generate_rss_chunks(minimize, encoding,
+                                           xml_declaration, page)
+        observer = self.observer
+        if observer is None:
+            for chunk in chunks:
+                digest.update(chunk)
+                yield chunk
+        else:
+            # Only count the time spent in here, not by whoever consumes the
+            # chunks
+            seconds = 0.0
+            size = 0
+            while True:
+                start = _clock()
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    digest.update(chunk)
+                seconds += _clock() - start
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+            observer(RenderSpan('generate', seconds, None, size))
+            if stats is not None:
+                stats[0] += seconds
+                stats[1] += size
+        self.__last_etag = _get_etag(digest)
+
+    def _generate_rss_chunks(self, minimize=False, encoding='UTF-8',
+                             xml_declaration=True, page=None):
+        """Generate the RSS feed as a sequence of encoded byte strings.
+
+        The channel is created first, while each episode's item is created
+        and serialized right before it is yielded. The concatenated chunks are
+        identical to the whole tree serialized in one go, but the whole tree
+        is never held in memory.
+
+        Subclasses which override :meth:`._create_rss` get their entire tree in
+        one chunk, so none of their additions are lost. The same is true for
+        encodings where the markup isn't ASCII, like UTF-16.
+
+        When ``page`` is given, that page of an archived feed is generated
+        instead of the whole feed.
+        """
+        pretty_print = not minimize
+        observer = self.observer
+        if observer is not None:
+            start = _clock()
+            self._validate()
+            observer(RenderSpan('validate', _clock() - start, None, None))
+            start = _clock()
+        prolog = self._get_prolog(encoding, xml_declaration)
+        if not _is_ascii_compatible(encoding):
+            if observer is not None:
+                observer(RenderSpan('prolog', _clock() - start, None, None))
+            # Pieces can't be concatenated, so do it all in one go
+            tree = self._create_rss() if page is None else \
+                self._create_page_rss(page)
+            rss = etree.tostring(tree, pretty_print=pretty_print,
+                                 encoding=encoding, xml_declaration=False)
+            yield (prolog + rss.decode(encoding)).encode(encoding)
+            return
+
+        prolog = prolog.encode(encoding)
+        if observer is not None:
+            observer(RenderSpan('prolog', _clock() - start, None,
+                                len(prolog)))
+        yield prolog
+
+        if page is None and type(self)._create_rss is not Podcast._create_rss:
+            yield etree.tostring(self._create_rss(), pretty_print=pretty_print,
+                                 encoding=encoding, xml_declaration=False)
+            return
+
+        if observer is not None:
+            start = _clock()
+        if page is None:
+            episodes = self._get_episodes_to_render()
+        else:
+            episodes = page.episodes
+        feed = self._create_rss_header(episodes, page)
+        if observer is not None:
+            observer(RenderSpan('channel', _clock() - start, None, None))
+            start = _clock()
+        header = etree.tostring(feed, pretty_print=pretty_print,
+                                encoding=encoding, xml_declaration=False)
+        if observer is not None:
+            observer(RenderSpan('tostring', _clock() - start, None,
+                                len(header)))
+        # The channel is closed the same way whether it has items or not
+        before_item, after_item = _get_item_bounds(self._nsmap, minimize,
+                                                   encoding)
+        yield header[:len(header) - len(after_item)]
+
+        if self.render_workers and self.render_workers > 1:
+            items = self._iter_item_bytes_parallel(episodes, minimize,
+                                                   encoding)
+        elif observer is None:
+            items = (self._get_item_bytes(entry, minimize, encoding)
+                     for entry in episodes)
         else:
-            # No declaration, so just put it at the beginning (assuming the
-            # caller wants it there, why else would you set self.xslt?)
-            return pi + "\n" + rss
+            items = self._iter_item_bytes_observed(episodes, minimize,
+                                                   encoding, observer)
+        if observer is not None:
+            items = _observe_items(items, observer)
+        for item in items:
+            yield item
+
+        yield after_item
+
+    def _iter_item_bytes_observed(self, episodes, minimize, encoding,
+                                  observer):
+        """Generate the serialized items of ``episodes`` like
+        :meth:`._get_item_bytes`, and tell the ``observer`` how long it took
+        to create and serialize the items which weren't cached."""
+        nsmap = self._nsmap
+        created = 0
+        size = 0
+        entry_seconds = 0.0
+        tostring_seconds = 0.0
+        for entry in episodes:
+            lookup = getattr(entry, '_lookup_rss_entry_bytes', None)
+            data = slot = None
+            if lookup is not None:
+                data, slot = lookup(nsmap, minimize, encoding)
+            if data is None:
+                start = _clock()
+                item = entry.rss_entry()
+                middle = _clock()
+                data = _serialize_item(item, nsmap, minimize, encoding)
+                entry_seconds += middle - start
+                tostring_seconds += _clock() - middle
+                created += 1
+                size += len(data)
+                if slot is not None:
+                    entry._store_rss_entry_bytes(slot, data)
+            yield data
+        observer(RenderSpan('rss_entry', entry_seconds, created, None))
+        observer(RenderSpan('item_tostring', tostring_seconds, created, size))
+
+    def _iter_item_bytes_parallel(self, episodes, minimize, encoding):
+        """Generate the serialized items of ``episodes`` in order, creating
+        those which aren't cached in :attr:`.render_workers` processes."""
+        nsmap = self._nsmap
+        results = [None] * len(episodes)
+        slots = {}
+        pending = []
+        for i, entry in enumerate(episodes):
+            lookup = getattr(entry, '_lookup_rss_entry_bytes', None)
+            if lookup is None:
+                # Duck-typed episode, which is created when it's yielded
+                continue
+            results[i], slot = lookup(nsmap, minimize, encoding)
+            if results[i] is None:
+                slots[i] = slot
+                pending.append(i)
+
+        if len(pending) < _MIN_PARALLEL_ITEMS:
+            for i, entry in enumerate(episodes):
+                yield results[i] if results[i] is not None else \
+                    self._get_item_bytes(entry, minimize, encoding)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = self.render_workers
+        # A few chunks per worker evens out the load
+        chunk_size = max(_MIN_PARALLEL_ITEMS // 4,
+                         -(-len(pending) // (workers * 4)))
+        chunks = [pending[i:i + chunk_size]
+                  for i in range(0, len(pending), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_render_items,
+                                [episodes[i] for i in chunk],
+                                nsmap, minimize, encoding)
+                for chunk in chunks
+            ]
+            chunk_of = {}
+            for chunk_number, chunk in enumerate(chunks):
+                for position, i in enumerate(chunk):
+                    chunk_of[i] = (chunk_number, position)
+            for i, entry in enumerate(episodes):
+                if i in chunk_of:
+                    chunk_number, position = chunk_of[i]
+                    data = futures[chunk_number].result()[position]
+                    entry._store_rss_entry_bytes(slots[i], data)
+                    yield data
+                elif results[i] is not None:
+                    yield results[i]
+                else:
+                    yield self._get_item_bytes(entry, minimize, encoding)
+
+    def _get_item_bytes(self, entry, minimize, encoding):
+        """Return the serialized item of the given episode, using the
+        episode's cached copy when it is available."""
+        try:
+            get_bytes = entry._rss_entry_bytes
+        except AttributeError:
+            # Duck-typed episode without a cache
+            return _serialize_item(entry.rss_entry(), self._nsmap, minimize,
+                                   encoding)
+        return get_bytes(self._nsmap, minimize, encoding)
+
+    def _get_prolog(self, encoding, xml_declaration):
+        """Return the XML declaration and XSLT processor instruction, which go
+        before the rss element.
+
+        lxml doesn't support processor instructions outside the root element,
+        so they are written as text in front of the serialized rss element.
+        """
+        prolog = []
+        if xml_declaration:
+            prolog.append("<?xml version='1.0' encoding='%s'?>" % encoding)
+        if self.xslt:
+            prolog.append(self._get_xslt_pi())
+        return "".join(line + "\n" for line in prolog)
 
     def _get_xslt_pi(self):
         htmlescaped_url = htmlencode(self.xslt)
@@ -644,17 +1190,81 @@ class Podcast(object):
             the output (default: True).
         :type xml_declaration: bool
         :returns: The generated RSS feed as a :obj:`str` (unicode in 2.7)
+
+        .. seealso::
+
+           The :py:meth:`.rss_bytes` method
+              Gives you the encoded feed, which is what you need when you
+              send it over the network or write it to a file.
         """
-        feed = self._create_rss()
-        rss = etree.tostring(feed, pretty_print=not minimize, encoding=encoding,
-                              xml_declaration=xml_declaration).decode(encoding)
-        if self.xslt:
-            return self._add_xslt_pi(rss, xml_declaration=xml_declaration)
-        else:
-            return rss
+        return self.rss_bytes(minimize=minimize, encoding=encoding,
+                              xml_declaration=xml_declaration)\
+            .decode(encoding)
+
+    def rss_bytes(self, minimize=False, encoding='UTF-8',
+                  xml_declaration=True):
+        """Generate an RSS feed and return the feed XML as encoded bytes.
+
+        This is what the serializer produces, so unlike :meth:`.rss_str`, no
+        decoding takes place.
+
+        :param minimize: Set to True to disable splitting the feed into multiple
+            lines and adding properly indentation, saving bytes at the cost of
+            readability (default: False).
+        :type minimize: bool
+        :param encoding: Encoding used in the XML (default: UTF-8).
+        :type encoding: str
+        :param xml_declaration: Whether an XML declaration should be added to
+            the output (default: True).
+        :type xml_declaration: bool
+        :returns: The generated RSS feed as :obj:`bytes` (str in 2.7), encoded
+            using ``encoding``.
+        """
+        return b"".join(self._rss_chunks(minimize=minimize, encoding=encoding,
+                                         xml_declaration=xml_declaration))
+
+    def rss_stream(self, fileobj, minimize=False, encoding='UTF-8',
+                   xml_declaration=True):
+        """Generate an RSS feed and write it to a binary file-like object,
+        one episode at a time.
+
+        Unlike :meth:`.rss_str`, the feed is never built as one big tree, nor
+        as one big string. The channel is written first, and then each
+        episode is rendered and written before the next one is looked at, so
+        the memory usage doesn't grow with the number of episodes. The
+        resulting bytes are the same as those of :meth:`.rss_str`.
+
+        Example::
+
+            >>> with open("feed.rss", "wb") as fd:
+            ...     p.rss_stream(fd)
+
+        .. note::
+
+           File-like objects given to this method will not be closed.
+
+        :param fileobj: The file-like object to write to. It must accept bytes,
+            so files must be opened in binary mode.
+        :type fileobj: fd
+        :param minimize: Set to True to disable splitting the feed into multiple
+            lines and adding properly indentation, saving bytes at the cost of
+            readability (default: False).
+        :type minimize: bool
+        :param encoding: Encoding used in the XML file (default: UTF-8).
+        :type encoding: str
+        :param xml_declaration: Whether an XML declaration should be added to
+            the output (default: True).
+        :type xml_declaration: bool
+        :returns: Nothing.
+        """
+        options = dict(minimize=minimize, encoding=encoding,
+                       xml_declaration=xml_declaration)
+        self._observe_write(
+            lambda options: self._write_chunks(fileobj, options), options)
 
     def rss_file(self, filename, minimize=False,
-                 encoding='UTF-8', xml_declaration=True):
+                 encoding='UTF-8', xml_declaration=True, gzip_level=None,
+                 brotli_quality=None, only_if_changed=False):
         """Generate an RSS feed and write the resulting XML to a file.
 
         .. note::
@@ -662,13 +1272,35 @@ class Podcast(object):
            If atomicity is needed, then you are expected to provide that
            yourself. That means that you should write the feed to a temporary
            file which you rename to the final name afterwards; renaming is an
-           atomic operation on Unix(like) systems.
+           atomic operation on Unix(like) systems. This is done for you when
+           ``gzip_level``, ``brotli_quality`` or ``only_if_changed`` is used.
+
+        Compressed copies of the feed can be written alongside it, for web
+        servers which serve them directly to clients that accept them (like
+        nginx with ``gzip_static``). The feed is only generated once, and is
+        compressed as it is written. A compressed copy which isn't smaller
+        than the feed is skipped, and any old copy is removed. Example::
+
+            >>> p.rss_file("feed.rss", gzip_level=9)
+            True
+            >>> # feed.rss and feed.rss.gz are now written
+
+        With ``only_if_changed``, the files are left untouched when the feed
+        is the same as the one already in the file, so their modification time
+        doesn't change and caches in front of them aren't invalidated. The
+        feed is compared by its SHA-256 hash (see :attr:`.last_etag`). The
+        hash of the file is remembered by this Podcast after it has been
+        written or checked, so the file is only read when it has been changed
+        by someone else, or when this Podcast hasn't seen it before.
 
         .. note::
 
            File-like objects given to this method will not be closed.
 
         :param filename: Name of file to write, or a file-like object, or a URL.
+            Files opened in binary mode get the encoded feed written to them
+            one episode at a time, while other file-like objects are given
+            the feed as one :obj:`str`.
         :type filename: str or fd
         :param minimize: Set to True to disable splitting the feed into multiple
             lines and adding properly indentation, saving bytes at the cost of
@@ -679,22 +1311,466 @@ class Podcast(object):
         :param xml_declaration: Whether an XML declaration should be added to
             the output (default: True).
         :type xml_declaration: bool
-        :returns: Nothing.
+        :param gzip_level: Set to a compression level from 1 (fastest) to 9
+            (smallest) to also write the feed gzip compressed, to the filename
+            with ``.gz`` added. Requires ``filename`` to be a filename.
+        :type gzip_level: int or None
+        :param brotli_quality: Set to a quality from 0 (fastest) to 11
+            (smallest) to also write the feed brotli compressed, to the
+            filename with ``.br`` added. Requires ``filename`` to be a
+            filename, and the `brotli <https://pypi.org/project/Brotli/>`_
+            package to be installed.
+        :type brotli_quality: int or None
+        :param only_if_changed: Set to True to only write the file (and its
+            compressed copies) if the feed has changed. Requires ``filename``
+            to be a filename (default: False).
+        :type only_if_changed: bool
+        :returns: Whether the feed was written. This is always True unless
+            ``only_if_changed`` is used.
+        :rtype: bool
+        :raises: ValueError if compression or ``only_if_changed`` is requested
+            and ``filename`` is not a filename, and ImportError if brotli is
+            requested but isn't installed.
         """
-        rss = self.rss_str(minimize=minimize, encoding=encoding,
-                           xml_declaration=xml_declaration)
+        options = dict(minimize=minimize, encoding=encoding,
+                       xml_declaration=xml_declaration)
+        compressed = gzip_level is not None or brotli_quality is not None
+        if (compressed or only_if_changed) and \
+                not isinstance(filename, string_types):
+            raise ValueError("Compressed copies and only_if_changed can only "
+                             "be used when filename is a filename, not %r" %
+                             filename)
+        return self._observe_write(
+            lambda options: self._rss_file(filename, options, gzip_level,
+                                           brotli_quality, only_if_changed),
+            options)
+
+    def _rss_file(self, filename, options, gzip_level, brotli_quality,
+                  only_if_changed):
+        """Write the feed. See :meth:`.rss_file`."""
+        if only_if_changed:
+            return self._rss_file_if_changed(filename, options, gzip_level,
+                                             brotli_quality)
+        if gzip_level is not None or brotli_quality is not None:
+            _write_file_atomically(filename, self._rss_chunks(**options),
+                                   gzip_level=gzip_level,
+                                   brotli_quality=brotli_quality)
         # Have we got a filename, or a file-like object?
-        if isinstance(filename, string_types):
+        elif isinstance(filename, string_types):
             # It is a string, assume it is filename
-            with open(filename, "w") as fd:
-                fd.write(rss)
+            with open(filename, "wb") as fd:
+                self._write_chunks(fd, options)
         elif hasattr(filename, "write"):
             # It is file-like enough to fool us
-            filename.write(rss)
+            if _is_binary_file(filename):
+                self._write_chunks(filename, options)
+            else:
+                filename.write(b"".join(self._rss_chunks(**options))
+                               .decode(options['encoding']))
         else:
             raise TypeError("filename must either be a filename (str/unicode) "
                             "or a file-like object (with write method); "
                             "%s satisfies none of those conditions." % filename)
+        return True
+
+    def _write_chunks(self, fileobj, options):
+        for chunk in self._rss_chunks(**options):
+            fileobj.write(chunk)
+
+    def _observe_write(self, write, options):
+        """Call ``write(options)``, which writes the feed, and tell the
+        :attr:`.observer` how long was spent writing, as opposed to
+        generating, the feed.
+
+        :returns: What ``write`` returns.
+        """
+        observer = self.observer
+        if observer is None:
+            return write(options)
+        stats = [0.0, 0]
+        start = _clock()
+        result = write(dict(options, stats=stats))
+        observer(RenderSpan('write', _clock() - start - stats[0], None,
+                            stats[1]))
+        return result
+
+    def _rss_file_if_changed(self, filename, options, gzip_level,
+                             brotli_quality):
+        """Write the feed to ``filename`` unless it already contains it.
+        See :meth:`.rss_file`."""
+        path = os.path.abspath(filename)
+        old_etag = self._get_file_etag(path)
+        digest = hashlib.sha256()
+        written = _write_file_atomically(
+            path, self._rss_chunks(digest=digest, **options),
+            gzip_level=gzip_level, brotli_quality=brotli_quality,
+            keep_old=lambda: _get_etag(digest) == old_etag)
+        self._remember_file_etag(path, _get_etag(digest))
+        return written
+
+    def _get_file_etag(self, path):
+        """Return the ETag of the file at ``path``, or :obj:`None` if there is
+        no such file."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        remembered = self.__file_etags.get(path)
+        key = (stat.st_size, stat.st_mtime, stat.st_ino)
+        if remembered is not None and remembered[0] == key:
+            return remembered[1]
+        try:
+            return _get_etag(_hash_file(path))
+        except (IOError, OSError):
+            return None
+
+    def _remember_file_etag(self, path, etag):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        self.__file_etags[path] = \
+            ((stat.st_size, stat.st_mtime, stat.st_ino), etag)
+
+    def arss_file(self, filename, minimize=False, encoding='UTF-8',
+                  xml_declaration=True, gzip_level=None, brotli_quality=None,
+                  only_if_changed=False, executor=None):
+        """Coroutine version of :meth:`.rss_file`, for use with
+        :mod:`asyncio` (Python 3.5 and newer only).
+
+        The feed is generated and written by an executor, so the event loop
+        isn't blocked while that happens. Don't change the podcast or its
+        episodes until the coroutine is done.
+
+        :param filename: See :meth:`.rss_file`.
+        :type filename: str or fd
+        :param minimize: See :meth:`.rss_file`.
+        :type minimize: bool
+        :param encoding: See :meth:`.rss_file`.
+        :type encoding: str
+        :param xml_declaration: See :meth:`.rss_file`.
+        :type xml_declaration: bool
+        :param gzip_level: See :meth:`.rss_file`.
+        :type gzip_level: int or None
+        :param brotli_quality: See :meth:`.rss_file`.
+        :type brotli_quality: int or None
+        :param only_if_changed: See :meth:`.rss_file`.
+        :type only_if_changed: bool
+        :param executor: The :class:`concurrent.futures.Executor` to use.
+            Defaults to the event loop's default executor.
+        :returns: Coroutine which returns what :meth:`.rss_file` returns.
+        """
+        from podgen import aio
+        return aio.rss_file(self, filename, executor, minimize=minimize,
+                            encoding=encoding,
+                            xml_declaration=xml_declaration,
+                            gzip_level=gzip_level,
+                            brotli_quality=brotli_quality,
+                            only_if_changed=only_if_changed)
+
+    def _get_pages(self, page_size, archive_url):
+        """Split the episodes into the pages of an archived feed.
+
+        :returns: List of :class:`._FeedPage`, starting with the current page
+            and followed by the archive pages from oldest to newest.
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1, not %s"
+                             % page_size)
+        if not self.feed_url:
+            raise ValueError("feed_url must be set, since archive pages link "
+                             "to the current feed")
+        episodes = self.episodes
+        if isinstance(episodes, EpisodeCollection):
+            episodes = episodes.snapshot()
+        else:
+            episodes = list(episodes)
+        # Oldest first, with episodes lacking a publication date at the start
+        order = sorted(range(len(episodes)), key=lambda i: (
+            episodes[i].publication_date is not None,
+            episodes[i].publication_date,
+            i
+        ))
+        num_archives = max(0, (len(episodes) - 1) // page_size)
+
+        def url(number):
+            return self.feed_url if number == 0 else archive_url % number
+
+        def page_episodes(indices):
+            # Keep the order from self.episodes
+            return [episodes[i] for i in sorted(indices)]
+
+        current_links = []
+        if num_archives:
+            current_links = [('prev-archive', url(num_archives)),
+                             ('next', url(num_archives))]
+        pages = [_FeedPage(0, url(0), page_episodes(
+            order[num_archives * page_size:]), current_links, False)]
+        for number in range(1, num_archives + 1):
+            links = [('current', url(0)), ('first', url(0))]
+            if number < num_archives:
+                links.append(('next-archive', url(number + 1)))
+            links.append(('previous',
+                          url(number + 1 if number < num_archives else 0)))
+            if number > 1:
+                links.append(('prev-archive', url(number - 1)))
+                links.append(('next', url(number - 1)))
+            indices = order[(number - 1) * page_size:number * page_size]
+            pages.append(_FeedPage(number, url(number),
+                                   page_episodes(indices), links, True))
+        return pages
+
+    def rss_page(self, number, page_size, archive_url, minimize=False,
+                 encoding='UTF-8', xml_declaration=True):
+        """Generate one page of an archived feed, as described in
+        `RFC 5005`_.
+
+        The episodes are split into pages of ``page_size`` episodes each, by
+        their :attr:`~.Episode.publication_date`. The oldest episodes are put
+        in archive page 1, the next in archive page 2 and so on. The newest
+        episodes, which don't fill up a whole page, are put in the current
+        page, number 0, which is the page subscribers use. There are always
+        between 1 and ``page_size`` episodes on the current page, unless the
+        podcast has no episodes at all.
+
+        Archive pages only change if episodes are added before or among the
+        episodes they contain, if those episodes are changed, or, for the
+        newest archive page, when a new archive page is added after it and
+        linked to. Use :meth:`.rss_page_files` to write all the pages,
+        skipping the archive pages which haven't changed since they were
+        written.
+
+        The pages link to each other using ``atom:link`` elements. Both the
+        links of archived feeds (``current``, ``prev-archive`` and
+        ``next-archive``) and those of paged feeds (``first``, ``next`` and
+        ``previous``) are included, with ``next`` going back in time.
+        :attr:`.max_episodes` is ignored when generating pages.
+
+        :param number: The page to generate, 0 being the current page and 1
+            the oldest archive page.
+        :type number: int
+        :param page_size: The number of episodes to put on each archive page.
+        :type page_size: int
+        :param archive_url: The URL at which the archive pages will be
+            available, with ``%d`` in place of the page number. Page 0 is
+            available at :attr:`.feed_url`, which must be set.
+        :type archive_url: str
+        :param minimize: Set to True to disable splitting the feed into multiple
+            lines and adding properly indentation, saving bytes at the cost of
+            readability (default: False).
+        :type minimize: bool
+        :param encoding: Encoding used in the XML (default: UTF-8).
+        :type encoding: str
+        :param xml_declaration: Whether an XML declaration should be added to
+            the output (default: True).
+        :type xml_declaration: bool
+        :returns: The generated page as :obj:`bytes`, encoded using
+            ``encoding``.
+        :raises: IndexError if there is no such page. ValueError if
+            ``page_size`` is less than 1 or :attr:`.feed_url` isn't set.
+
+        .. _RFC 5005: https://tools.ietf.org/html/rfc5005
+        """
+        pages = self._get_pages(page_size, archive_url)
+        if number < 0:
+            raise IndexError("Page numbers start at 0, not %d" % number)
+        return b"".join(self._rss_chunks(minimize=minimize, encoding=encoding,
+                                         xml_declaration=xml_declaration,
+                                         page=pages[number]))
+
+    def rss_page_files(self, current_filename, archive_filename, page_size,
+                       archive_url, minimize=False, encoding='UTF-8',
+                       xml_declaration=True, overwrite_archives=False):
+        """Write all the pages of an archived feed to files.
+
+        See :meth:`.rss_page` for how the episodes are split into pages.
+
+        The current page is always written, while archive pages are only
+        written if their file doesn't exist already, or if they were the
+        newest archive page and a new one is added after them, since they
+        then get links to it. When a new episode is published, only the
+        current page, any new archive page and the one before it are
+        therefore generated. Each file is written to a temporary file first,
+        which is renamed once complete.
+
+        Example::
+
+            >>> p.feed_url = "https://example.org/feed.rss"
+            >>> p.rss_page_files("/srv/www/feed.rss", "/srv/www/feed-%d.rss",
+            ...                  100, "https://example.org/feed-%d.rss")
+
+        :param current_filename: Name of the file to write the current page
+            to.
+        :type current_filename: str
+        :param archive_filename: Name of the files to write the archive pages
+            to, with ``%d`` in place of the page number.
+        :type archive_filename: str
+        :param page_size: The number of episodes to put on each archive page.
+        :type page_size: int
+        :param archive_url: The URL at which the archive pages will be
+            available, with ``%d`` in place of the page number.
+        :type archive_url: str
+        :param minimize: Set to True to disable splitting the feed into multiple
+            lines and adding properly indentation, saving bytes at the cost of
+            readability (default: False).
+        :type minimize: bool
+        :param encoding: Encoding used in the XML files (default: UTF-8).
+        :type encoding: str
+        :param xml_declaration: Whether an XML declaration should be added to
+            the output (default: True).
+        :type xml_declaration: bool
+        :param overwrite_archives: Set to True to write every archive page,
+            for example after changing old episodes (default: False).
+        :type overwrite_archives: bool
+        :returns: List of the filenames which were written.
+        """
+        options = dict(minimize=minimize, encoding=encoding,
+                       xml_declaration=xml_declaration)
+        pages = self._get_pages(page_size, archive_url)
+        new_pages = set(page.number for page in pages[1:]
+                        if overwrite_archives or
+                        not os.path.exists(archive_filename % page.number))
+        written = []
+        for page in pages:
+            if page.archived:
+                filename = archive_filename % page.number
+                # The archive page which used to be the newest gets links to
+                # the new page after it
+                if page.number not in new_pages and \
+                        page.number + 1 not in new_pages:
+                    continue
+            else:
+                filename = current_filename
+            _write_file_atomically(filename,
+                                   self._rss_chunks(page=page, **options))
+            written.append(filename)
+        return written
+
+    def append_to_file(self, filename, new_episodes, minimize=False,
+                       encoding='UTF-8'):
+        """Add new episodes to the top of a feed which has already been
+        written to a file, without generating the rest of it again.
+
+        Only the items of ``new_episodes`` are generated. They are put right
+        before the first item in the file, and the channel's pubDate and
+        lastBuildDate are updated the same way they would be by
+        :meth:`.rss_file`, if they are in the file. The rest of the file is
+        copied as it is, so this is much faster than generating the whole feed
+        when there are many episodes. The new file is written to a temporary
+        file first, which is renamed once complete.
+
+        This is meant for feeds which have the newest episodes first, and
+        which were generated by this Podcast using the same ``minimize`` and
+        ``encoding``. Other changes to the podcast are not reflected in the
+        file, and no episodes are removed from it, not even when
+        :attr:`.max_episodes` is set. The episodes are not added to
+        :attr:`.episodes` either, so do that yourself if the podcast is kept
+        around::
+
+            >>> ep = Episode(title="Today's episode", ...)
+            >>> p.append_to_file("feed.rss", [ep])
+            >>> p.episodes.insert(0, ep)
+
+        :param filename: Name of the file with the feed.
+        :type filename: str
+        :param new_episodes: The episodes to add, in the order they should
+            have in the feed.
+        :type new_episodes: :obj:`list` of :class:`~podgen.Episode`
+        :param minimize: Whether the feed was written with ``minimize`` set
+            (default: False).
+        :type minimize: bool
+        :param encoding: Encoding used in the XML file (default: UTF-8).
+            Encodings where the markup isn't ASCII, like UTF-16, are not
+            supported.
+        :type encoding: str
+        :returns: Nothing.
+        :raises: ValueError if the file doesn't look like an RSS feed, or if
+            the encoding isn't supported.
+        """
+        if not _is_ascii_compatible(encoding):
+            raise ValueError("Feeds encoded in %s can't be appended to"
+                             % encoding)
+        new_episodes = list(new_episodes)
+        with open(filename, 'rb') as fd:
+            try:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError("%s is empty" % filename)
+            try:
+                _write_file_atomically(filename, self._append_chunks(
+                    filename, data, new_episodes, minimize, encoding))
+            finally:
+                data.close()
+
+    def _append_chunks(self, filename, data, new_episodes, minimize,
+                       encoding):
+        """Generate the contents of the feed in ``data`` (the old file) with
+        the items of ``new_episodes`` added. See :meth:`.append_to_file`."""
+        # Insert the items at the start of the line with the first item, or
+        # with the end of the channel if there are no items
+        end = data.find(b'<item>')
+        if end == -1:
+            end = data.find(b'<item ')
+        if end == -1:
+            end = data.find(b'</channel>')
+        if end == -1 or data.find(b'<channel>', 0, end) == -1:
+            raise ValueError("%s doesn't look like an RSS feed" % filename)
+        while end > 0 and data[end - 1:end] in (b' ', b'\t'):
+            end -= 1
+
+        digest = hashlib.sha256()
+        header = data[:end]
+        for chunk in itertools.chain(
+                [self._update_header_dates(header, new_episodes, encoding)],
+                (self._get_item_bytes(entry, minimize, encoding)
+                 for entry in new_episodes),
+                (data[i:i + _COPY_BLOCK_SIZE]
+                 for i in range(end, len(data), _COPY_BLOCK_SIZE))):
+            digest.update(chunk)
+            yield chunk
+        self.__last_etag = _get_etag(digest)
+
+    def _update_header_dates(self, header, new_episodes, encoding):
+        """Return the channel ``header`` from an existing feed with pubDate
+        and lastBuildDate changed to match the new episodes."""
+        def find_date(tag):
+            start = header.find(('<%s>' % tag).encode(encoding))
+            if start == -1:
+                return None
+            start += len(tag) + 2
+            end = header.find(('</%s>' % tag).encode(encoding), start)
+            return start, end
+
+        pub_date_position = find_date('pubDate')
+        if self.publication_date is not None:
+            pub_date = self.publication_date
+        else:
+            dates = [e.publication_date for e in new_episodes
+                     if e.publication_date is not None]
+            if pub_date_position is not None:
+                start, end = pub_date_position
+                dates.append(_parse_date_string(
+                    header[start:end].decode(encoding)))
+            pub_date = max(dates) if dates else None
+
+        if self.last_updated is not None:
+            last_build_date = self.last_updated
+        elif self.deterministic:
+            last_build_date = pub_date
+        else:
+            last_build_date = datetime.now(dateutil.tz.tzutc())
+
+        replacements = []
+        for tag, date in (('pubDate', pub_date),
+                          ('lastBuildDate', last_build_date)):
+            position = find_date(tag)
+            if position is not None and date:
+                replacements.append((position, date))
+        # Replace from the end, so the positions stay valid
+        for (start, end), date in sorted(replacements, reverse=True):
+            header = header[:start] + \
+                formatRFC2822(date).encode(encoding) + header[end:]
+        return header
 
     def apply_episode_order(self):
         """Make sure that the episodes appear on iTunes in the exact order
@@ -727,7 +1803,8 @@ class Podcast(object):
     def last_updated(self):
         """The last time the feed was generated. It defaults to the time and
         date at which the RSS is generated, if set to :obj:`None`. The default
-        should be sufficient for most, if not all, use cases.
+        should be sufficient for most, if not all, use cases. See
+        :attr:`.deterministic` for a default which doesn't change every time.
 
         The value can either be a string, which will automatically be parsed
         into a :class:`datetime.datetime` object when assigned, or a
@@ -750,7 +1827,7 @@ class Podcast(object):
             self.__last_updated = last_updated
         else:
             if isinstance(last_updated, string_types):
-                last_updated = dateutil.parser.parse(last_updated)
+                last_updated = _parse_date_string(last_updated)
             if not isinstance(last_updated, datetime):
                 raise ValueError('Invalid datetime format')
             if last_updated.tzinfo is None:
@@ -919,7 +1996,7 @@ class Podcast(object):
     def publication_date(self, publication_date):
         if publication_date is not None and publication_date is not False:
             if isinstance(publication_date, string_types):
-                publication_date = dateutil.parser.parse(publication_date)
+                publication_date = _parse_date_string(publication_date)
             if not isinstance(publication_date, datetime):
                 raise ValueError('Invalid datetime format')
             elif publication_date.tzinfo is None:
@@ -959,11 +2036,19 @@ class Podcast(object):
         if hours is not None:
             if not (isinstance(hours, list) or isinstance(hours, set)):
                 hours = set(hours)
-            for h in hours:
-                if h not in range(24):
-                    raise ValueError('Invalid hour %s' % h)
+            self._validate_skip_hours(hours)
         self.__skip_hours = hours
 
+    @staticmethod
+    def _validate_skip_hours(hours):
+        """Return a copy of ``hours``, raising ValueError if any of them are
+        invalid."""
+        hours = list(hours)
+        for h in hours:
+            if h not in range(24):
+                raise ValueError('Invalid hour %s' % h)
+        return hours
+
     @property
     def skip_days(self):
         """Set of days in which podcatchers don't need to refresh this feed.
@@ -992,16 +2077,20 @@ class Podcast(object):
     @skip_days.setter
     def skip_days(self, days):
         if days is not None:
-            if not isinstance(days, set):
-                days = set(days)
-            for d in days:
-                if not d.lower() in ['monday', 'tuesday', 'wednesday', 'thursday',
-                        'friday', 'saturday', 'sunday']:
-                    raise ValueError('Invalid day %s' % d)
-            self.__skip_days = set(day.capitalize() for day in days)
+            self.__skip_days = set(self._validate_skip_days(days))
         else:
             self.__skip_days = None
 
+    @staticmethod
+    def _validate_skip_days(days):
+        """Return a list of the capitalized ``days``, raising ValueError if
+        any of them are invalid."""
+        days = list(days)
+        for d in days:
+            if not d.capitalize() in _WEEKDAYS:
+                raise ValueError('Invalid day %s' % d)
+        return [day.capitalize() for day in days]
+
     @property
     def web_master(self):
         """The :class:`~podgen.Person` responsible for
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.probe
+    ~~~~~~~~~~~~
+
+    This file contains functions which find the duration of a remote media
+    file by downloading only the parts of it which contain that information,
+    using HTTP Range requests.
+
+    MP3 files are probed by reading the ID3 header, the first frame and the
+    Xing, Info or VBRI header which may follow it. MP4, M4A, M4V and MOV files
+    are probed by locating the moov box, which may be at either end of the
+    file.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import datetime
+import struct
+
+
+class ProbeError(Exception):
+    """Raised when the duration cannot be found using partial downloads."""
+    pass
+
+
+_CHUNK_SIZE = 16 * 1024
+"""The number of bytes to ask for when looking for headers."""
+_MAX_REQUESTS = 8
+"""Give up after this many requests, rather than crawling the whole file."""
+_MAX_MOOV_SIZE = 16 * 1024 * 1024
+"""Give up if the moov box is larger than this."""
+
+# Indexed by [version][layer]; version 3 is MPEG 1, 2 is MPEG 2 and 0 is
+# MPEG 2.5, while layer 3 is layer I, 2 is layer II and 1 is layer III.
+_MPEG1_BITRATES = {
+    3: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+}
+_MPEG2_BITRATES = {
+    3: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    1: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+_MP4_EXTENSIONS = ('m4a', 'mp4', 'm4v', 'mov')
+
+
+def probe_duration(requests_session, url, file_extension, size=None):
+    """Find the duration of the media file at ``url`` without downloading all
+    of it.
+
+    :param requests_session: The requests module or Session to use.
+    :param url: The URL of the media file.
+    :type url: str
+    :param file_extension: The media's file extension, which decides how the
+        file is parsed.
+    :type file_extension: str
+    :param size: The size of the file, if known. It is only used if the server
+        doesn't tell.
+    :type size: int or None
+    :returns: The duration of the media file.
+    :rtype: datetime.timedelta
+    :raises: ProbeError if the duration couldn't be found this way, including
+        when the file is shorter than its headers say. Any other networking
+        errors are raised as the appropriate requests exceptions.
+    """
+    fetcher = _RangeFetcher(requests_session, url, size)
+    file_extension = file_extension.lower().lstrip('.')
+    if file_extension == 'mp3':
+        seconds = _probe_mp3(fetcher)
+    elif file_extension in _MP4_EXTENSIONS:
+        seconds = _probe_mp4(fetcher)
+    else:
+        raise ProbeError("Probing %s files is not supported" % file_extension)
+    return datetime.timedelta(seconds=seconds)
+
+
+class _RangeFetcher(object):
+    """Fetch parts of a remote file, keeping track of its total size."""
+
+    def __init__(self, requests_session, url, size=None):
+        self.requests_session = requests_session
+        self.url = url
+        self.size = size or None
+        self.requests_made = 0
+
+    def fetch(self, start, length):
+        """Return up to ``length`` bytes of the file, starting at ``start``.
+        Fewer bytes are returned only if the file ends."""
+        if self.requests_made >= _MAX_REQUESTS:
+            raise ProbeError("Gave up after %d requests to %s"
+                             % (self.requests_made, self.url))
+        self.requests_made += 1
+
+        r = self.requests_session.get(
+            self.url,
+            headers={'Range': 'bytes=%d-%d' % (start, start + length - 1)},
+            stream=True,
+            timeout=10.0,
+        )
+        try:
+            if r.status_code == 416:
+                # Range Not Satisfiable, so the file is shorter than expected
+                raise ProbeError("%s ends before byte %d" % (self.url, start))
+            r.raise_for_status()
+            if r.status_code == 206:
+                self._set_size_from(r.headers.get('Content-Range'))
+            elif start == 0:
+                # The server sent the whole file, so just read the beginning
+                content_length = r.headers.get('Content-Length')
+                if content_length:
+                    self.size = int(content_length)
+            else:
+                raise ProbeError("The server at %s does not support Range "
+                                 "requests" % self.url)
+            data = bytearray()
+            for chunk in r.iter_content(chunk_size=8192):
+                data.extend(chunk)
+                if len(data) >= length:
+                    break
+            return bytes(data[:length])
+        finally:
+            r.close()
+
+    def _set_size_from(self, content_range):
+        # Content-Range: bytes 0-16383/1234567
+        try:
+            self.size = int(content_range.rsplit('/', 1)[1])
+        except (AttributeError, IndexError, ValueError):
+            pass
+
+
+def _unpack(fmt, data, pos):
+    """Unpack the values stored at ``pos`` in ``data`` like
+    :func:`struct.unpack_from`.
+
+    :raises: ProbeError if ``data`` ends before them, for example because the
+        file is truncated.
+    """
+    if pos + struct.calcsize(fmt) > len(data):
+        raise ProbeError("The data ends before byte %d"
+                         % (pos + struct.calcsize(fmt)))
+    return struct.unpack_from(fmt, data, pos)
+
+
+def _syncsafe(data):
+    """Decode a 28-bit integer stored in four bytes of seven bits each."""
+    b = bytearray(data)
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+
+def _parse_mp3_frame_header(data, pos):
+    """Return information about the MPEG audio frame starting at ``pos``, or
+    :obj:`None` if there isn't a valid frame header there."""
+    if pos + 4 > len(data):
+        return None
+    b = bytearray(data[pos:pos + 4])
+    if b[0] != 0xFF or (b[1] & 0xE0) != 0xE0:
+        return None
+    version = (b[1] >> 3) & 0x3
+    layer = (b[1] >> 1) & 0x3
+    bitrate_index = (b[2] >> 4) & 0xF
+    sample_rate_index = (b[2] >> 2) & 0x3
+    padding = (b[2] >> 1) & 0x1
+    mono = ((b[3] >> 6) & 0x3) == 3
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or \
+            sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrates = _MPEG1_BITRATES if mpeg1 else _MPEG2_BITRATES
+    bitrate = bitrates[layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    if layer == 3:
+        samples_per_frame = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or mpeg1:
+        samples_per_frame = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples_per_frame = 576
+        length = 72 * bitrate // sample_rate + padding
+
+    if mpeg1:
+        side_info_size = 17 if mono else 32
+    else:
+        side_info_size = 9 if mono else 17
+
+    return {
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'samples_per_frame': samples_per_frame,
+        'length': length,
+        'side_info_size': side_info_size,
+    }
+
+
+def _find_mp3_frame(data):
+    """Find the first frame header in ``data`` which is followed by another
+    frame header, or by the end of the data."""
+    pos = data.find(b'\xff')
+    while pos != -1:
+        frame = _parse_mp3_frame_header(data, pos)
+        if frame is not None:
+            next_pos = pos + frame['length']
+            if next_pos + 4 > len(data) or \
+                    _parse_mp3_frame_header(data, next_pos) is not None:
+                return pos, frame
+        pos = data.find(b'\xff', pos + 1)
+    raise ProbeError("No MPEG audio frame found")
+
+
+def _probe_mp3(fetcher):
+    data = fetcher.fetch(0, _CHUNK_SIZE)
+    data_start = 0
+    audio_start = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        audio_start = 10 + _syncsafe(data[6:10])
+        if bytearray(data[5:6])[0] & 0x10:
+            # There's a footer, too
+            audio_start += 10
+        if audio_start + _CHUNK_SIZE // 2 > len(data):
+            # Skip past the ID3 tag, which may contain large images
+            data = fetcher.fetch(audio_start, _CHUNK_SIZE)
+            data_start = audio_start
+
+    pos, frame = _find_mp3_frame(data[audio_start - data_start:])
+    pos += audio_start - data_start
+
+    frames = None
+    xing_pos = pos + 4 + frame['side_info_size']
+    if data[xing_pos:xing_pos + 4] in (b'Xing', b'Info'):
+        flags, = _unpack('>I', data, xing_pos + 4)
+        if flags & 0x1:
+            frames, = _unpack('>I', data, xing_pos + 8)
+    elif data[pos + 36:pos + 40] == b'VBRI':
+        frames, = _unpack('>I', data, pos + 50)
+
+    if frames:
+        return frames * frame['samples_per_frame'] / float(frame['sample_rate'])
+
+    # Constant bitrate, so the duration follows from the size
+    if not fetcher.size:
+        raise ProbeError("The size of a constant bitrate MP3 file is needed "
+                         "to find its duration")
+    audio_bytes = fetcher.size - (data_start + pos)
+    return audio_bytes * 8 / float(frame['bitrate'])
+
+
+def _probe_mp4(fetcher):
+    data = fetcher.fetch(0, _CHUNK_SIZE)
+    data_start = 0
+    offset = 0
+    while True:
+        rel = offset - data_start
+        if rel + 16 > len(data) and (fetcher.size is None or
+                                     offset + 16 <= fetcher.size):
+            # Get the box header at offset
+            data = fetcher.fetch(offset, _CHUNK_SIZE)
+            data_start = offset
+            rel = 0
+        if rel + 8 > len(data):
+            raise ProbeError("No moov box found")
+
+        size, box_type = _unpack('>I4s', data, rel)
+        header_size = 8
+        if size == 1:
+            size, = _unpack('>Q', data, rel + 8)
+            header_size = 16
+        elif size == 0:
+            # The box continues until the end of the file
+            if fetcher.size is None:
+                raise ProbeError("No moov box found")
+            size = fetcher.size - offset
+        if size < header_size:
+            raise ProbeError("Invalid box size %d at %d" % (size, offset))
+
+        if box_type == b'moov':
+            if size > _MAX_MOOV_SIZE:
+                raise ProbeError("The moov box is too large (%d bytes)" % size)
+            if rel + size > len(data):
+                data = fetcher.fetch(offset, size)
+                data_start = offset
+                rel = 0
+            return _parse_moov(data[rel + header_size:rel + size])
+        offset += size
+
+
+def _parse_moov(moov):
+    """Find the duration in the mvhd box inside the given moov box's
+    content."""
+    pos = 0
+    while pos + 8 <= len(moov):
+        size, box_type = _unpack('>I4s', moov, pos)
+        if size < 8:
+            break
+        if box_type == b'mvhd':
+            body = moov[pos + 8:pos + size]
+            version, = _unpack('>B', body, 0)
+            if version == 1:
+                timescale, duration = _unpack('>IQ', body, 20)
+                unknown = 0xFFFFFFFFFFFFFFFF
+            else:
+                timescale, duration = _unpack('>II', body, 12)
+                unknown = 0xFFFFFFFF
+            if not timescale or duration == unknown:
+                raise ProbeError("The mvhd box has no usable duration")
+            return duration / float(timescale)
+        pos += size
+    raise ProbeError("No mvhd box found inside the moov box")
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.render_profile
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    This file contains RenderSpan, which tells how long a part of generating
+    a feed took, and RenderProfile, which collects them.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import collections
+import threading
+
+RenderSpan = collections.namedtuple(
+    "RenderSpan", ["name", "seconds", "items", "bytes"])
+"""One part of generating or writing a feed, given to
+:attr:`.Podcast.observer`.
+
+``name`` tells which part it was, and ``seconds`` how long it took. ``items``
+is the number of items involved and ``bytes`` the number of bytes produced,
+or :obj:`None` when that doesn't apply. These are the spans, in the order
+they are reported:
+
+``validate``
+    Checking that the mandatory attributes are set.
+``prolog``
+    Creating the XML declaration and the XSLT processing instruction.
+``channel``
+    Creating the channel element and its children, except the items.
+``tostring``
+    Serializing the channel element with :func:`lxml.etree.tostring`.
+``rss_entry``
+    Creating the item elements with :meth:`.Episode.rss_entry`, added up for
+    all the items which weren't cached.
+``item_tostring``
+    Serializing those item elements, added up for all of them.
+``items``
+    Getting the serialized items, whether they were cached or not.
+``generate``
+    Generating the whole feed, which includes all the spans above.
+``write``
+    Writing the feed with :meth:`.Podcast.rss_file` or
+    :meth:`.Podcast.rss_stream`, not counting the time spent generating it.
+
+Feeds generated by subclasses which override :meth:`.Podcast._create_rss`,
+or using encodings which aren't compatible with ASCII, are generated in one
+go, so only ``validate``, ``prolog``, ``generate`` and ``write`` are reported
+for them.
+When :attr:`.Podcast.render_workers` is used, the items' time is only
+reported as ``items``.
+"""
+
+
+class RenderProfile(object):
+    """Observer which collects the :class:`~podgen.render_profile.RenderSpan`
+    objects of the feeds generated while it's attached, so you can see where
+    the time goes.
+
+    Use it as a context manager to attach it to a podcast::
+
+        >>> from podgen import RenderProfile
+        >>> with RenderProfile(p) as profile:
+        ...     p.rss_file("feed.rss")
+        >>> print(profile.report())
+        span                 seconds      items        bytes
+        validate            0.000002
+        ...
+
+    It can also be assigned to :attr:`.Podcast.observer` directly, and be
+    shared by many podcasts and threads.
+
+    :param podcast: The podcast to attach to when used as a context manager.
+    :type podcast: :class:`~podgen.Podcast` or :obj:`None`
+    """
+
+    def __init__(self, podcast=None):
+        self.podcast = podcast
+        self.spans = []
+        """The spans which have been reported, in the order they were
+        reported.
+
+        :type: :obj:`list` of :class:`~podgen.render_profile.RenderSpan`
+        """
+        self._previous_observer = None
+        self._lock = threading.Lock()
+
+    def __call__(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def __enter__(self):
+        if self.podcast is not None:
+            self._previous_observer = self.podcast.observer
+            self.podcast.observer = self
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.podcast is not None:
+            self.podcast.observer = self._previous_observer
+            self._previous_observer = None
+
+    def totals(self):
+        """Add up the spans with the same name.
+
+        :returns: Mapping from span names to a
+            :class:`~podgen.render_profile.RenderSpan` with the total of
+            their seconds, items and bytes, in the order the names were first
+            reported.
+        :rtype: :class:`collections.OrderedDict`
+        """
+        totals = collections.OrderedDict()
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            total = totals.get(span.name)
+            if total is None:
+                totals[span.name] = span
+                continue
+            totals[span.name] = total._replace(
+                seconds=total.seconds + span.seconds,
+                items=_add(total.items, span.items),
+                bytes=_add(total.bytes, span.bytes))
+        return totals
+
+    def report(self):
+        """Return the totals as a table, with one line per span.
+
+        :rtype: str
+        """
+        lines = ["%-16s %12s %10s %12s" % ("span", "seconds", "items",
+                                           "bytes")]
+        for span in self.totals().values():
+            lines.append("%-16s %12.6f %10s %12s" % (
+                span.name, span.seconds,
+                "" if span.items is None else span.items,
+                "" if span.bytes is None else span.bytes))
+        return "\n".join(lines)
+
+
+def _add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
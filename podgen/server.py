@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.server
+    ~~~~~~~~~~~~~
+
+    This file contains FeedServer, a WSGI (and ASGI) application which serves
+    podcast feeds from memory, answering conditional requests without
+    generating the feeds again.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import calendar
+import collections
+import email.utils
+import gzip
+import hashlib
+import io
+import threading
+import time
+
+from podgen.podcast import Podcast, _get_etag
+from podgen.util import _get_brotli
+
+_RenderedFeed = collections.namedtuple(
+    "_RenderedFeed",
+    ["podcast", "stamp", "etag", "last_modified", "bodies"])
+"""A generated feed. ``bodies`` maps content codings ('identity', 'gzip' and
+'br') to the encoded feed, and ``last_modified`` is a POSIX timestamp."""
+
+_STATUS_LINES = {
+    200: "200 OK",
+    304: "304 Not Modified",
+    404: "404 Not Found",
+    405: "405 Method Not Allowed",
+}
+
+_CONTENT_TYPE = "application/rss+xml; charset=UTF-8"
+
+
+def _get_timestamp(date):
+    """Return the POSIX timestamp of a timezone-aware datetime, in whole
+    seconds like HTTP dates."""
+    return calendar.timegm(date.utctimetuple())
+
+
+def _parse_http_date(value):
+    """Return the POSIX timestamp of an HTTP date, or :obj:`None` if it
+    can't be parsed."""
+    try:
+        parsed = email.utils.parsedate_tz(value)
+        return email.utils.mktime_tz(parsed) if parsed else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _parse_accept_encoding(value):
+    """Return a dictionary which maps the content codings in an
+    Accept-Encoding header to their quality value."""
+    codings = {}
+    for part in value.split(","):
+        params = part.split(";")
+        coding = params[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def _choose_coding(accept_encoding, available):
+    """Pick the best content coding for a request, preferring the smallest
+    of those the client accepts."""
+    if not accept_encoding:
+        return "identity"
+    accepted = _parse_accept_encoding(accept_encoding)
+    default = accepted.get("*", 0.0)
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, default) > 0:
+            return coding
+    return "identity"
+
+
+def _matches_etag(if_none_match, etags):
+    """Return whether the If-None-Match header matches one of the ETags,
+    using the weak comparison RFC 7232 requires."""
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
+
+
+def _compress(body, coding, level):
+    if coding == "gzip":
+        buffer = io.BytesIO()
+        # No name or timestamp in the header, like the files from rss_file
+        with gzip.GzipFile(filename='', mode='wb', compresslevel=level,
+                           fileobj=buffer, mtime=0) as fd:
+            fd.write(body)
+        return buffer.getvalue()
+    return _get_brotli().compress(body, quality=level)
+
+
+class FeedServer(object):
+    """WSGI application which serves podcast feeds.
+
+    Each feed is generated when it is first requested, and the generated
+    bytes are kept in memory until the podcast is changed, so most requests
+    cost no more than a dictionary lookup. Together with the feed, the server
+    keeps copies compressed with gzip (and brotli, if ``brotli_quality`` is
+    given), and uses them for clients which accept them.
+
+    The responses have ETag and Last-Modified headers, and requests with a
+    matching If-None-Match or If-Modified-Since header are answered with
+    ``304 Not Modified``. The ETag is the same as :attr:`.Podcast.last_etag`
+    after generating the feed. Last-Modified is the podcast's
+    :attr:`~.Podcast.last_updated`, or else its
+    :attr:`~.Podcast.publication_date` or the newest episode's publication
+    date, but it is moved to the current time when the feed changes without
+    any of those being updated.
+
+    Changes are noticed when attributes of the podcast or its episodes are
+    assigned to, and when episodes are added or removed. Changes made in
+    place to mutable values, like an episode's :class:`~podgen.Media` or
+    the podcast's :attr:`~.Podcast.authors` list, are not noticed, so call
+    :meth:`.invalidate` after making such changes.
+
+    Example::
+
+        >>> from wsgiref.simple_server import make_server
+        >>> from podgen import FeedServer
+        >>> app = FeedServer({"/feed.rss": p, "/other.rss": other})
+        >>> make_server("", 8000, app).serve_forever()
+
+    Use :meth:`.asgi_app` to serve the feeds with an ASGI server instead.
+
+    :param feeds: The podcast to serve for all paths, or a dictionary which
+        maps paths (like ``"/feed.rss"``) to the podcasts to serve there.
+        Available as :attr:`.feeds`.
+    :type feeds: :class:`~podgen.Podcast` or :obj:`dict`
+    :param minimize: Whether to minimize the feeds (default: False).
+    :type minimize: bool
+    :param gzip_level: The compression level of the gzip copies, from 1 to 9,
+        or :obj:`None` to not use gzip.
+    :type gzip_level: int or None
+    :param brotli_quality: The quality of the brotli copies, from 0 to 11, or
+        :obj:`None` (the default) to not use brotli. Requires the
+        ``brotli`` package.
+    :type brotli_quality: int or None
+    :param max_age: Number of seconds clients may use their copy before
+        asking for the feed again, sent in the Cache-Control header. Use
+        :obj:`None` (the default) to leave out the header.
+    :type max_age: int or None
+    :raises: ImportError if ``brotli_quality`` is given but brotli isn't
+        installed.
+    """
+
+    def __init__(self, feeds, minimize=False, gzip_level=6,
+                 brotli_quality=None, max_age=None):
+        if brotli_quality is not None and _get_brotli() is None:
+            raise ImportError("The brotli package must be installed to "
+                              "serve brotli compressed feeds")
+        self.feeds = feeds
+        """The podcast served for all paths, or a dictionary which maps paths
+        to podcasts. Podcasts may be added to and removed from the
+        dictionary while the server runs.
+
+        :type: :class:`~podgen.Podcast` or :obj:`dict`
+        """
+        self.minimize = minimize
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.max_age = max_age
+        self._rendered = {}
+        """Maps paths to their _RenderedFeed."""
+        self._path_locks = {}
+        """Maps paths to the lock held while their feed is generated, so each
+        is only generated once without holding up the other feeds."""
+        self._lock = threading.Lock()
+        """Held while _rendered and _path_locks are changed."""
+
+    def invalidate(self, path=None):
+        """Mark the generated feed as outdated, so it's generated again on
+        the next request.
+
+        Only needed after changes which aren't noticed automatically.
+
+        :param path: The path of the feed, or :obj:`None` for all feeds.
+        :type path: str or None
+        """
+        with self._lock:
+            paths = list(self._rendered) if path is None else [path]
+        for name in paths:
+            # Wait for the feed to be generated, in case the changes were
+            # made after it started
+            with self._get_path_lock(name):
+                with self._lock:
+                    rendered = self._rendered.get(name)
+                    if rendered is not None:
+                        # Keep it, so Last-Modified still moves forward
+                        self._rendered[name] = rendered._replace(stamp=None)
+
+    def _get_path_lock(self, path):
+        with self._lock:
+            lock = self._path_locks.get(path)
+            if lock is None:
+                lock = self._path_locks[path] = threading.Lock()
+            return lock
+
+    def _get_podcast(self, path):
+        if isinstance(self.feeds, Podcast):
+            return self.feeds
+        return self.feeds.get(path)
+
+    def _get_current(self, path, podcast):
+        """Return the _RenderedFeed for ``path`` if it's up to date with
+        ``podcast``, or :obj:`None`."""
+        rendered = self._rendered.get(path)
+        if rendered is not None and rendered.podcast is podcast and \
+                rendered.stamp == podcast._get_change_stamp():
+            return rendered
+        return None
+
+    def _is_current(self, path):
+        """Return whether the feed at ``path`` can be served without
+        generating it."""
+        podcast = self._get_podcast(path)
+        return podcast is None or \
+            self._get_current(path, podcast) is not None
+
+    def _get_rendered(self, path):
+        """Return the _RenderedFeed for ``path``, generating it if the podcast
+        has changed, or :obj:`None` if there is no podcast there."""
+        podcast = self._get_podcast(path)
+        if podcast is None:
+            return None
+        rendered = self._get_current(path, podcast)
+        if rendered is not None:
+            return rendered
+        with self._get_path_lock(path):
+            # Another thread may have generated it while we waited
+            rendered = self._get_current(path, podcast)
+            if rendered is None:
+                rendered = self._render(podcast, self._rendered.get(path))
+                with self._lock:
+                    self._rendered[path] = rendered
+            return rendered
+
+    def _render(self, podcast, previous):
+        # Take the stamp first, so changes made while the feed is generated
+        # make it outdated right away
+        stamp = podcast._get_change_stamp()
+        digest = hashlib.sha256()
+        body = b"".join(podcast._rss_chunks(minimize=self.minimize,
+                                            digest=digest))
+        etag = _get_etag(digest)
+        if previous is not None and previous.etag == etag:
+            # Nothing which ends up in the feed was changed
+            return previous._replace(podcast=podcast, stamp=stamp)
+
+        last_modified = None
+        for date in (podcast.last_updated, podcast.publication_date,
+                     podcast.episodes.latest_publication_date):
+            # False means the element is left out of the feed
+            if date:
+                last_modified = _get_timestamp(date)
+                break
+        if last_modified is None or (previous is not None and
+                                     last_modified <= previous.last_modified):
+            # Clients which only send If-Modified-Since must not get 304
+            last_modified = int(time.time())
+
+        bodies = {"identity": body}
+        for coding, level in (("gzip", self.gzip_level),
+                              ("br", self.brotli_quality)):
+            if level is not None:
+                compressed = _compress(body, coding, level)
+                if len(compressed) < len(body):
+                    bodies[coding] = compressed
+        return _RenderedFeed(podcast, stamp, etag, last_modified, bodies)
+
+    def respond(self, method, path, headers):
+        """Create the response to a request.
+
+        This is what the WSGI and ASGI applications use, and it lets you
+        serve the feeds from any other kind of web framework.
+
+        :param method: The HTTP method, like ``"GET"``.
+        :type method: str
+        :param path: The requested path, without the query string.
+        :type path: str
+        :param headers: The request headers, with lowercase names.
+        :type headers: dict
+        :returns: Tuple with the status code, list of (name, value) header
+            pairs and the body of the response.
+        :rtype: tuple
+        """
+        if method not in ("GET", "HEAD"):
+            # Don't generate the feed just to turn the request down
+            if self._get_podcast(path) is None:
+                return 404, [("Content-Type", "text/plain")], b"Not Found"
+            return 405, [("Allow", "GET, HEAD"),
+                         ("Content-Type", "text/plain")], \
+                b"Method Not Allowed"
+        rendered = self._get_rendered(path)
+        if rendered is None:
+            return 404, [("Content-Type", "text/plain")], b"Not Found"
+
+        coding = _choose_coding(headers.get("accept-encoding"),
+                                rendered.bodies)
+        etag = rendered.etag
+        if coding != "identity":
+            # Each encoding is a different representation with its own ETag
+            etag = '%s-%s"' % (etag[:-1], coding)
+        response_headers = [
+            ("ETag", etag),
+            ("Last-Modified", email.utils.formatdate(rendered.last_modified,
+                                                     usegmt=True)),
+            ("Vary", "Accept-Encoding"),
+        ]
+        if self.max_age is not None:
+            response_headers.append(("Cache-Control",
+                                     "max-age=%d" % self.max_age))
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            # Either encoding is as good as the other for the client
+            etags = [rendered.etag] + ['%s-%s"' % (rendered.etag[:-1], c)
+                                       for c in rendered.bodies
+                                       if c != "identity"]
+            not_modified = _matches_etag(if_none_match, etags)
+        else:
+            since = _parse_http_date(headers.get("if-modified-since") or "")
+            not_modified = since is not None and \
+                rendered.last_modified <= since
+        if not_modified:
+            return 304, response_headers, b""
+
+        body = rendered.bodies[coding]
+        response_headers.append(("Content-Type", _CONTENT_TYPE))
+        if coding != "identity":
+            response_headers.append(("Content-Encoding", coding))
+        response_headers.append(("Content-Length", str(len(body))))
+        return 200, response_headers, body if method == "GET" else b""
+
+    def __call__(self, environ, start_response):
+        headers = {}
+        for name in ("HTTP_ACCEPT_ENCODING", "HTTP_IF_NONE_MATCH",
+                     "HTTP_IF_MODIFIED_SINCE"):
+            if name in environ:
+                headers[name[5:].lower().replace("_", "-")] = environ[name]
+        path = environ.get("PATH_INFO") or "/"
+        status, response_headers, body = self.respond(
+            environ.get("REQUEST_METHOD", "GET"), path, headers)
+        start_response(_STATUS_LINES[status], response_headers)
+        return [body]
+
+    def asgi_app(self):
+        """Return an ASGI application which serves the same feeds, for use
+        with servers like Uvicorn. Requires Python 3.5 or newer.
+
+        Feeds which must be generated are generated in the event loop's
+        default executor, so the event loop isn't blocked.
+
+        Example::
+
+            >>> import uvicorn
+            >>> from podgen import FeedServer
+            >>> app = FeedServer({"/feed.rss": p}).asgi_app()
+            >>> uvicorn.run(app)
+
+        :returns: ASGI 3 application.
+        """
+        import podgen.aio
+        return podgen.aio.asgi_app(self)
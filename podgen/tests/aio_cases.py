@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.aio_cases
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Tests and helpers which use coroutines and asyncio.run. They are kept
+    out of the test modules, since they are syntax errors in Python 2 and
+    asyncio.run is new in Python 3.7, so only import this module on Python
+    3.7 and newer.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import asyncio
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytz
+
+from podgen import Episode, Media, Podcast
+from podgen.tests.local_server import LocalServer
+
+
+def asgi_request(app, path, headers=()):
+    """Make a GET request for ``path`` to the ASGI application ``app``.
+
+    :returns: The messages sent by the application.
+    """
+    async def request():
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+        await app({"type": "http", "method": "GET", "path": path,
+                   "headers": list(headers)}, receive, send)
+        return messages
+    return asyncio.run(request())
+
+
+class AioTests(object):
+    """The tests of :class:`~podgen.tests.test_aio.TestAio`."""
+
+    def test_createFromServerResponse(self):
+        files = dict(("/%d.mp3" % i, (b"x" * i, {"Content-Type": "audio/mpeg"}))
+                     for i in range(1, 51))
+        with LocalServer(files) as server:
+            async def create_all():
+                return await asyncio.gather(*[
+                    Media.acreate_from_server_response(server.url(path))
+                    for path in sorted(files)
+                ])
+            media = asyncio.run(create_all())
+        self.assertEqual(sorted(m.size for m in media), list(range(1, 51)))
+        self.assertTrue(all(m.type == "audio/mpeg" for m in media))
+        # Connections were reused
+        connections = set(r[3] for r in server.requests)
+        self.assertLess(len(connections), len(files))
+
+    def test_download(self):
+        data = b"episode" * 1000
+        with LocalServer({"/1.mp3": (data, {})}) as server:
+            m = Media(server.url("/1.mp3"), len(data))
+            fd = io.BytesIO()
+            asyncio.run(m.adownload(fd))
+        self.assertEqual(fd.getvalue(), data)
+
+    def test_fetchDuration(self):
+        mvhd = b"\x00" * 12 + b"\x00\x00\x03\xe8" + b"\x00\x01\xe2\x40" + \
+            b"\x00" * 80
+        moov = b"\x00\x00\x00\x74moov\x00\x00\x00\x6cmvhd" + mvhd
+        data = b"\x00\x00\x00\x10ftypisomisom" + \
+            b"\x00\x1e\x84\x80mdat" + b"\x00" * 1999992 + moov
+        with LocalServer({"/1.m4a": (data, {})}) as server:
+            m = Media(server.url("/1.m4a"), len(data))
+            asyncio.run(m.afetch_duration(probe=True))
+        self.assertAlmostEqual(m.duration.total_seconds(), 123.456)
+        self.assertLess(server.bytes_sent, len(data) // 10)
+
+    def test_rssFile(self):
+        p = Podcast(name="Test", website="http://example.com",
+                    description="Testing", explicit=False,
+                    last_updated=datetime(2016, 1, 1, tzinfo=pytz.utc))
+        for i in range(20):
+            p.episodes.append(Episode(
+                title="Episode %d" % i,
+                media=Media("http://example.com/%d.mp3" % i, 1000),
+                publication_date=datetime(2016, 1, 1, tzinfo=pytz.utc) +
+                timedelta(days=i)))
+        fd, filename = tempfile.mkstemp(suffix=".rss")
+        os.close(fd)
+        try:
+            asyncio.run(p.arss_file(filename, minimize=True))
+            with open(filename, "rb") as fd:
+                self.assertEqual(fd.read(), p.rss_bytes(minimize=True))
+        finally:
+            os.remove(filename)
+
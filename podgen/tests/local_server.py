@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.local_server
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    A small HTTP server running in a background thread, which the tests use
+    in place of real media hosts.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LocalServer(object):
+    """Serve the files given in ``files`` on a random local port.
+
+    ``files`` maps paths to a tuple with the response body and a dictionary
+    of extra headers. Paths which aren't found give 404 Not Found. Simple
+    Range requests are supported unless ``accept_ranges`` is ``False``, with
+    ranges starting after the end giving 416 Range Not Satisfiable, and the
+    number of body bytes sent is counted in :attr:`bytes_sent`. Requests
+    with an If-None-Match header matching the file's ETag header give
+    304 Not Modified.
+
+    Every request is recorded in :attr:`requests` as a tuple with the method,
+    path, request headers, client address and request body, so tests can
+    check what was asked for and how many connections were used.
+
+    Use it as a context manager::
+
+        >>> with LocalServer({"/1.mp3": (b"data", {})}) as server:
+        ...     server.url("/1.mp3")
+    """
+
+    def __init__(self, files=None, accept_ranges=True):
+        self.files = files or {}
+        self.accept_ranges = accept_ranges
+        self.requests = []
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.respond(send_body=False)
+
+            def do_GET(self):
+                self.respond(send_body=True)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                server.record(self, body)
+                self.send_response(202)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def respond(self, send_body):
+                server.record(self)
+                try:
+                    body, headers = server.files[self.path]
+                except KeyError:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = headers.get("ETag")
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                status = 200
+                byte_range = self.headers.get("Range")
+                if byte_range and server.accept_ranges:
+                    start, end = byte_range.split("=", 1)[1].split("-")
+                    start = int(start)
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Range",
+                                         "bytes */%d" % len(body))
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    end = min(int(end), len(body) - 1)
+                    content_range = "bytes %d-%d/%d" % (start, end, len(body))
+                    body = body[start:end + 1]
+                    status = 206
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                if status == 206:
+                    self.send_header("Content-Range", content_range)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if send_body:
+                    server.bytes_sent += len(body)
+                    self.wfile.write(body)
+
+        self._httpd = _ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = None
+
+    def record(self, handler, body=None):
+        with self._lock:
+            self.requests.append((handler.command, handler.path,
+                                  dict(handler.headers), handler.client_address,
+                                  body))
+
+    def url(self, path):
+        return "http://127.0.0.1:%d%s" % (self._httpd.server_address[1], path)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_aio
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the asyncio versions of the methods of Media and Podcast. The tests
+    are found in podgen.tests.aio_cases, and are skipped before Python 3.7.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import sys
+import unittest
+
+if sys.version_info >= (3, 7):
+    from podgen.tests.aio_cases import AioTests
+else:
+    AioTests = object
+
+
+@unittest.skipIf(sys.version_info < (3, 7),
+                 "asyncio.run requires Python 3.7 or newer")
+class TestAio(AioTests, unittest.TestCase):
+    pass
+
+
+if __name__ == '__main__':
+    unittest.main()
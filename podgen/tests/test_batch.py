@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_batch
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test render_many, which generates many feeds using multiple processes.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import datetime
+import functools
+import os
+import shutil
+import tempfile
+import unittest
+
+import dateutil.tz
+
+from podgen import Podcast, render_many
+
+
+def create_podcast(name):
+    p = Podcast(name=name, website="http://example.com/%s" % name,
+                description="The %s podcast" % name, explicit=False)
+    p.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                       tzinfo=dateutil.tz.tzutc())
+    for i in range(3):
+        p.add_episode().title = "%s episode %d" % (name, i)
+    return p
+
+
+def failing_factory():
+    raise RuntimeError("Could not create podcast")
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_renderMany(self):
+        podcasts = [
+            ("one.rss", create_podcast("one")),
+            ("two.rss", functools.partial(create_podcast, "two")),
+            # Missing mandatory attributes
+            ("broken.rss", Podcast()),
+            ("failing.rss", failing_factory),
+        ]
+        results = render_many(podcasts, self.directory, workers=2,
+                              encoding="iso-8859-1")
+
+        self.assertEqual([r.filename for r in results],
+                         [os.path.join(self.directory, f) for f, _ in podcasts])
+        for name, result in zip(("one", "two"), results):
+            self.assertIsNone(result.error)
+            self.assertGreaterEqual(result.seconds, 0)
+            with open(result.filename, "rb") as fd:
+                self.assertEqual(fd.read(), create_podcast(name).rss_bytes(
+                    encoding="iso-8859-1"))
+
+        self.assertIsInstance(results[2].error, ValueError)
+        self.assertIsInstance(results[3].error, RuntimeError)
+        self.assertIn("Could not create podcast", results[3].traceback)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["one.rss", "two.rss"])
+
+    def test_renderManyDict(self):
+        results = render_many({"one.rss": create_podcast("one")},
+                              self.directory)
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0].error)
+        self.assertTrue(os.path.exists(os.path.join(self.directory,
+                                                    "one.rss")))
+
+
+if __name__ == '__main__':
+    unittest.main()
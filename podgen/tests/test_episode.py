@@ -38,20 +38,24 @@ class TestBaseEpisode(unittest.TestCase):
         fg.description = self.description
         fg.explicit = self.explicit
 
-        fe = fg.add_episode()
-        fe.id = 'http://lernfunk.de/media/654321/1'
-        fe.title = 'The First Episode'
-        self.fe = fe
-
-        #Use also the list directly
-        fe = Episode()
-        fg.episodes.append(fe)
-        fe.id = 'http://lernfunk.de/media/654321/1'
-        fe.title = 'The Second Episode'
-
-        fe = fg.add_episode()
-        fe.id = 'http://lernfunk.de/media/654321/1'
-        fe.title = 'The Third Episode'
+        # The episodes share their GUID on purpose
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", "More than one episode has the "
+                                              "GUID")
+            fe = fg.add_episode()
+            fe.id = 'http://lernfunk.de/media/654321/1'
+            fe.title = 'The First Episode'
+            self.fe = fe
+
+            #Use also the list directly
+            fe = Episode()
+            fg.episodes.append(fe)
+            fe.id = 'http://lernfunk.de/media/654321/1'
+            fe.title = 'The Second Episode'
+
+            fe = fg.add_episode()
+            fe.id = 'http://lernfunk.de/media/654321/1'
+            fe.title = 'The Third Episode'
 
         self.fg = fg
 
@@ -583,3 +587,54 @@ class TestBaseEpisode(unittest.TestCase):
         element = get_element()
         assert element is not None
         self.assertEqual(element.text, title)
+
+    def test_renderedItemIsCached(self):
+        rendered = []
+
+        class CountingEpisode(Episode):
+            def rss_entry(self):
+                rendered.append(self)
+                return super(CountingEpisode, self).rss_entry()
+
+        self.fg.episodes = [CountingEpisode(title="Episode %s" % i)
+                            for i in range(5)]
+        first = self.fg.rss_str()
+        self.assertEqual(len(rendered), 5)
+
+        # Nothing has changed, so nothing is rendered again
+        self.assertEqual(self.fg.rss_str(), first)
+        self.assertEqual(len(rendered), 5)
+
+        # Only the new episode is rendered
+        new_episode = self.fg.add_episode(CountingEpisode(title="New"))
+        self.fg.rss_str()
+        self.assertEqual(rendered[5:], [new_episode])
+
+        # Minimizing gives other bytes, so everything is rendered again
+        self.fg.rss_str(minimize=True)
+        self.assertEqual(len(rendered), 12)
+
+    def test_renderedItemIsInvalidated(self):
+        ep = self.fe
+        ep.media = Media("http://example.com/episodes/1.mp3", 1425345346)
+        ep.authors = [Person("John Doe")]
+
+        def get_item():
+            return etree.fromstring(self.fg.rss_str().encode("UTF-8"))\
+                .find("channel").find("item")
+
+        get_item()
+        ep.title = "A new title"
+        self.assertEqual(get_item().find("title").text, "A new title")
+
+        ep.explicit = True
+        self.assertEqual(get_item().find("{%s}explicit" % self.itunes_ns)
+                         .text, "Yes")
+
+        ep.media.duration = datetime.timedelta(minutes=3)
+        self.assertEqual(get_item().find("{%s}duration" % self.itunes_ns)
+                         .text, "03:00")
+
+        ep.authors.append(Person("Jane Doe"))
+        self.assertEqual(len(get_item().findall("{%s}creator" %
+                                                self.dublin_ns)), 2)
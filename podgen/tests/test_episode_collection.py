@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_episode_collection
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the EpisodeCollection class, which holds the episodes of a podcast.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import pickle
+import unittest
+import warnings
+from datetime import datetime, timedelta
+
+import pytz
+
+from podgen import Episode, EpisodeCollection, Media, Podcast
+
+
+class TestEpisodeCollection(unittest.TestCase):
+    def setUp(self):
+        self.start = datetime(2016, 1, 1, tzinfo=pytz.utc)
+        self.episodes = [
+            Episode(id="http://example.org/ep/%d" % i, title="Ep %d" % i,
+                    publication_date=self.start + timedelta(days=i))
+            for i in range(5)
+        ]
+        self.collection = EpisodeCollection(self.episodes)
+
+    def assertIndexed(self, collection):
+        """Check that the indexes match what is in the collection."""
+        for episode in collection:
+            self.assertIs(collection.get(episode.id), episode)
+        unique = dict((id(e), e) for e in collection).values()
+        dated = sorted((e for e in unique if e.publication_date),
+                       key=lambda e: e.publication_date, reverse=True)
+        self.assertEqual(collection.newest(len(collection)), dated)
+        if dated:
+            self.assertEqual(collection.latest_publication_date,
+                             dated[0].publication_date)
+        else:
+            self.assertIsNone(collection.latest_publication_date)
+        if collection._positions is not None:
+            first = {}
+            for i, episode in enumerate(collection):
+                first.setdefault(id(episode),
+                                 i + collection._position_base)
+            self.assertEqual(collection._positions, first)
+
+    def test_isList(self):
+        self.assertIsInstance(self.collection, list)
+        self.assertEqual(self.collection, self.episodes)
+        self.assertEqual(self.collection[1:3], self.episodes[1:3])
+
+    def test_get(self):
+        self.assertIs(self.collection.get("http://example.org/ep/3"),
+                      self.episodes[3])
+        self.assertIsNone(self.collection.get("http://example.org/ep/9"))
+        self.assertEqual(self.collection.get("nope", 1), 1)
+        self.assertTrue(self.collection.has_guid("http://example.org/ep/0"))
+        self.assertFalse(self.collection.has_guid("http://example.org/ep/9"))
+
+    def test_getByMediaUrl(self):
+        episode = Episode(media=Media("http://example.org/1.mp3", 1000))
+        self.collection.append(episode)
+        self.assertIs(self.collection.get("http://example.org/1.mp3"), episode)
+        # Episodes with id=False have no GUID
+        episode.id = False
+        self.assertIsNone(self.collection.get("http://example.org/1.mp3"))
+
+    def test_listOperations(self):
+        extra = [Episode(id="extra%d" % i) for i in range(4)]
+        c = self.collection
+        c.insert(0, extra[0])
+        c[1] = extra[1]
+        c[2:4] = [extra[2]]
+        c += [extra[3]]
+        del c[-2:]
+        c.pop(0)
+        c.remove(extra[1])
+        expected = [extra[2]] + self.episodes[3:4]
+        self.assertEqual(c, expected)
+        for episode in self.episodes + extra:
+            self.assertEqual(c.get(episode.id) is episode, episode in expected)
+        self.assertIndexed(c)
+
+        c *= 2
+        self.assertEqual(len(c), 4)
+        del c[0]
+        # The other reference to the episode is still there
+        self.assertIs(c.get(extra[2].id), extra[2])
+        self.assertIndexed(c)
+
+        c.clear()
+        self.assertEqual(c, [])
+        self.assertIndexed(c)
+
+    def test_sortDoesNotAffectIndexes(self):
+        self.collection.reverse()
+        self.collection.sort(key=lambda e: e.title)
+        self.assertIndexed(self.collection)
+
+    def test_duplicateGuidWarning(self):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            self.collection.append(Episode(id="http://example.org/ep/3"))
+            self.assertEqual(len(w), 1)
+            self.assertEqual(w[0].filename, __file__.replace(".pyc", ".py"))
+            # Also when the duplicate comes from a change to an episode
+            self.episodes[4].id = "http://example.org/ep/3"
+            self.assertEqual(len(w), 2)
+            self.assertEqual(w[1].filename, w[0].filename)
+            self.episodes[4].id = "http://example.org/ep/4"
+            # The same episode twice is fine
+            self.collection.append(self.episodes[0])
+            self.assertEqual(len(w), 2)
+        # The first one is returned
+        self.assertIs(self.collection.get("http://example.org/ep/3"),
+                      self.episodes[3])
+
+    def test_changesAreIndexed(self):
+        self.episodes[1].id = "http://example.org/ep/one"
+        self.assertIsNone(self.collection.get("http://example.org/ep/1"))
+        self.assertIs(self.collection.get("http://example.org/ep/one"),
+                      self.episodes[1])
+
+        self.episodes[0].publication_date = self.start + timedelta(days=10)
+        self.assertEqual(self.collection.newest(2),
+                         [self.episodes[0], self.episodes[4]])
+        self.episodes[4].publication_date = None
+        self.assertIndexed(self.collection)
+
+        # Episodes which have been removed are no longer tracked
+        removed = self.collection.pop()
+        removed.publication_date = self.start + timedelta(days=100)
+        self.assertIndexed(self.collection)
+
+    def test_newest(self):
+        self.assertEqual(self.collection.newest(2),
+                         [self.episodes[4], self.episodes[3]])
+        self.assertEqual(self.collection.newest(10), self.episodes[::-1])
+        self.assertEqual(self.collection.newest(0), [])
+        self.assertEqual(self.collection.latest_publication_date,
+                         self.start + timedelta(days=4))
+
+    def test_replace(self):
+        new = Episode(id="http://example.org/ep/2", title="New")
+        self.assertIs(self.collection.replace(new), self.episodes[2])
+        self.assertIs(self.collection[2], new)
+        self.assertEqual(len(self.collection), 5)
+        self.assertIsNone(self.collection.replace(Episode(id="new")))
+        self.assertEqual(len(self.collection), 6)
+        self.assertIndexed(self.collection)
+
+    def test_removeGuid(self):
+        removed = self.collection.remove_guid("http://example.org/ep/2")
+        self.assertIs(removed, self.episodes[2])
+        self.assertNotIn(removed, self.collection)
+        self.assertRaises(KeyError, self.collection.remove_guid,
+                          "http://example.org/ep/2")
+        self.assertIndexed(self.collection)
+
+    def test_positionsAreKept(self):
+        c = self.collection
+        c.replace(Episode(id="http://example.org/ep/1", title="New 1"))
+        positions = c._positions
+        self.assertIsNotNone(positions)
+        # Replacing and removing at the end doesn't build them again
+        c.replace(Episode(id="http://example.org/ep/3", title="New 3"))
+        c.remove_guid("http://example.org/ep/4")
+        c.append(Episode(id="http://example.org/ep/5"))
+        self.assertIs(c._positions, positions)
+        self.assertIndexed(c)
+
+        c.remove_guid("http://example.org/ep/0")
+        self.assertIndexed(c)
+        self.assertEqual([e.title for e in c][:3], ["New 1", "Ep 2", "New 3"])
+        self.assertIs(c.replace(Episode(id="http://example.org/ep/2")),
+                      self.episodes[2])
+        self.assertEqual(c[1].id, "http://example.org/ep/2")
+        self.assertIndexed(c)
+
+        # Inserting at the front or the end keeps them too
+        positions = c._positions
+        c.insert(0, Episode(id="http://example.org/ep/6"))
+        c.insert(0, Episode(id="http://example.org/ep/7"))
+        c.insert(len(c), Episode(id="http://example.org/ep/8"))
+        self.assertIs(c._positions, positions)
+        self.assertIndexed(c)
+        old = c[-2]
+        self.assertIs(c.replace(Episode(id="http://example.org/ep/5")), old)
+        self.assertEqual(c[2].id, "http://example.org/ep/1")
+        self.assertIndexed(c)
+        # Inserting in the middle builds them again
+        c.insert(-1, Episode(id="http://example.org/ep/9"))
+        self.assertIsNone(c._positions)
+        for guid in ("ep/6", "ep/9", "ep/7", "ep/8"):
+            c.remove_guid("http://example.org/" + guid)
+        self.assertIndexed(c)
+
+        # With more than one reference to the same episode
+        c.insert(0, c[2])
+        c.append(c[0])
+        self.assertIndexed(c)
+        self.assertEqual([e.title for e in c],
+                         ["New 3", "New 1", None, "New 3", None, "New 3"])
+        # The first reference is removed
+        c.remove_guid("http://example.org/ep/3")
+        self.assertIndexed(c)
+        c.pop()
+        self.assertIndexed(c)
+        c.remove_guid("http://example.org/ep/3")
+        self.assertFalse(c.has_guid("http://example.org/ep/3"))
+        self.assertIndexed(c)
+        c.reverse()
+        self.assertIs(c.remove_guid("http://example.org/ep/1").title, "New 1")
+        self.assertEqual([e.id for e in c], ["http://example.org/ep/5",
+                                             "http://example.org/ep/2"])
+        self.assertIndexed(c)
+
+    def test_pickle(self):
+        collection = pickle.loads(pickle.dumps(self.collection))
+        self.assertIsInstance(collection, EpisodeCollection)
+        self.assertEqual([e.id for e in collection],
+                         [e.id for e in self.episodes])
+        collection[0].id = "changed"
+        self.assertIs(collection.get("changed"), collection[0])
+        self.assertIndexed(collection)
+
+    def test_podcastEpisodes(self):
+        p = Podcast()
+        self.assertIsInstance(p.episodes, EpisodeCollection)
+        p.episodes = self.episodes
+        self.assertIsInstance(p.episodes, EpisodeCollection)
+        self.assertEqual(p.episodes, self.episodes)
+        p.episodes = self.collection
+        self.assertIs(p.episodes, self.collection)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_import
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test that slow dependencies are only imported when they are needed.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import json
+import subprocess
+import sys
+import unittest
+
+
+def _imported_after(code, modules):
+    """Run ``code`` in a new interpreter, and return which of ``modules``
+    were imported by then."""
+    script = "import sys, json\n%s\nprint(json.dumps([m for m in %r " \
+             "if m in sys.modules]))" % (code, modules)
+    output = subprocess.check_output([sys.executable, "-c", script])
+    return json.loads(output.decode("ascii"))
+
+
+class TestImport(unittest.TestCase):
+
+    def test_importIsLazy(self):
+        modules = ["requests", "tinytag", "dateutil.parser", "sqlite3",
+                   "brotli"]
+        self.assertEqual(_imported_after("import podgen", modules), [])
+        # Creating and generating a feed doesn't need them either
+        code = (
+            "import datetime, podgen, pytz\n"
+            "p = podgen.Podcast(name='n', website='http://example.com',\n"
+            "                   description='d', explicit=False)\n"
+            "p.episodes.append(podgen.Episode(title='t',\n"
+            "    media=podgen.Media('http://example.com/1.mp3', 1),\n"
+            "    publication_date=datetime.datetime.now(pytz.utc)))\n"
+            "p.rss_str()\n"
+        )
+        self.assertEqual(_imported_after(code, modules), [])
+        # Until they are used
+        code = "import podgen\n" \
+               "podgen.Episode(publication_date='2016-01-01 12:00+00:00')"
+        self.assertEqual(_imported_after(code, ["dateutil.parser"]),
+                         ["dateutil.parser"])
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     "Module __getattr__ requires Python 3.7")
+    def test_lazyAttributes(self):
+        code = "import podgen.media\npodgen.media.requests\n" \
+               "podgen.media.TinyTag\nimport podgen\npodgen.MediaCache"
+        self.assertEqual(_imported_after(code, ["requests", "tinytag",
+                                                "sqlite3"]),
+                         ["requests", "tinytag", "sqlite3"])
+        import podgen
+        self.assertIn("FeedServer", dir(podgen))
+        self.assertRaises(AttributeError, getattr, podgen, "NoSuchThing")
+        import podgen.media
+        self.assertRaises(AttributeError, getattr, podgen.media,
+                          "NoSuchThing")
+
+
+if __name__ == '__main__':
+    unittest.main()
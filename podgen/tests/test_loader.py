@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_loader
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the loading of existing RSS feeds into Podcast objects.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import io
+import unittest
+import warnings
+from datetime import datetime, timedelta
+
+import pytz
+import requests
+from lxml import etree
+
+from podgen import Podcast, Episode, Media, Person, Category
+from podgen.tests.local_server import LocalServer
+
+
+class TestLoader(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter("ignore")
+        self.start = datetime(2016, 1, 1, 12, tzinfo=pytz.utc)
+        self.podcast = Podcast(
+            name="Test Podcast",
+            website="http://example.com",
+            description="A podcast for testing",
+            explicit=False,
+            copyright="2016 Example",
+            language="en-US",
+            last_updated=self.start,
+            authors=[Person("John Doe", "john@example.org"),
+                     Person("Mary Sue")],
+            web_master=Person("Web Master", "web@example.org"),
+            owner=Person("Owner", "owner@example.org"),
+            category=Category("Technology", "Podcasting"),
+            image="http://example.com/image.jpg",
+            subtitle="Testing, testing",
+            feed_url="http://example.com/feed.rss",
+            pubsubhubbub="http://example.com/hub",
+            cloud=("example.com", 80, "/rpc", "notify", "xml-rpc"),
+            skip_days={"Saturday", "Sunday"},
+            skip_hours={0, 1, 2},
+            complete=True,
+            withhold_from_itunes=True,
+        )
+        for i in range(10):
+            self.podcast.episodes.append(Episode(
+                title="Episode %d" % i,
+                link="http://example.com/ep/%d" % i,
+                summary="Summary <b>%d</b>" % i,
+                long_summary="Long summary %d" % i if i % 2 else None,
+                media=Media("http://example.com/%d.mp3" % i, 1000 + i,
+                            "audio/mpeg",
+                            timedelta(minutes=30, seconds=i)),
+                id="http://example.com/guid/%d" % i if i % 3 else None,
+                publication_date=self.start - timedelta(days=i),
+                authors=[Person("Guest %d" % i, "guest@example.org")],
+                explicit=bool(i % 2),
+                image="http://example.com/ep%d.jpg" % i,
+                is_closed_captioned=bool(i % 2),
+                position=i,
+                subtitle="Subtitle %d" % i,
+                withhold_from_itunes=not i,
+            ))
+        self.podcast.episodes.append(Episode(title="Without media"))
+
+    def test_roundTrip(self):
+        rss = self.podcast.rss_bytes()
+        loaded = Podcast.from_rss(rss)
+        loaded.last_updated = self.start
+        self.assertEqual(loaded.rss_bytes(), rss)
+        self.assertIsNone(loaded.publication_date)
+        self.assertEqual(loaded.episodes[3].media.duration,
+                         timedelta(minutes=30, seconds=3))
+        # Episodes whose GUID is the media's URL keep following it
+        self.assertIsNone(loaded.episodes[0].id)
+
+    def test_fromFile(self):
+        rss = self.podcast.rss_bytes(minimize=True)
+        loaded = Podcast.from_file(io.BytesIO(rss))
+        loaded.last_updated = self.start
+        self.assertEqual(loaded.rss_bytes(minimize=True), rss)
+
+    def test_fromUrl(self):
+        rss = self.podcast.rss_bytes()
+        with LocalServer({"/feed.rss": (rss, {})}) as server:
+            loaded = Podcast.from_file(server.url("/feed.rss"))
+            self.assertRaises(requests.HTTPError, Podcast.from_file,
+                              server.url("/missing.rss"))
+        loaded.last_updated = self.start
+        self.assertEqual(loaded.rss_bytes(), rss)
+
+    def test_xsltIsNotRead(self):
+        self.podcast.xslt = "http://example.com/feed.xsl"
+        loaded = Podcast.from_rss(self.podcast.rss_bytes())
+        self.assertIsNone(loaded.xslt)
+
+    def test_fromStr(self):
+        loaded = Podcast.from_rss(self.podcast.rss_str())
+        self.assertEqual(loaded.name, "Test Podcast")
+        self.assertEqual(len(loaded.episodes), 11)
+
+    def test_newest(self):
+        self.podcast.episodes.reverse()
+        rss = self.podcast.rss_bytes()
+        loaded = Podcast.from_rss(rss, newest=3)
+        # The newest episodes, in the order they have in the feed
+        self.assertEqual([e.title for e in loaded.episodes],
+                         ["Episode 2", "Episode 1", "Episode 0"])
+        # Episodes without a publication date are the oldest
+        loaded = Podcast.from_rss(rss, newest=10)
+        self.assertNotIn("Without media", [e.title for e in loaded.episodes])
+        loaded = Podcast.from_rss(rss, newest=11)
+        self.assertEqual(loaded.episodes[0].title, "Without media")
+        self.assertEqual(len(Podcast.from_rss(rss, newest=0).episodes), 0)
+
+    def test_episodeClass(self):
+        class MyEpisode(Episode):
+            pass
+
+        class MyPodcast(Podcast):
+            def __init__(self, *args, **kwargs):
+                super(MyPodcast, self).__init__(*args, **kwargs)
+                self.episode_class = MyEpisode
+
+        loaded = MyPodcast.from_rss(self.podcast.rss_bytes())
+        self.assertIsInstance(loaded, MyPodcast)
+        self.assertIsInstance(loaded.episodes[0], MyEpisode)
+
+    def test_foreignFeed(self):
+        rss = b"""<?xml version="1.0"?>
+        <rss version="2.0"
+             xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">
+          <channel>
+            <title>Foreign</title>
+            <link>http://example.org</link>
+            <itunes:summary>Described by iTunes</itunes:summary>
+            <itunes:explicit>clean</itunes:explicit>
+            <itunes:author>Someone</itunes:author>
+            <itunes:category text="No such category"/>
+            <image><url>http://example.org/logo.png</url></image>
+            <pubDate>Not a date</pubDate>
+            <item>
+              <title>Only item</title>
+              <itunes:summary>Item summary</itunes:summary>
+              <itunes:duration>1:02:03</itunes:duration>
+              <enclosure url="http://example.org/1.mp3" length=""
+                         type="audio/mpeg"/>
+              <pubDate>Fri, 01 Jan 2016 12:00:00 GMT</pubDate>
+              <author>someone@example.org (Someone)</author>
+            </item>
+          </channel>
+        </rss>"""
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            loaded = Podcast.from_rss(rss)
+            # The category and pubDate were ignored
+            self.assertTrue(any("category" in str(x.message) for x in w))
+            self.assertTrue(any("Not a date" in str(x.message) for x in w))
+        self.assertEqual(loaded.description, "Described by iTunes")
+        self.assertIs(loaded.explicit, False)
+        self.assertEqual(loaded.authors[0].name, "Someone")
+        self.assertIsNone(loaded.category)
+        self.assertEqual(loaded.image, "http://example.org/logo.png")
+        episode = loaded.episodes[0]
+        self.assertEqual(episode.summary, "Item summary")
+        self.assertEqual(episode.media.duration,
+                         timedelta(hours=1, minutes=2, seconds=3))
+        self.assertEqual(episode.media.size, 0)
+        self.assertEqual(episode.publication_date, self.start)
+        self.assertEqual(episode.authors[0].email, "someone@example.org")
+        self.assertEqual(episode.authors[0].name, "Someone")
+        # It can be generated again
+        etree.XML(loaded.rss_bytes())
+
+    def test_notRss(self):
+        self.assertRaises(ValueError, Podcast.from_rss,
+                          b"<html><body>Hi</body></html>")
+        self.assertRaises(etree.XMLSyntaxError, Podcast.from_rss,
+                          b"<rss><channel>")
+
+    def test_entitiesAreNotResolved(self):
+        rss = b"""<?xml version="1.0"?>
+        <!DOCTYPE rss [<!ENTITY secret SYSTEM "file:///etc/passwd">]>
+        <rss version="2.0"><channel><title>&secret;</title></channel></rss>"""
+        loaded = Podcast.from_rss(rss)
+        self.assertFalse(loaded.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@
     :license: FreeBSD and LGPL, see license.* for more details.
 """
 import os
+import shutil
 import tempfile
 
 import pickle
@@ -21,6 +22,7 @@ import io
 
 from podgen import Media, NotSupportedByItunesWarning
 import podgen.media
+from podgen.tests.local_server import LocalServer
 
 
 class TestMedia(unittest.TestCase):
@@ -250,6 +252,27 @@ class TestMedia(unittest.TestCase):
         self.assertEqual(m.type, type)
         self.assertEqual(m.duration, self.duration)
 
+    def test_createManyFromServerResponses(self):
+        files = {}
+        for i in range(20):
+            files["/%d.mp3" % i] = (b"x" * (1000 + i),
+                                    {"Content-Type": "audio/mpeg"})
+        with LocalServer(files) as server:
+            urls = [server.url("/%d.mp3" % i) for i in range(20)]
+            urls.insert(5, server.url("/missing.mp3"))
+            media = Media.create_many_from_server_responses(urls,
+                                                            max_workers=4)
+
+        self.assertEqual(len(media), len(urls))
+        self.assertIsInstance(media.pop(5), Exception)
+        for i, m in enumerate(media):
+            self.assertEqual(m.url, server.url("/%d.mp3" % i))
+            self.assertEqual(m.size, 1000 + i)
+            self.assertEqual(m.type, "audio/mpeg")
+        # Only HEAD requests are made, and connections are kept alive
+        self.assertEqual(set(r[0] for r in server.requests), {"HEAD"})
+        self.assertLessEqual(len(set(r[3] for r in server.requests)), 4)
+
     @mock.patch("os.remove", autospec=True)
     @mock.patch("podgen.media.tempfile.NamedTemporaryFile", autospec=True)
     @mock.patch("podgen.media.TinyTag", autospec=True)
@@ -293,6 +316,118 @@ class TestMedia(unittest.TestCase):
         mock_rm.assert_called_once_with(mock_open.return_value.
                                         __enter__.return_value.name)
 
+    def test_probeDuration(self):
+        # An MP4 file whose moov box is placed after its media data
+        mvhd = b"\x00" * 12 + b"\x00\x00\x03\xe8" + b"\x00\x01\xe2\x40" + \
+            b"\x00" * 80
+        moov = b"\x00\x00\x00\x74moov\x00\x00\x00\x6cmvhd" + mvhd
+        data = b"\x00\x00\x00\x10ftypisomisom" + \
+            b"\x00\x1e\x84\x80mdat" + b"\x00" * 1999992 + moov
+        with LocalServer({"/1.m4a": (data, {})}) as server:
+            m = Media(server.url("/1.m4a"), len(data))
+            m.fetch_duration(probe=True)
+        self.assertAlmostEqual(m.duration.total_seconds(), 123.456)
+        self.assertLess(server.bytes_sent, len(data) // 10)
+
+    @mock.patch("podgen.media.TinyTag", autospec=True)
+    def test_probeDurationFallback(self, mock_tinytag):
+        mock_tinytag.get.return_value.duration = 60
+        data = b"\x00\x00\x00\x10ftypisomisom" + b"\x00" * 100000
+        with LocalServer({"/1.m4a": (data, {})},
+                         accept_ranges=False) as server:
+            m = Media(server.url("/1.m4a"), len(data))
+            m.fetch_duration(probe=True)
+        self.assertEqual(m.duration, timedelta(seconds=60))
+        # The whole file was downloaded after all
+        self.assertEqual(server.requests[-1][0], "GET")
+        self.assertNotIn("Range", server.requests[-1][2])
+
+    @mock.patch("podgen.media.TinyTag", autospec=True)
+    def test_probeDurationFallbackTruncated(self, mock_tinytag):
+        mock_tinytag.get.return_value.duration = 60
+        # The moov box at the end is cut off before the mvhd box's duration
+        data = b"\x00\x00\x00\x10ftypisomisom" + \
+            b"\x00\x01\x86\xa0mdat" + b"\x00" * 99992 + \
+            b"\x00\x00\x00\x74moov\x00\x00\x00\x6cmvhd" + b"\x00" * 4
+        with LocalServer({"/1.m4a": (data, {})}) as server:
+            m = Media(server.url("/1.m4a"), len(data))
+            m.fetch_duration(probe=True)
+        self.assertEqual(m.duration, timedelta(seconds=60))
+        self.assertNotIn("Range", server.requests[-1][2])
+
+    def test_scanDirectory(self):
+        directory = tempfile.mkdtemp()
+        try:
+            # MPEG 1 layer III, 128 kbit/s, 44100 Hz, 300 frames of 417 bytes
+            frame = b"\xff\xfb\x90\x00" + b"\x00" * 413
+            with open(os.path.join(directory, "ep 1.mp3"), "wb") as fd:
+                fd.write(frame * 300)
+            os.mkdir(os.path.join(directory, "old"))
+            with open(os.path.join(directory, "old", "ep0.M4A"), "wb") as fd:
+                fd.write(b"not really audio")
+            for name in (".ep2.mp3", "notes.txt", "README"):
+                with open(os.path.join(directory, name), "wb") as fd:
+                    fd.write(b"x")
+            cache = podgen.MediaCache(os.path.join(directory, ".cache"))
+
+            media = Media.scan_directory(directory, "http://example.com/ep",
+                                         cache=cache)
+            self.assertEqual([m.url for m in media], [
+                "http://example.com/ep/ep%201.mp3",
+                "http://example.com/ep/old/ep0.M4A",
+            ])
+            self.assertEqual([m.size for m in media], [300 * 417, 16])
+            self.assertEqual([m.type for m in media],
+                             ["audio/mpeg", "audio/x-m4a"])
+            self.assertAlmostEqual(media[0].duration.total_seconds(),
+                                   300 * 1152 / 44100.0, places=2)
+            self.assertIsNone(media[1].duration)
+
+            # Unchanged files aren't analyzed again, not even the one whose
+            # duration couldn't be found
+            with mock.patch("podgen.media._read_duration",
+                            return_value=None) as mock_read:
+                media = Media.scan_directory(directory,
+                                             "http://example.com/ep/",
+                                             cache=cache)
+            self.assertEqual(mock_read.call_count, 0)
+            self.assertAlmostEqual(media[0].duration.total_seconds(),
+                                   300 * 1152 / 44100.0, places=2)
+            self.assertIsNone(media[1].duration)
+
+            # Changed files are
+            with open(os.path.join(directory, "old", "ep0.M4A"), "ab") as fd:
+                fd.write(b"more")
+            with mock.patch("podgen.media._read_duration",
+                            return_value=60.0) as mock_read:
+                media = Media.scan_directory(directory,
+                                             "http://example.com/ep/",
+                                             cache=cache)
+            mock_read.assert_called_once_with(
+                os.path.join(os.path.abspath(directory), "old", "ep0.M4A"))
+            self.assertEqual(media[1].duration, timedelta(seconds=60))
+            cache.close()
+        finally:
+            shutil.rmtree(directory)
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "Symbolic links are needed")
+    def test_scanDirectorySymlinkLoop(self):
+        directory = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(directory, "season 1"))
+            with open(os.path.join(directory, "season 1", "ep1.pdf"),
+                      "wb") as fd:
+                fd.write(b"%PDF-1.4")
+            os.symlink(directory, os.path.join(directory, "season 1", "all"))
+            os.symlink(os.path.join(directory, "season 1"),
+                       os.path.join(directory, "latest"))
+            media = Media.scan_directory(directory, "http://example.com/")
+            # Each directory is scanned once, by whichever path is found first
+            self.assertEqual(len(media), 1)
+            self.assertTrue(media[0].url.endswith("/ep1.pdf"))
+        finally:
+            shutil.rmtree(directory)
+
     def test_downloadMedia(self):
         class MyLittleRequests(object):
             @staticmethod
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_media_cache
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the MediaCache class, which remembers information about media files
+    between runs.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import timedelta
+
+import mock
+import requests
+
+from podgen import Media, MediaCache
+from podgen.tests.local_server import LocalServer
+
+
+class TestMediaCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "media.sqlite")
+        self.files = {
+            "/1.mp3": (b"x" * 1000, {"Content-Type": "audio/mpeg",
+                                     "ETag": '"v1"'}),
+            "/2.mp3": (b"x" * 2000, {"Content-Type": "audio/mpeg"}),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_createFromServerResponse(self):
+        with LocalServer(self.files) as server:
+            with MediaCache(self.path) as cache:
+                m = Media.create_from_server_response(server.url("/1.mp3"),
+                                                      cache=cache)
+            self.assertEqual(m.size, 1000)
+            self.assertEqual(m.type, "audio/mpeg")
+            self.assertEqual(len(server.requests), 1)
+
+            # A new cache using the same file makes no requests
+            with MediaCache(self.path) as cache:
+                m = Media.create_from_server_response(server.url("/1.mp3"),
+                                                      cache=cache)
+            self.assertEqual(m.size, 1000)
+            self.assertEqual(len(server.requests), 1)
+
+    def test_fetchDurationIsCached(self):
+        with LocalServer(self.files) as server:
+            url = server.url("/1.mp3")
+            with MediaCache(self.path) as cache, \
+                    mock.patch("podgen.media.TinyTag") as mock_tinytag:
+                mock_tinytag.get.return_value.duration = 60
+                m = Media.create_from_server_response(url, cache=cache)
+                m.fetch_duration(cache=cache)
+                self.assertEqual(m.duration, timedelta(seconds=60))
+
+            with MediaCache(self.path) as cache, \
+                    mock.patch("podgen.media.TinyTag") as mock_tinytag:
+                m = Media.create_from_server_response(url, cache=cache)
+                self.assertEqual(m.duration, timedelta(seconds=60))
+                m.fetch_duration(cache=cache)
+                self.assertFalse(mock_tinytag.get.called)
+            self.assertEqual(m.duration, timedelta(seconds=60))
+            # One HEAD request and one download
+            self.assertEqual([r[0] for r in server.requests], ["HEAD", "GET"])
+
+    def test_revalidation(self):
+        with LocalServer(self.files) as server:
+            url = server.url("/1.mp3")
+            with MediaCache(self.path, max_age=timedelta(0)) as cache:
+                cache.lookup(url, requests)
+                cache.store_duration(url, timedelta(seconds=60))
+                # The file hasn't changed
+                self.assertEqual(cache.lookup(url, requests).duration,
+                                 timedelta(seconds=60))
+                self.assertEqual(server.requests[-1][2]["If-None-Match"],
+                                 '"v1"')
+
+                # The file has changed
+                self.files["/1.mp3"] = (b"y" * 1500,
+                                        {"Content-Type": "audio/mpeg",
+                                         "ETag": '"v2"'})
+                cached = cache.lookup(url, requests)
+                self.assertEqual(cached.size, 1500)
+                self.assertIsNone(cached.duration)
+            self.assertEqual(len(server.requests), 3)
+
+    def test_revalidationWithoutConditionalRequests(self):
+        with LocalServer(self.files) as server:
+            url = server.url("/2.mp3")
+            with MediaCache(self.path, max_age=timedelta(0)) as cache:
+                cache.lookup(url, requests)
+                cache.store_duration(url, timedelta(seconds=60))
+                # Same Content-Length, so it is assumed to be the same file
+                self.assertEqual(cache.lookup(url, requests).duration,
+                                 timedelta(seconds=60))
+                self.files["/2.mp3"] = (b"y" * 2500, {})
+                self.assertIsNone(cache.lookup(url, requests).duration)
+
+    def test_maxEntries(self):
+        files = dict(("/%d.mp3" % i, (b"x" * i, {"Content-Type": "audio/mpeg"}))
+                     for i in range(1, 6))
+        with LocalServer(files) as server:
+            with MediaCache(self.path, max_entries=3) as cache:
+                for i in range(1, 6):
+                    cache.lookup(server.url("/%d.mp3" % i), requests)
+            with MediaCache(self.path, max_entries=3) as cache:
+                for i in (3, 4, 5):
+                    cache.lookup(server.url("/%d.mp3" % i), requests)
+                self.assertEqual(len(server.requests), 5)
+                cache.lookup(server.url("/1.mp3"), requests)
+                self.assertEqual(len(server.requests), 6)
+
+    def test_ttl(self):
+        with LocalServer(self.files) as server:
+            url = server.url("/1.mp3")
+            with MediaCache(self.path) as cache:
+                cache.lookup(url, requests)
+            with mock.patch("podgen.media_cache.time.time",
+                            return_value=os.path.getmtime(self.path) + 3600):
+                with MediaCache(self.path, ttl=timedelta(minutes=1)) as cache:
+                    cache.lookup(url, requests)
+            self.assertEqual(len(server.requests), 2)
+
+    def test_createManyFromServerResponses(self):
+        with LocalServer(self.files) as server:
+            urls = [server.url("/1.mp3"), server.url("/2.mp3")]
+            with MediaCache(self.path) as cache:
+                Media.create_many_from_server_responses(urls, cache=cache)
+                media = Media.create_many_from_server_responses(urls,
+                                                                cache=cache)
+            self.assertEqual([m.size for m in media], [1000, 2000])
+            self.assertEqual(len(server.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
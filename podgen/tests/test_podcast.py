@@ -14,10 +14,17 @@ import warnings
 
 from lxml import etree
 import tempfile
+import gzip
+import hashlib
 import os
+import io
+import shutil
+import threading
+import mock
 from future.utils import raise_from
 
-from podgen import NotSupportedByItunesWarning, Person, Category, Podcast
+from podgen import NotSupportedByItunesWarning, Person, Category, Podcast, \
+    Episode, Media
 import podgen.version
 import datetime
 import dateutil.tz
@@ -204,6 +211,57 @@ class TestPodcast(unittest.TestCase):
         rss_file = self.getRssFeedFileContents(self.fg)
         self.assertEqual(rss_string, rss_file)
 
+    def test_rssBytes(self):
+        self.fg.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                                 tzinfo=dateutil.tz.tzutc())
+        rss_bytes = self.fg.rss_bytes()
+        self.assertIsInstance(rss_bytes, bytes)
+        self.assertEqual(rss_bytes.decode("UTF-8"), self.fg.rss_str())
+        self.checkRssString(rss_bytes)
+
+        rss_bytes = self.fg.rss_bytes(encoding="UTF-16")
+        self.assertEqual(rss_bytes.decode("UTF-16"),
+                         self.fg.rss_str(encoding="UTF-16"))
+        self.checkRssString(rss_bytes)
+        assert "<?xml-stylesheet" in rss_bytes.decode("UTF-16")
+
+    def test_rssFileObjects(self):
+        self.fg.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                                 tzinfo=dateutil.tz.tzutc())
+        binary_file = io.BytesIO()
+        self.fg.rss_file(binary_file, encoding="iso-8859-1")
+        self.assertEqual(binary_file.getvalue(),
+                         self.fg.rss_bytes(encoding="iso-8859-1"))
+
+        text_file = io.StringIO()
+        self.fg.rss_file(text_file)
+        self.assertEqual(text_file.getvalue(), self.fg.rss_str())
+
+    def test_rssStreamEqualsRssStr(self):
+        self.fg.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                                 tzinfo=dateutil.tz.tzutc())
+        self.fg.authors = [Person("Lars Kiesow", "lkiesow@uos.de")]
+        self.fg.xslt = "http://example.com/stylesheet.xsl"
+        ep = self.fg.add_episode()
+        ep.title = u"Ærlig talt – an episode with <odd> characters"
+        ep.summary = "Several\nlines of <b>summary</b>"
+        ep.long_summary = "An even longer summary"
+        ep.authors = [Person("John Doe"), Person(email="jane@example.org")]
+        ep.media = Media("http://example.com/episodes/1.mp3", 1425345346,
+                         duration=datetime.timedelta(minutes=32))
+        ep.publication_date = datetime.datetime(2016, 6, 7, 13, 37, 0,
+                                                tzinfo=dateutil.tz.tzutc())
+        ep.explicit = True
+        ep.position = 1
+
+        for options in ({}, {'minimize': True}, {'xml_declaration': False},
+                        {'encoding': 'iso-8859-1'}):
+            fd = io.BytesIO()
+            self.fg.rss_stream(fd, **options)
+            encoding = options.get('encoding', 'UTF-8')
+            self.assertEqual(fd.getvalue().decode(encoding),
+                             self.fg.rss_str(**options))
+
     def checkRssString(self, rssString):
         feed = etree.fromstring(rssString)
         nsRss = self.nsContent
@@ -257,6 +315,229 @@ class TestPodcast(unittest.TestCase):
         assert channel.find("{%s}new-feed-url" % self.nsItunes).text == \
             self.new_feed_url
 
+    def test_maxEpisodes(self):
+        start = datetime.datetime(2016, 1, 1, tzinfo=dateutil.tz.tzutc())
+        # Out of order on purpose, and one without a publication date
+        days = [3, 0, None, 4, 1, 2]
+        for i, day in enumerate(days):
+            ep = self.fg.add_episode()
+            ep.title = "Episode %d" % i
+            if day is not None:
+                ep.publication_date = start + datetime.timedelta(days=day)
+
+        def rendered_titles():
+            channel = etree.XML(self.fg.rss_bytes()).find("channel")
+            return [t.text for t in channel.findall("item/title")]
+
+        self.fg.max_episodes = 3
+        self.assertEqual(rendered_titles(),
+                         ["Episode 0", "Episode 3", "Episode 5"])
+        self.assertEqual(len(self.fg.episodes), 6)
+        # The same episodes are used by the tree
+        channel = self.fg._create_rss().find("channel")
+        self.assertEqual([t.text for t in channel.findall("item/title")],
+                         ["Episode 0", "Episode 3", "Episode 5"])
+        pubDate = dateutil.parser.parse(channel.find("pubDate").text)
+        self.assertEqual(pubDate, start + datetime.timedelta(days=4))
+
+        # Undated episodes fill up the remaining places
+        self.fg.max_episodes = 6
+        self.assertEqual(len(rendered_titles()), 6)
+        self.fg.max_episodes = None
+        self.assertEqual(len(rendered_titles()), 6)
+        self.fg.max_episodes = 0
+        self.assertEqual(rendered_titles(), [])
+
+    def addDatedEpisodes(self, count, start_day=0):
+        start = datetime.datetime(2016, 1, 1, tzinfo=dateutil.tz.tzutc())
+        for day in range(start_day, start_day + count):
+            ep = self.fg.add_episode()
+            ep.title = "Episode %d" % day
+            ep.publication_date = start + datetime.timedelta(days=day)
+
+    def test_rssPage(self):
+        self.addDatedEpisodes(7)
+        archive_url = "http://example.com/feeds/myfeed-%d.rss"
+        atom = "{http://www.w3.org/2005/Atom}"
+        fh_archive = "{http://purl.org/syndication/history/1.0}archive"
+
+        def parse(number):
+            rss = self.fg.rss_page(number, 3, archive_url)
+            channel = etree.XML(rss).find("channel")
+            links = dict((l.get("rel"), l.get("href"))
+                         for l in channel.findall(atom + "link"))
+            titles = [t.text for t in channel.findall("item/title")]
+            return channel, links, titles
+
+        channel, links, titles = parse(0)
+        self.assertEqual(titles, ["Episode 6"])
+        self.assertEqual(links["self"], self.feed_url)
+        self.assertEqual(links["prev-archive"], archive_url % 2)
+        self.assertEqual(links["next"], archive_url % 2)
+        self.assertIsNone(channel.find(fh_archive))
+
+        channel, links, titles = parse(2)
+        self.assertEqual(titles, ["Episode 3", "Episode 4", "Episode 5"])
+        self.assertEqual(links["self"], archive_url % 2)
+        self.assertEqual(links["current"], self.feed_url)
+        self.assertEqual(links["prev-archive"], archive_url % 1)
+        self.assertEqual(links["previous"], self.feed_url)
+        self.assertNotIn("next-archive", links)
+        self.assertIsNotNone(channel.find(fh_archive))
+        # The archive page doesn't depend on when it is generated
+        self.assertEqual(channel.find("lastBuildDate").text,
+                         channel.find("pubDate").text)
+
+        channel, links, titles = parse(1)
+        self.assertEqual(titles, ["Episode 0", "Episode 1", "Episode 2"])
+        self.assertEqual(links["next-archive"], archive_url % 2)
+        self.assertNotIn("prev-archive", links)
+
+        self.assertRaises(IndexError, self.fg.rss_page, 3, 3, archive_url)
+        self.assertRaises(ValueError, self.fg.rss_page, 0, 0, archive_url)
+        self.fg.feed_url = None
+        self.assertRaises(ValueError, self.fg.rss_page, 0, 3, archive_url)
+
+    def test_rssPageFiles(self):
+        self.addDatedEpisodes(7)
+        self.fg.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                                 tzinfo=dateutil.tz.tzutc())
+        directory = tempfile.mkdtemp()
+        try:
+            current = os.path.join(directory, "feed.rss")
+            archive = os.path.join(directory, "feed-%d.rss")
+            archive_url = "http://example.com/feeds/myfeed-%d.rss"
+            self.assertEqual(
+                self.fg.rss_page_files(current, archive, 3, archive_url),
+                [current, archive % 1, archive % 2])
+            with open(archive % 2, "rb") as fd:
+                self.assertEqual(fd.read(),
+                                 self.fg.rss_page(2, 3, archive_url))
+
+            # Archive pages which exist already are skipped, except the one
+            # which now links to a new page
+            self.addDatedEpisodes(3, start_day=7)
+            self.assertEqual(
+                self.fg.rss_page_files(current, archive, 3, archive_url),
+                [current, archive % 2, archive % 3])
+            for number in range(4):
+                with open(archive % number if number else current,
+                          "rb") as fd:
+                    self.assertEqual(fd.read(), self.fg.rss_page(
+                        number, 3, archive_url))
+            with open(current, "rb") as fd:
+                self.assertEqual(fd.read(),
+                                 self.fg.rss_page(0, 3, archive_url))
+            self.assertEqual(len(self.fg.rss_page_files(
+                current, archive, 3, archive_url, overwrite_archives=True)), 4)
+            self.assertEqual(len(os.listdir(directory)), 4)
+        finally:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+
+    def test_rssFileCompressed(self):
+        self.fg.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                                 tzinfo=dateutil.tz.tzutc())
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "feed.rss")
+            self.fg.rss_file(filename, gzip_level=9)
+            with open(filename, "rb") as fd:
+                self.assertEqual(fd.read(), self.fg.rss_bytes())
+            with gzip.open(filename + ".gz", "rb") as fd:
+                self.assertEqual(fd.read(), self.fg.rss_bytes())
+
+            self.assertRaises(ValueError, self.fg.rss_file, io.BytesIO(),
+                              gzip_level=9)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_lastEtag(self):
+        self.assertIsNone(self.fg.last_etag)
+        self.fg.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                                 tzinfo=dateutil.tz.tzutc())
+        rss = self.fg.rss_bytes()
+        self.assertEqual(self.fg.last_etag,
+                         '"%s"' % hashlib.sha256(rss).hexdigest())
+        self.fg.rss_stream(io.BytesIO(), minimize=True)
+        self.assertEqual(
+            self.fg.last_etag,
+            '"%s"' % hashlib.sha256(self.fg.rss_bytes(minimize=True))
+            .hexdigest())
+        self.assertRaises(AttributeError, setattr, self.fg, "last_etag", "x")
+
+    def test_rssFileOnlyIfChanged(self):
+        self.fg.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                                 tzinfo=dateutil.tz.tzutc())
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "feed.rss")
+            self.assertTrue(self.fg.rss_file(filename, only_if_changed=True,
+                                             gzip_level=9))
+            # The file is read to find its hash, since its mtime changed
+            os.utime(filename, (0, 0))
+            self.assertFalse(self.fg.rss_file(filename, only_if_changed=True,
+                                              gzip_level=9))
+            self.assertEqual(os.stat(filename).st_mtime, 0)
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ["feed.rss", "feed.rss.gz"])
+
+            self.fg.name = "Changed"
+            self.assertTrue(self.fg.rss_file(filename, only_if_changed=True))
+            with open(filename, "rb") as fd:
+                self.assertEqual(fd.read(), self.fg.rss_bytes())
+
+            # Changes made by others are noticed
+            with open(filename, "wb") as fd:
+                fd.write(b"Something else")
+            self.assertTrue(self.fg.rss_file(filename, only_if_changed=True))
+
+            self.assertRaises(ValueError, self.fg.rss_file, io.BytesIO(),
+                              only_if_changed=True)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_appendToFile(self):
+        self.fg.deterministic = True
+        self.addDatedEpisodes(3)
+        self.fg.episodes.reverse()
+        directory = tempfile.mkdtemp()
+        try:
+            for minimize in (False, True):
+                filename = os.path.join(directory, "feed.rss")
+                self.fg.rss_file(filename, minimize=minimize)
+                new = [Episode(
+                    title="Episode %d" % day,
+                    publication_date=datetime.datetime(
+                        2016, 2, day, tzinfo=dateutil.tz.tzutc()))
+                    for day in (2, 1)]
+                self.fg.append_to_file(filename, new, minimize=minimize)
+                self.fg.episodes[0:0] = new
+                with open(filename, "rb") as fd:
+                    self.assertEqual(fd.read(),
+                                     self.fg.rss_bytes(minimize=minimize))
+                self.assertEqual(
+                    self.fg.last_etag, '"%s"' % hashlib.sha256(
+                        self.fg.rss_bytes(minimize=minimize)).hexdigest())
+                del self.fg.episodes[0:2]
+
+            # The first episodes can be added too
+            self.fg.episodes.clear()
+            self.fg.rss_file(filename)
+            self.fg.append_to_file(filename, new)
+            with open(filename, "rb") as fd:
+                items = etree.XML(fd.read()).find("channel").findall("item")
+            self.assertEqual([i.find("title").text for i in items],
+                             ["Episode 2", "Episode 1"])
+
+            with open(filename, "wb") as fd:
+                fd.write(b"<html></html>")
+            self.assertRaises(ValueError, self.fg.append_to_file, filename,
+                              new)
+        finally:
+            shutil.rmtree(directory)
+
     def test_feedUrlValidation(self):
         self.assertRaises(ValueError, setattr, self.fg, "feed_url",
                           "example.com/feed.rss")
@@ -320,6 +601,40 @@ class TestPodcast(unittest.TestCase):
         lastBuildDate = getLastBuildDateElement(self.fg)
         assert lastBuildDate is None
 
+    def test_deterministic(self):
+        self.fg.deterministic = True
+        channel = self.fg._create_rss().find("channel")
+        # No dates to use
+        self.assertIsNone(channel.find("lastBuildDate"))
+
+        self.addDatedEpisodes(3)
+        rss = self.fg.rss_bytes()
+        with mock.patch("podgen.podcast.datetime") as mock_datetime:
+            # The time of generation isn't used
+            mock_datetime.now.side_effect = AssertionError
+            self.assertEqual(self.fg.rss_bytes(), rss)
+        channel = etree.XML(rss).find("channel")
+        self.assertEqual(
+            dateutil.parser.parse(channel.find("lastBuildDate").text),
+            datetime.datetime(2016, 1, 3, tzinfo=dateutil.tz.tzutc()))
+
+        # last_updated still takes precedence
+        date = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                 tzinfo=dateutil.tz.tzutc())
+        self.fg.last_updated = date
+        channel = self.fg._create_rss().find("channel")
+        self.assertEqual(
+            dateutil.parser.parse(channel.find("lastBuildDate").text), date)
+
+    def test_skipDaysAndHoursAreSorted(self):
+        self.fg.skip_days = {"sunday", "Friday", "MONDAY", "Wednesday"}
+        self.fg.skip_hours = {23, 0, 12, 5}
+        channel = self.fg._create_rss().find("channel")
+        self.assertEqual([d.text for d in channel.find("skipDays")],
+                         ["Monday", "Wednesday", "Friday", "Sunday"])
+        self.assertEqual([h.text for h in channel.find("skipHours")],
+                         ["0", "5", "12", "23"])
+
     def test_AuthorEmail(self):
         # Just email - so use managingEditor, not dc:creator or itunes:author
         # This is per the RSS best practices, see the section about dc:creator
@@ -506,12 +821,77 @@ class TestPodcast(unittest.TestCase):
         self.fg.skip_days.remove("Unrecognized day")
         self.fg.rss_str()  # Now it works
 
+    def test_skipDaysAddedInAnotherCase(self):
+        self.fg.skip_days = {"Friday"}
+        self.fg.skip_days.add("friday")
+        channel = self.fg._create_rss().find("channel")
+        self.assertEqual([d.text for d in channel.find("skipDays")],
+                         ["Friday"])
+
     def test_modifyingSkipHoursAfterwards(self):
         self.fg.skip_hours.add(26)
         self.assertRaises(ValueError, self.fg.rss_str)
         self.fg.skip_hours.remove(26)
         self.fg.rss_str()  # Now it works
 
+    def test_renderingDoesNotModifySkipSets(self):
+        skip_days = self.fg.skip_days
+        skip_days.add("friday")
+        skip_hours = self.fg.skip_hours
+        rss = self.fg.rss_str()
+        self.assertIs(self.fg.skip_days, skip_days)
+        self.assertIs(self.fg.skip_hours, skip_hours)
+        self.assertIn("<day>Friday</day>", rss)
+
+    def test_concurrentRendering(self):
+        errors = []
+        item_counts = []
+        stop = threading.Event()
+
+        def render():
+            try:
+                while not stop.is_set():
+                    channel = etree.XML(self.fg.rss_bytes()).find("channel")
+                    item_counts.append(len(channel.findall("item")))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=render) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            for i in range(300):
+                ep = self.fg.add_episode()
+                ep.title = "Episode %d" % i
+                if i % 3 == 0:
+                    self.fg.episodes.pop(0)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertTrue(item_counts)
+        self.assertTrue(all(0 <= n <= 200 for n in item_counts))
+
+    def test_renderWorkers(self):
+        self.fg.last_updated = datetime.datetime(2016, 6, 8, 10, 0, 0,
+                                                 tzinfo=dateutil.tz.tzutc())
+        self.addDatedEpisodes(40)
+        expected = self.fg.rss_bytes(minimize=True)
+        # Start from scratch, without the items cached by the serial render
+        for ep in self.fg.episodes:
+            ep._rss_cache = None
+        self.fg.render_workers = 2
+        with mock.patch("podgen.podcast._MIN_PARALLEL_ITEMS", 8):
+            self.assertEqual(self.fg.rss_bytes(minimize=True), expected)
+            # The items created by the workers were cached
+            with mock.patch("podgen.podcast._render_items") as mock_render:
+                self.assertEqual(self.fg.rss_bytes(minimize=True), expected)
+                self.fg.episodes[5].title = "Changed"
+                self.assertNotEqual(self.fg.rss_bytes(minimize=True),
+                                    expected)
+            self.assertFalse(mock_render.called)
+
     # Tests for xslt
     def test_xslt_str(self):
         def use_str(**kwargs):
@@ -546,6 +926,28 @@ class TestPodcast(unittest.TestCase):
         assert xslt_path in generated_feed(minimize=True)
         assert xslt_path in generated_feed(xml_declaration=False)
 
+    def test_xslt_stream(self):
+        def use_stream(**kwargs):
+            fd = io.BytesIO()
+            self.fg.rss_stream(fd, **kwargs)
+            return fd.getvalue().decode("UTF-8")
+        self.help_test_xslt_using(use_stream)
+
+    def test_rssStreamUsesOverriddenCreateRss(self):
+        class PodcastWithTtl(Podcast):
+            def _create_rss(self):
+                rss = super(PodcastWithTtl, self)._create_rss()
+                etree.SubElement(rss.find("channel"), "ttl").text = "90"
+                return rss
+
+        fg = PodcastWithTtl(name=self.name, website=self.website,
+                            description=self.description,
+                            explicit=self.explicit)
+        fd = io.BytesIO()
+        fg.rss_stream(fd)
+        feed = etree.fromstring(fd.getvalue())
+        self.assertEqual(feed.find("channel").find("ttl").text, "90")
+
     def test_imageWarningNoExt(self):
         with warnings.catch_warnings(record=True) as w:
             warnings.simplefilter("always")
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_probe
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the functions which find the duration of remote media files using
+    Range requests.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import struct
+import unittest
+
+import requests
+
+from podgen.probe import probe_duration, ProbeError
+from podgen.tests.local_server import LocalServer
+
+# MPEG 1 layer III, 128 kbit/s, 44100 Hz, stereo
+MP3_FRAME_HEADER = b'\xff\xfb\x90\x00'
+MP3_FRAME_LENGTH = 417
+
+
+def id3_tag(size):
+    """Create an ID3v2 tag with ``size`` bytes of padding."""
+    syncsafe = bytes(bytearray([(size >> 21) & 0x7f, (size >> 14) & 0x7f,
+                                (size >> 7) & 0x7f, size & 0x7f]))
+    return b'ID3\x03\x00\x00' + syncsafe + b'\x00' * size
+
+
+def mp3_frame(content=b''):
+    frame = MP3_FRAME_HEADER + b'\x00' * 32 + content
+    return frame + b'\x00' * (MP3_FRAME_LENGTH - len(frame))
+
+
+def box(box_type, content):
+    return struct.pack('>I4s', 8 + len(content), box_type) + content
+
+
+def mvhd(timescale, duration, version=0):
+    if version == 1:
+        times = struct.pack('>QQIQ', 0, 0, timescale, duration)
+    else:
+        times = struct.pack('>IIII', 0, 0, timescale, duration)
+    return box(b'mvhd', struct.pack('>I', version << 24) + times +
+               b'\x00' * 80)
+
+
+class TestProbe(unittest.TestCase):
+
+    def probe(self, data, extension, accept_ranges=True, size=None):
+        with LocalServer({'/file': (data, {})},
+                         accept_ranges=accept_ranges) as server:
+            duration = probe_duration(requests.Session(), server.url('/file'),
+                                      extension, size)
+        # Far from everything should have been downloaded
+        self.assertLess(server.bytes_sent, 100 * 1024)
+        return duration.total_seconds()
+
+    def test_mp3Xing(self):
+        xing = b'Xing' + struct.pack('>II', 0x1, 1000)
+        data = id3_tag(50000) + mp3_frame(xing) + mp3_frame() * 3000
+        self.assertAlmostEqual(self.probe(data, '.mp3'),
+                               1000 * 1152 / 44100.0)
+
+    def test_mp3Vbri(self):
+        first_frame = MP3_FRAME_HEADER + b'\x00' * 32 + b'VBRI' + \
+            b'\x00' * 10 + struct.pack('>I', 2000)
+        first_frame += b'\x00' * (MP3_FRAME_LENGTH - len(first_frame))
+        data = id3_tag(100) + first_frame + mp3_frame() * 3000
+        self.assertAlmostEqual(self.probe(data, 'mp3'),
+                               2000 * 1152 / 44100.0)
+
+    def test_mp3ConstantBitrate(self):
+        audio = mp3_frame() * 3000
+        data = id3_tag(100) + audio
+        self.assertAlmostEqual(self.probe(data, '.mp3'),
+                               len(audio) * 8 / 128000.0)
+
+    def test_mp4MoovAtEnd(self):
+        data = box(b'ftyp', b'isom' * 4) + box(b'mdat', b'\x00' * 2000000) + \
+            box(b'moov', mvhd(1000, 123456))
+        self.assertAlmostEqual(self.probe(data, '.m4a'), 123.456)
+
+    def test_mp4MoovAtStart(self):
+        data = box(b'ftyp', b'isom' * 4) + \
+            box(b'moov', box(b'trak', b'\x00' * 100) +
+                mvhd(600, 6000000000, version=1)) + \
+            box(b'mdat', b'\x00' * 2000000)
+        self.assertAlmostEqual(self.probe(data, '.mp4'), 10000000.0)
+
+    def test_serverWithoutRangeSupport(self):
+        data = box(b'ftyp', b'isom' * 4) + box(b'mdat', b'\x00' * 2000000) + \
+            box(b'moov', mvhd(1000, 123456))
+        self.assertRaises(ProbeError, self.probe, data, '.mp4',
+                          accept_ranges=False)
+
+    def test_truncatedMp3(self):
+        # The file ends in the middle of the Xing header
+        first_frame = MP3_FRAME_HEADER + b'\x00' * 32 + b'Xing\x00\x00'
+        self.assertRaises(ProbeError, self.probe,
+                          id3_tag(100) + first_frame, '.mp3')
+
+    def test_truncatedMp4(self):
+        # The file ends before the timescale and duration in the mvhd box
+        moov = box(b'moov', mvhd(1000, 123456))
+        data = box(b'ftyp', b'isom' * 4) + box(b'mdat', b'\x00' * 2000000) + \
+            moov[:24]
+        self.assertRaises(ProbeError, self.probe, data, '.m4a')
+        # The mvhd box ends too soon, though the moov box doesn't
+        mvhd_box = mvhd(1000, 123456)[:20]
+        data = box(b'ftyp', b'isom' * 4) + \
+            box(b'moov', struct.pack('>I4s', 120, b'mvhd') + mvhd_box[8:])
+        self.assertRaises(ProbeError, self.probe, data, '.mp4')
+
+    def test_rangeNotSatisfiable(self):
+        # The ID3 tag claims to be larger than the whole file, so the range
+        # after it is past the end
+        data = id3_tag(20000)[:10] + mp3_frame() * 10
+        with LocalServer({'/file': (data, {})}) as server:
+            self.assertRaises(ProbeError, probe_duration, requests.Session(),
+                              server.url('/file'), '.mp3')
+        self.assertEqual(len(server.requests), 2)
+
+    def test_unsupportedFormat(self):
+        self.assertRaises(ProbeError, self.probe, b'%PDF-1.4', '.pdf')
+
+    def test_notMediaFile(self):
+        self.assertRaises(ProbeError, self.probe, b'<html></html>', '.mp3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_render_profile
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the timing of feed generation with Podcast.observer and
+    RenderProfile.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from podgen import Podcast, Episode, Media, RenderProfile
+
+
+class TestRenderProfile(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter("ignore")
+        self.podcast = Podcast(name="Test", website="http://example.com",
+                               description="Testing", explicit=False)
+        for i in range(5):
+            self.podcast.episodes.append(Episode(
+                title="Episode %d" % i,
+                media=Media("http://example.com/%d.mp3" % i, 1000)))
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_spans(self):
+        with RenderProfile(self.podcast) as profile:
+            feed = self.podcast.rss_bytes()
+        self.assertEqual([s.name for s in profile.spans],
+                         ['validate', 'prolog', 'channel', 'tostring',
+                          'rss_entry', 'item_tostring', 'items', 'generate'])
+        totals = profile.totals()
+        self.assertEqual(totals['rss_entry'].items, 5)
+        self.assertEqual(totals['items'].items, 5)
+        self.assertEqual(totals['generate'].bytes, len(feed))
+        # The channel's end tags are part of what tostring produced
+        self.assertEqual(totals['prolog'].bytes + totals['tostring'].bytes +
+                         totals['items'].bytes, len(feed))
+        for span in profile.spans:
+            self.assertGreaterEqual(span.seconds, 0)
+
+    def test_cached_items_are_not_created(self):
+        self.podcast.rss_bytes()
+        with RenderProfile(self.podcast) as profile:
+            self.podcast.rss_bytes()
+        totals = profile.totals()
+        self.assertEqual(totals['rss_entry'].items, 0)
+        self.assertEqual(totals['item_tostring'].bytes, 0)
+        self.assertEqual(totals['items'].items, 5)
+
+    def test_write_file(self):
+        filename = os.path.join(self.directory, "feed.rss")
+        with RenderProfile(self.podcast) as profile:
+            self.podcast.rss_file(filename)
+        totals = profile.totals()
+        self.assertEqual([s.name for s in profile.spans][-2:],
+                         ['generate', 'write'])
+        self.assertEqual(totals['write'].bytes, os.path.getsize(filename))
+        self.assertEqual(totals['write'].bytes, totals['generate'].bytes)
+
+    def test_write_stream(self):
+        fd = io.BytesIO()
+        with RenderProfile(self.podcast) as profile:
+            self.podcast.rss_stream(fd)
+        self.assertEqual(profile.totals()['write'].bytes,
+                         len(fd.getvalue()))
+
+    def test_write_only_if_changed(self):
+        filename = os.path.join(self.directory, "feed.rss")
+        with RenderProfile(self.podcast) as profile:
+            self.podcast.rss_file(filename, only_if_changed=True)
+            self.podcast.rss_file(filename, only_if_changed=True,
+                                  gzip_level=6)
+        self.assertEqual([s.name for s in profile.spans].count('write'), 2)
+
+    def test_one_go(self):
+        with RenderProfile(self.podcast) as profile:
+            feed = self.podcast.rss_bytes(encoding="UTF-16")
+        self.assertEqual([s.name for s in profile.spans],
+                         ['validate', 'prolog', 'generate'])
+        self.assertEqual(profile.totals()['generate'].bytes, len(feed))
+
+    def test_observer_restored(self):
+        def previous(span):
+            pass
+        self.podcast.observer = previous
+        with RenderProfile(self.podcast) as profile:
+            self.assertIs(self.podcast.observer, profile)
+        self.assertIs(self.podcast.observer, previous)
+
+    def test_shared_observer(self):
+        profile = RenderProfile()
+        other = Podcast(name="Other", website="http://example.org",
+                        description="Testing", explicit=True)
+        self.podcast.observer = profile
+        other.observer = profile
+        self.podcast.rss_bytes()
+        other.rss_bytes()
+        self.assertEqual([s.name for s in profile.spans].count('generate'), 2)
+        self.assertEqual(profile.totals()['items'].items, 5)
+
+    def test_no_observer(self):
+        self.assertIsNone(self.podcast.observer)
+        profile = RenderProfile()
+        self.podcast.rss_bytes()
+        self.assertEqual(profile.spans, [])
+
+    def test_report(self):
+        with RenderProfile(self.podcast) as profile:
+            self.podcast.rss_bytes()
+        lines = profile.report().splitlines()
+        self.assertEqual(lines[0].split(), ['span', 'seconds', 'items',
+                                            'bytes'])
+        self.assertEqual([l.split()[0] for l in lines[1:]],
+                         list(profile.totals()))
+
+    def test_mandatory_attributes(self):
+        self.podcast.name = None
+        with RenderProfile(self.podcast) as profile:
+            self.assertRaises(ValueError, self.podcast.rss_bytes)
+        self.assertEqual(profile.spans, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_server
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the serving of feeds with FeedServer.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import email.utils
+import gzip
+import sys
+import threading
+import unittest
+import warnings
+from datetime import datetime, timedelta
+from wsgiref.util import setup_testing_defaults
+
+import pytz
+
+from podgen import Podcast, Episode, Media, FeedServer
+
+
+class TestFeedServer(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter("ignore")
+        self.start = datetime(2016, 1, 1, tzinfo=pytz.utc)
+        self.podcast = Podcast(name="Test", website="http://example.com",
+                               description="Testing", explicit=False,
+                               last_updated=self.start)
+        for i in range(20):
+            self.podcast.episodes.append(Episode(
+                title="Episode %d" % i,
+                media=Media("http://example.com/%d.mp3" % i, 1000),
+                publication_date=self.start - timedelta(days=i)))
+        self.renders = 0
+        original = self.podcast._rss_chunks
+
+        def counting_rss_chunks(*args, **kwargs):
+            self.renders += 1
+            return original(*args, **kwargs)
+        self.podcast._rss_chunks = counting_rss_chunks
+        self.server = FeedServer({"/feed.rss": self.podcast}, max_age=60)
+
+    def get(self, path="/feed.rss", method="GET", **headers):
+        environ = {"PATH_INFO": path, "REQUEST_METHOD": method}
+        for name, value in headers.items():
+            environ["HTTP_" + name.upper()] = value
+        setup_testing_defaults(environ)
+        response = []
+
+        def start_response(status, response_headers):
+            response.append(int(status.split()[0]))
+            response.append(dict(response_headers))
+        body = b"".join(self.server(environ, start_response))
+        return response[0], response[1], body
+
+    def test_get(self):
+        status, headers, body = self.get()
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.podcast.rss_bytes())
+        self.assertEqual(headers["Content-Type"],
+                         "application/rss+xml; charset=UTF-8")
+        self.assertEqual(headers["Content-Length"], str(len(body)))
+        self.assertEqual(headers["ETag"], self.podcast.last_etag)
+        self.assertEqual(headers["Last-Modified"],
+                         "Fri, 01 Jan 2016 00:00:00 GMT")
+        self.assertEqual(headers["Cache-Control"], "max-age=60")
+        self.assertNotIn("Content-Encoding", headers)
+
+        status, headers, body = self.get(method="HEAD")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b"")
+        self.assertNotEqual(headers["Content-Length"], "0")
+
+        self.assertEqual(self.get("/other.rss")[0], 404)
+        status, headers, _ = self.get(method="POST")
+        self.assertEqual(status, 405)
+        self.assertEqual(headers["Allow"], "GET, HEAD")
+
+    def test_otherMethodsDontGenerate(self):
+        for method in ("POST", "PUT", "DELETE"):
+            status, headers, _ = self.get(method=method)
+            self.assertEqual(status, 405)
+        self.assertEqual(self.get("/other.rss", method="PUT")[0], 404)
+        self.assertEqual(self.renders, 0)
+
+    def test_datesLeftOut(self):
+        # False leaves the elements out, and mustn't be taken for a date
+        self.podcast.last_updated = False
+        status, headers, body = self.get()
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Last-Modified"],
+                         "Fri, 01 Jan 2016 00:00:00 GMT")
+        self.assertNotIn(b"<lastBuildDate>", body)
+
+        self.podcast.publication_date = False
+        status, headers, body = self.get()
+        self.assertEqual(status, 200)
+        self.assertNotIn(b"<pubDate>", body.split(b"<item>")[0])
+        self.assertIn("Last-Modified", headers)
+
+    def test_singlePodcast(self):
+        self.server.feeds = self.podcast
+        self.assertEqual(self.get("/anything")[0], 200)
+
+    def test_cachedUntilChanged(self):
+        first = self.get()[2]
+        for _ in range(5):
+            self.get()
+        self.assertEqual(self.renders, 1)
+
+        self.podcast.episodes[3].title = "Changed"
+        self.assertIn(b"Changed", self.get()[2])
+        self.podcast.episodes.append(Episode(title="New"))
+        self.assertIn(b"New", self.get()[2])
+        self.podcast.name = "Renamed"
+        self.assertIn(b"Renamed", self.get()[2])
+        del self.podcast.episodes[-1]
+        self.assertNotIn(b"<title>New", self.get()[2])
+        self.assertEqual(self.renders, 5)
+
+        # Changes in place must be announced
+        self.podcast.episodes[0].media.size = 1234
+        self.assertNotIn(b'length="1234"', self.get()[2])
+        self.server.invalidate("/feed.rss")
+        self.assertIn(b'length="1234"', self.get()[2])
+        self.assertNotEqual(first, self.get()[2])
+
+    def test_ifNoneMatch(self):
+        etag = self.get()[1]["ETag"]
+        status, headers, body = self.get(if_none_match=etag)
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(headers["ETag"], etag)
+        self.assertEqual(self.get(if_none_match='"other", W/' + etag)[0],
+                         304)
+        self.assertEqual(self.get(if_none_match="*")[0], 304)
+        self.assertEqual(self.get(if_none_match='"other"')[0], 200)
+        # If-None-Match takes precedence
+        self.assertEqual(self.get(if_none_match='"other"',
+                                  if_modified_since="Fri, 01 Jan 2016 "
+                                                    "00:00:00 GMT")[0], 200)
+
+        self.podcast.episodes[0].title = "Changed"
+        status, headers, _ = self.get(if_none_match=etag)
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers["ETag"], etag)
+
+    def test_ifModifiedSince(self):
+        last_modified = self.get()[1]["Last-Modified"]
+        self.assertEqual(self.get(if_modified_since=last_modified)[0], 304)
+        self.assertEqual(self.get(if_modified_since="Thu, 31 Dec 2015 "
+                                                    "00:00:00 GMT")[0], 200)
+        self.assertEqual(self.get(if_modified_since="garbage")[0], 200)
+
+        # The feed changed without last_updated changing, so Last-Modified
+        # must move forward anyway
+        self.podcast.episodes[0].title = "Changed"
+        status, headers, _ = self.get(if_modified_since=last_modified)
+        self.assertEqual(status, 200)
+        self.assertGreater(
+            email.utils.parsedate_tz(headers["Last-Modified"]),
+            email.utils.parsedate_tz(last_modified))
+
+        self.podcast.last_updated = None
+        self.podcast.publication_date = self.start + timedelta(days=1)
+        self.server = FeedServer(self.podcast)
+        self.assertEqual(self.get()[1]["Last-Modified"],
+                         "Sat, 02 Jan 2016 00:00:00 GMT")
+
+    def test_gzip(self):
+        plain = self.get()
+        status, headers, body = self.get(accept_encoding="br;q=1, gzip")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(body), plain[2])
+        self.assertLess(len(body), len(plain[2]))
+        self.assertNotEqual(headers["ETag"], plain[1]["ETag"])
+        # The other representation's ETag is good as well
+        self.assertEqual(self.get(accept_encoding="gzip",
+                                  if_none_match=plain[1]["ETag"])[0], 304)
+        self.assertNotIn("Content-Encoding",
+                         self.get(accept_encoding="gzip;q=0")[1])
+        self.assertIn("Content-Encoding",
+                      self.get(accept_encoding="*")[1])
+
+        self.server = FeedServer(self.podcast, gzip_level=None)
+        self.assertNotIn("Content-Encoding",
+                         self.get(accept_encoding="gzip")[1])
+
+    def test_feedsAreGeneratedIndependently(self):
+        other = Podcast(name="Other", website="http://example.org",
+                        description="Testing", explicit=True)
+        self.server.feeds["/other.rss"] = other
+        started = threading.Event()
+        release = threading.Event()
+        original = self.podcast._rss_chunks
+
+        def slow_rss_chunks(*args, **kwargs):
+            started.set()
+            release.wait(10)
+            return original(*args, **kwargs)
+        self.podcast._rss_chunks = slow_rss_chunks
+        slow = threading.Thread(target=self.get)
+        slow.start()
+        try:
+            self.assertTrue(started.wait(10))
+            # Served while the first feed is still being generated
+            status, _, body = self.get("/other.rss")
+            self.assertEqual(status, 200)
+            self.assertEqual(body, other.rss_bytes())
+            self.assertTrue(slow.is_alive())
+        finally:
+            release.set()
+            slow.join()
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     "asyncio.run requires Python 3.7 or newer")
+    def test_asgi(self):
+        from podgen.tests.aio_cases import asgi_request
+        app = self.server.asgi_app()
+
+        start, body = asgi_request(app, "/feed.rss")
+        self.assertEqual(start["status"], 200)
+        self.assertEqual(body["body"], self.podcast.rss_bytes())
+        etag = dict(start["headers"])[b"ETag"]
+        start, body = asgi_request(app, "/feed.rss",
+                                   [(b"if-none-match", etag)])
+        self.assertEqual(start["status"], 304)
+        start, _ = asgi_request(app, "/missing.rss")
+        self.assertEqual(start["status"], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,19 @@
     :license: FreeBSD and LGPL, see license.* for more details.
 """
 import unittest
+import datetime
+import gzip
+import io
+import locale
+import os
+import shutil
+import tempfile
+import zlib
+
+import dateutil.tz
+import mock
+import pytz
+
 from podgen import util
 
 class TestUtil(unittest.TestCase):
@@ -34,3 +47,101 @@ class TestUtil(unittest.TestCase):
         assert "hi" in three
         assert "and" in three
         assert "low" in three
+
+    def test_formatRFC2822(self):
+        dates = [
+            datetime.datetime(2016, 5, 17, 13, 37, 10, tzinfo=pytz.utc),
+            datetime.datetime(2017, 12, 31, 23, 59, 59, 999999,
+                              tzinfo=dateutil.tz.tzoffset(None, -5 * 3600)),
+            datetime.datetime(2015, 2, 1, 0, 0,
+                              tzinfo=dateutil.tz.tzoffset(None, 5.5 * 3600)),
+            pytz.timezone("Europe/Oslo").localize(
+                datetime.datetime(2016, 7, 4, 8, 0)),
+            datetime.datetime(2016, 1, 1, 12, 0),
+        ]
+        old_locale = locale.setlocale(locale.LC_ALL)
+        locale.setlocale(locale.LC_ALL, 'C')
+        try:
+            expected = [d.strftime('%a, %d %b %Y %H:%M:%S %z') for d in dates]
+        finally:
+            locale.setlocale(locale.LC_ALL, old_locale)
+
+        with mock.patch("locale.setlocale") as mock_setlocale:
+            self.assertEqual([util.formatRFC2822(d) for d in dates], expected)
+            # Formatted again, this time using the cache
+            self.assertEqual([util.formatRFC2822(d) for d in dates], expected)
+            self.assertFalse(mock_setlocale.called)
+
+    def test_formatRFC2822SameTimeDifferentOffset(self):
+        utc = datetime.datetime(2016, 5, 17, 12, 0, tzinfo=pytz.utc)
+        oslo = utc.astimezone(pytz.timezone("Europe/Oslo"))
+        self.assertEqual(util.formatRFC2822(utc),
+                         "Tue, 17 May 2016 12:00:00 +0000")
+        self.assertEqual(util.formatRFC2822(oslo),
+                         "Tue, 17 May 2016 14:00:00 +0200")
+
+    @unittest.skipIf(os.name != "posix", "Permissions are POSIX only")
+    def test_writeFileAtomicallyPermissions(self):
+        directory = tempfile.mkdtemp()
+        umask = os.umask(0o027)
+        try:
+            filename = os.path.join(directory, "feed.rss")
+            # New files get the permissions allowed by the umask
+            util._write_file_atomically(filename, [b"<rss/>"])
+            self.assertEqual(os.stat(filename).st_mode & 0o777, 0o640)
+            # Replaced files keep their permissions
+            os.chmod(filename, 0o604)
+            util._write_file_atomically(filename, [b"<rss></rss>"])
+            self.assertEqual(os.stat(filename).st_mode & 0o777, 0o604)
+            self.assertEqual(os.listdir(directory), ["feed.rss"])
+        finally:
+            os.umask(umask)
+            shutil.rmtree(directory)
+
+    def test_writeFileAtomicallyCompressed(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "feed.rss")
+            chunks = [b"<rss>", b"<item>episode</item>" * 100, b"</rss>"]
+            util._write_file_atomically(filename, iter(chunks), gzip_level=6)
+            with open(filename, "rb") as fd:
+                self.assertEqual(fd.read(), b"".join(chunks))
+            with open(filename + ".gz", "rb") as fd:
+                compressed = fd.read()
+            with gzip.GzipFile(fileobj=io.BytesIO(compressed)) as fd:
+                self.assertEqual(fd.read(), b"".join(chunks))
+
+            # The same input gives the same output
+            util._write_file_atomically(filename, chunks, gzip_level=6)
+            with open(filename + ".gz", "rb") as fd:
+                self.assertEqual(fd.read(), compressed)
+
+            # Stand-in for brotli, which is optional
+            def compressor(quality):
+                compressobj = zlib.compressobj(quality)
+                return mock.Mock(process=compressobj.compress,
+                                 finish=compressobj.flush)
+            fake_brotli = mock.Mock()
+            fake_brotli.Compressor.side_effect = compressor
+            with mock.patch("podgen.util.brotli", fake_brotli):
+                util._write_file_atomically(filename, chunks,
+                                            brotli_quality=9)
+                fake_brotli.Compressor.assert_called_once_with(quality=9)
+                self.assertEqual(sorted(os.listdir(directory)),
+                                 ["feed.rss", "feed.rss.br", "feed.rss.gz"])
+
+                # Compressed files which aren't smaller are skipped, and the
+                # old ones removed
+                util._write_file_atomically(filename, [b"x"], gzip_level=9,
+                                            brotli_quality=9)
+            self.assertEqual(os.listdir(directory), ["feed.rss"])
+
+            with mock.patch("podgen.util.brotli", None):
+                self.assertRaises(ImportError, util._write_file_atomically,
+                                  filename, chunks, brotli_quality=11)
+            # Nothing was changed
+            with open(filename, "rb") as fd:
+                self.assertEqual(fd.read(), b"x")
+            self.assertEqual(os.listdir(directory), ["feed.rss"])
+        finally:
+            shutil.rmtree(directory)
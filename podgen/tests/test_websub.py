@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.tests.test_websub
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the finding of changed episodes and the notification of hubs.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import copy
+import threading
+import unittest
+import warnings
+from datetime import datetime, timedelta
+
+import mock
+import pytz
+from future.moves.urllib.parse import parse_qsl
+from lxml import etree
+
+from podgen import Podcast, Episode, HubNotifier, diff_episodes
+from podgen.tests.local_server import LocalServer
+
+
+class TestWebSub(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter("ignore")
+        self.hub_server = LocalServer()
+        self.hub_server.__enter__()
+        self.hub = self.hub_server.url("/hub")
+        self.podcasts = [self.create_podcast(i) for i in range(3)]
+
+    def tearDown(self):
+        self.hub_server.__exit__(None, None, None)
+
+    def create_podcast(self, number):
+        p = Podcast(name="Podcast %d" % number, website="http://example.com",
+                    description="Testing", explicit=False,
+                    feed_url="http://example.com/%d.rss" % number,
+                    pubsubhubbub=self.hub)
+        start = datetime(2016, 1, 1, tzinfo=pytz.utc)
+        for i in range(5):
+            p.episodes.append(Episode(
+                id="http://example.com/%d/%d" % (number, i),
+                title="Episode %d" % i,
+                publication_date=start + timedelta(days=i)))
+        return p
+
+    def posts(self):
+        return [r for r in self.hub_server.requests if r[0] == "POST"]
+
+    def test_diffEpisodes(self):
+        old = self.podcasts[0]
+        new = copy.deepcopy(old)
+        new.episodes[1].title = "Changed"
+        del new.episodes[2]
+        new.episodes.append(Episode(id="new", title="New"))
+        changes = diff_episodes(old, new)
+        self.assertEqual(changes.added, [new.episodes[-1]])
+        self.assertEqual(changes.changed, [new.episodes[1]])
+        self.assertEqual(changes.removed, ["http://example.com/0/2"])
+
+        self.assertEqual(diff_episodes(old, old), ([], [], []))
+        # Episodes outside the feed are removed
+        new.max_episodes = 1
+        self.assertEqual(len(diff_episodes(old, new).removed), 4)
+
+    def test_diffEpisodesWithLoadedFeed(self):
+        old = Podcast.from_rss(self.podcasts[0].rss_bytes())
+        self.assertEqual(diff_episodes(old, self.podcasts[0]),
+                         ([], [], []))
+
+    def test_pingsAreBatched(self):
+        notifier = HubNotifier(delay=60)
+        for p in self.podcasts:
+            notifier.notify(p)
+        notifier.notify(self.podcasts[0])
+        self.assertEqual(self.posts(), [])
+
+        results = notifier.close()
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[0].status, 202)
+        posts = self.posts()
+        self.assertEqual(len(posts), 1)
+        self.assertEqual(posts[0][1], "/hub")
+        self.assertEqual(parse_qsl(posts[0][4].decode("ascii")), [
+            ("hub.mode", "publish"),
+            ("hub.url", "http://example.com/0.rss"),
+            ("hub.url", "http://example.com/1.rss"),
+            ("hub.url", "http://example.com/2.rss"),
+        ])
+
+        # Nothing is pending any more
+        self.assertEqual(notifier.flush(), [])
+
+    def test_hubChanged(self):
+        p = self.podcasts[0]
+        with HubNotifier(delay=60) as notifier:
+            notifier.notify(p)
+            p.pubsubhubbub = self.hub_server.url("/other-hub")
+            notifier.notify(p)
+        self.assertEqual([r[1] for r in self.posts()], ["/other-hub"])
+
+    def test_maxTopics(self):
+        with HubNotifier(delay=60, max_topics=2) as notifier:
+            for p in self.podcasts:
+                notifier.notify(p)
+        self.assertEqual(len(self.posts()), 2)
+
+    def test_fatPings(self):
+        old = copy.deepcopy(self.podcasts[0])
+        new = self.podcasts[0]
+        new.episodes[3].title = "Changed"
+        del new.episodes[0]
+        with HubNotifier(delay=60, fat_pings=True) as notifier:
+            notifier.notify(new, diff_episodes(old, new))
+            # Only removals give an ordinary ping
+            del self.podcasts[1].episodes[0]
+            notifier.notify(self.podcasts[1], diff_episodes(
+                self.create_podcast(1), self.podcasts[1]))
+
+        posts = self.posts()
+        self.assertEqual(len(posts), 2)
+        _, _, headers, _, body = posts[0]
+        self.assertIn("application/rss+xml", headers["Content-Type"])
+        self.assertIn('<http://example.com/0.rss>; rel="self"',
+                      headers["Link"])
+        items = etree.XML(body).find("channel").findall("item")
+        self.assertEqual([i.find("title").text for i in items], ["Changed"])
+        self.assertEqual(parse_qsl(posts[1][4].decode("ascii")), [
+            ("hub.mode", "publish"),
+            ("hub.url", "http://example.com/1.rss"),
+        ])
+
+    def test_debounce(self):
+        done = threading.Event()
+        results = []
+
+        def callback(result):
+            results.append(result)
+            done.set()
+
+        notifier = HubNotifier(delay=0.2, callback=callback)
+        for p in self.podcasts:
+            notifier.notify(p)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(len(results[0].topics), 3)
+        self.assertEqual(len(self.posts()), 1)
+        notifier.close()
+
+    def test_oneThread(self):
+        notifier = HubNotifier(delay=60)
+        with mock.patch.object(threading.Thread, "start", autospec=True,
+                               side_effect=threading.Thread.start) as start:
+            for _ in range(20):
+                for p in self.podcasts:
+                    notifier.notify(p)
+        self.assertEqual(start.call_count, 1)
+        self.assertEqual(len(notifier.close()), 1)
+        self.assertFalse(start.call_args[0][0].is_alive())
+
+    def test_errors(self):
+        p = self.podcasts[0]
+        p.pubsubhubbub = "http://127.0.0.1:1/hub"
+        with HubNotifier(delay=60) as notifier:
+            notifier.notify(p)
+            results = notifier.flush()
+        self.assertIsNone(results[0].status)
+        self.assertIsNotNone(results[0].error)
+
+        p.pubsubhubbub = None
+        self.assertRaises(ValueError, notifier.notify, p)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,7 +9,44 @@
         <thorben@sjostrom.no>
     :license: FreeBSD and LGPL, see license.* for more details.
 """
-import sys, locale
+import binascii
+import errno
+import sys
+import gzip
+import hashlib
+import importlib
+import io
+import os
+
+from lxml import etree
+from future.utils import iteritems
+
+from podgen.compat import string_types
+
+
+def _get_brotli():
+    """Return the brotli module, or :obj:`None` if it isn't installed. It is
+    only imported once a compressed copy is written, since most feeds don't
+    need it. A value assigned to podgen.util.brotli (as done by mock.patch)
+    is used instead."""
+    try:
+        return globals()['brotli']
+    except KeyError:
+        pass
+    try:
+        value = importlib.import_module('brotli')
+    except ImportError:
+        value = None
+    globals()['brotli'] = value
+    return value
+
+
+def __getattr__(name):
+    # Lets podgen.util.brotli be used before anything has imported it
+    # (Python 3.7 and newer)
+    if name == 'brotli':
+        return _get_brotli()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 def ensure_format(val, allowed, required, allowed_values=None, defaults=None):
@@ -64,23 +101,65 @@ def ensure_format(val, allowed, required, allowed_values=None, defaults=None):
     return val
 
 
+_RFC2822_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_RFC2822_MONTHS = (None, 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul',
+                   'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+_rfc2822_cache = {}
+"""Cache used by formatRFC2822, keyed by datetime and UTC offset."""
+_RFC2822_CACHE_SIZE = 4096
+"""The number of formatted dates to remember before starting over."""
+
+
 def formatRFC2822(d):
     """Format a datetime according to RFC2822.
 
-    This implementation exists as a workaround to ensure that the locale setting
-    does not interfere with the time format. For example, day names might get
-    translated to your local language, which would break with the standard.
+    The English day and month names are used no matter what the locale is
+    set to, so the result is always valid according to the standard. The
+    locale is never changed, so this is safe to use from multiple threads.
+
+    Recently formatted dates are cached, since the same dates are formatted
+    every time a feed is generated.
 
     :param d: Time and date you want to format according to RFC2822.
     :type d: datetime.datetime
     :returns: The datetime formatted according to the RFC2822.
     :rtype: str
     """
-    l = locale.setlocale(locale.LC_ALL)
-    locale.setlocale(locale.LC_ALL, 'C')
-    d = d.strftime('%a, %d %b %Y %H:%M:%S %z')
-    locale.setlocale(locale.LC_ALL, l)
-    return d
+    offset = d.utcoffset()
+    # Equal datetimes with equal offsets have the same local time
+    key = (d, offset)
+    try:
+        return _rfc2822_cache[key]
+    except KeyError:
+        pass
+
+    formatted = _formatRFC2822(d, offset)
+    if len(_rfc2822_cache) >= _RFC2822_CACHE_SIZE:
+        _rfc2822_cache.clear()
+    _rfc2822_cache[key] = formatted
+    return formatted
+
+
+def _formatRFC2822(d, offset):
+    """Format d like ``d.strftime('%a, %d %b %Y %H:%M:%S %z')`` does in the C
+    locale, given the result of ``d.utcoffset()``."""
+    if offset is None:
+        zone = ''
+    else:
+        sign = '-' if offset.days < 0 else '+'
+        if offset.days < 0:
+            offset = -offset
+        hours, seconds = divmod(offset.days * 86400 + offset.seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        zone = '%s%02d%02d' % (sign, hours, minutes)
+        if seconds or offset.microseconds:
+            zone += '%02d' % seconds
+            if offset.microseconds:
+                zone += '.%06d' % offset.microseconds
+    return '%s, %02d %s %d %02d:%02d:%02d %s' % (
+        _RFC2822_DAYS[d.weekday()], d.day, _RFC2822_MONTHS[d.month], d.year,
+        d.hour, d.minute, d.second, zone)
 
 # Define htmlencode
 ver = sys.version_info
@@ -106,6 +185,15 @@ else:
         return html.escape(s)
 
 
+def _parse_date_string(text):
+    """Parse a date given as a string, like dateutil.parser.parse does.
+
+    The parser is imported when first needed, since importing it takes
+    longer than most uses of PodGen need to start."""
+    import dateutil.parser
+    return dateutil.parser.parse(text)
+
+
 def listToHumanreadableStr(l):
     """Create a human-readable string out of the given iterable.
 
@@ -128,3 +216,246 @@ def listToHumanreadableStr(l):
         return l[0]
     else:
         return ", ".join(l[:-1]) + " and " + l[-1]
+
+
+_item_bounds = {}
+"""Cache used by _get_item_bounds, keyed by namespaces, minimize and
+encoding."""
+
+
+def _is_ascii_compatible(encoding):
+    """Check whether markup is encoded as plain ASCII bytes in the given
+    encoding, which must be the case if serialized pieces of the feed are to
+    be concatenated."""
+    try:
+        return u'<?/>\n'.encode(encoding) == b'<?/>\n'
+    except LookupError:
+        return False
+
+
+def _is_binary_file(fd):
+    """Check whether the given file-like object should be given bytes rather
+    than text."""
+    if isinstance(fd, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    mode = getattr(fd, 'mode', '')
+    return isinstance(mode, string_types) and 'b' in mode
+
+
+def _create_item_wrapper(nsmap):
+    """Create an empty rss and channel element, in which items can be put so
+    they are serialized using the namespace prefixes of the feed."""
+    rss = etree.Element('rss', nsmap=nsmap)
+    channel = etree.SubElement(rss, 'channel')
+    return rss, channel
+
+
+def _get_item_bounds(nsmap, minimize, encoding):
+    """Find the bytes which surround an item when it is serialized as the only
+    child of the channel.
+
+    :returns: Tuple with the bytes before and after the item.
+    """
+    key = (tuple(iteritems(nsmap)), minimize, encoding)
+    try:
+        return _item_bounds[key]
+    except KeyError:
+        pass
+
+    rss, channel = _create_item_wrapper(nsmap)
+    etree.SubElement(channel, 'item')
+    data = etree.tostring(rss, pretty_print=not minimize, encoding=encoding,
+                          xml_declaration=False)
+    marker = data.index(b'<item/>')
+    if minimize:
+        start = marker
+        end = marker + len(b'<item/>')
+    else:
+        # The item is indented and placed on a line of its own
+        start = data.rindex(b'\n', 0, marker) + 1
+        end = data.index(b'\n', marker) + 1
+    bounds = (data[:start], data[end:])
+    _item_bounds[key] = bounds
+    return bounds
+
+
+def _serialize_item(item, nsmap, minimize=False, encoding='UTF-8'):
+    """Serialize the given item element exactly like it is serialized when it
+    is part of a whole feed using the given namespaces.
+
+    :param item: The item element to serialize. It is moved into a new tree.
+    :type item: lxml.etree.Element
+    :returns: The encoded item, including indentation unless minimized.
+    :rtype: bytes
+    """
+    before, after = _get_item_bounds(nsmap, minimize, encoding)
+    rss, channel = _create_item_wrapper(nsmap)
+    channel.append(item)
+    data = etree.tostring(rss, pretty_print=not minimize, encoding=encoding,
+                          xml_declaration=False)
+    return data[len(before):len(data) - len(after)]
+
+
+def _write_file_atomically(filename, chunks, gzip_level=None,
+                           brotli_quality=None, keep_old=None):
+    """Write the byte strings in ``chunks`` to a temporary file next to
+    ``filename``, and rename it to ``filename`` once everything is written.
+    Readers will therefore see either the old or the new file, never a
+    partially written one.
+
+    If ``gzip_level`` or ``brotli_quality`` is given, the chunks are
+    compressed as they are written, and put in ``filename.gz`` and
+    ``filename.br`` respectively. A compressed file which isn't smaller than
+    the uncompressed one is not written, and any old one is removed, so it
+    isn't served in place of the new file.
+
+    ``keep_old`` is called once all the chunks are written. If it returns
+    True, the new files are thrown away and the old ones are kept.
+
+    :returns: Whether the files were replaced."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    outputs = []
+    try:
+        outputs.append(_open_output(directory, filename, None, None))
+        if gzip_level is not None:
+            outputs.append(_open_output(directory, filename + '.gz',
+                                        'gzip', gzip_level))
+        if brotli_quality is not None:
+            outputs.append(_open_output(directory, filename + '.br',
+                                        'brotli', brotli_quality))
+
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            for output in outputs:
+                output.write(chunk)
+        for output in outputs:
+            output.close()
+
+        if keep_old is not None and keep_old():
+            for output in outputs:
+                os.remove(output.temporary_name)
+            return False
+
+        # Finish the compressed files first, so the uncompressed file is
+        # never older than them
+        for output in reversed(outputs):
+            if output.compression is not None and output.size() >= size:
+                os.remove(output.temporary_name)
+                try:
+                    os.remove(output.filename)
+                except OSError:
+                    pass
+            else:
+                _replace_file(output.temporary_name, output.filename)
+        return True
+    except BaseException:
+        for output in outputs:
+            output.close()
+            try:
+                os.remove(output.temporary_name)
+            except OSError:
+                pass
+        raise
+
+
+def _hash_file(filename):
+    """Return the SHA-256 hash object of the file's contents."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as fd:
+        for block in iter(lambda: fd.read(65536), b''):
+            digest.update(block)
+    return digest
+
+
+class _Output(object):
+    """Temporary file which the chunks for one file are written to,
+    compressing them first if ``compression`` is set."""
+
+    def __init__(self, fd, temporary_name, filename, compression, level):
+        self.fd = fd
+        self.filename = filename
+        self.temporary_name = temporary_name
+        self.compression = compression
+        self._compressor = None
+        self._finish = None
+        self._closed = False
+        if compression == 'gzip':
+            # No name or timestamp in the header, so the output only depends
+            # on the input
+            self._compressor = gzip.GzipFile(filename='', mode='wb',
+                                             compresslevel=level, fileobj=fd,
+                                             mtime=0)
+            self.write = self._compressor.write
+            self._finish = self._compressor.close
+        elif compression == 'brotli':
+            brotli = _get_brotli()
+            if brotli is None:
+                raise ImportError("The brotli package must be installed to "
+                                  "write brotli compressed files")
+            self._compressor = brotli.Compressor(quality=level)
+            process = getattr(self._compressor, 'process', None) or \
+                self._compressor.compress
+            self.write = lambda chunk: fd.write(process(chunk))
+            self._finish = lambda: fd.write(self._compressor.finish())
+        else:
+            self.write = fd.write
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._finish is not None:
+                self._finish()
+        finally:
+            self.fd.close()
+
+    def size(self):
+        return os.path.getsize(self.temporary_name)
+
+
+def _open_output(directory, filename, compression, level):
+    fd, temporary_name = _create_temporary_file(directory)
+    try:
+        return _Output(fd, temporary_name, filename, compression, level)
+    except BaseException:
+        fd.close()
+        os.remove(temporary_name)
+        raise
+
+
+def _create_temporary_file(directory):
+    """Create a new file with a random name in ``directory`` and open it for
+    writing.
+
+    Unlike the files made by :mod:`tempfile`, which are only readable by
+    their owner, it gets the permissions any new file gets, since the umask
+    is applied to them when the file is created.
+
+    :returns: The file object and the file's path.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        name = os.path.join(directory, '.tmp-' +
+                            binascii.hexlify(os.urandom(8)).decode('ascii'))
+        try:
+            descriptor = os.open(name, flags, 0o666)
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                continue
+            raise
+        return io.open(descriptor, 'wb'), name
+
+
+def _replace_file(temporary_name, filename):
+    """Rename ``temporary_name`` to ``filename``, replacing it."""
+    # Keep the permissions of the file which is replaced
+    try:
+        mode = os.stat(filename).st_mode & 0o777
+    except OSError:
+        pass
+    else:
+        os.chmod(temporary_name, mode)
+    # os.replace overwrites existing files on all platforms
+    getattr(os, 'replace', os.rename)(temporary_name, filename)
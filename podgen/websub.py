@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+    podgen.websub
+    ~~~~~~~~~~~~~
+
+    This file contains diff_episodes, which finds the episodes that changed
+    between two versions of a podcast, and HubNotifier, which tells
+    WebSub (PubSubHubbub) hubs about such changes.
+
+    :copyright: 2016, Thorben Dahl <thorben@sjostrom.no>
+    :license: FreeBSD and LGPL, see license.* for more details.
+"""
+import collections
+import threading
+import time
+import warnings
+
+from podgen.episode_collection import _get_guid
+from podgen.media import _get_new_pooled_session
+from podgen.podcast import _FeedPage
+
+FeedChanges = collections.namedtuple(
+    "FeedChanges", ["added", "changed", "removed"])
+"""The differences between two versions of a podcast, as found by
+:func:`~podgen.diff_episodes`.
+
+``added`` and ``changed`` are lists of the new version's episodes, in the
+order they have in its feed, while ``removed`` is a list of the GUIDs of the
+episodes which are no longer in the feed.
+"""
+
+PingResult = collections.namedtuple(
+    "PingResult", ["hub", "topics", "status", "error"])
+"""The outcome of one request sent by :class:`~podgen.HubNotifier`.
+
+``hub`` is the URL of the hub, and ``topics`` the list of feed URLs the
+request was about. ``status`` is the HTTP status code of the response, or
+:obj:`None` if no response was received. ``error`` is the exception which was
+raised, or a description of the error status, or :obj:`None` if the hub
+accepted the request.
+"""
+
+
+def _get_rendered_items(podcast):
+    """Return an ordered mapping from GUID to (episode, serialized item) for
+    the episodes in the podcast's feed. Episodes without a GUID are left out,
+    since they can't be told apart."""
+    items = collections.OrderedDict()
+    for episode in podcast._get_episodes_to_render():
+        guid = _get_guid(episode)
+        if guid is not None and guid not in items:
+            items[guid] = (episode,
+                           podcast._get_item_bytes(episode, True, 'UTF-8'))
+    return items
+
+
+def diff_episodes(old, new):
+    """Find the episodes which have been added, changed or removed between
+    two versions of a podcast.
+
+    Episodes are matched by their GUID (:attr:`.Episode.id`, or the URL of
+    their media), and an episode has changed if its item in the feed is
+    different. Only the episodes which are included in the feeds are
+    compared, so :attr:`.Podcast.max_episodes` is taken into account.
+
+    The two podcasts must not share Episode objects which have been changed,
+    since such changes are in both versions. Load the old version from the
+    feed you generated last time with :meth:`.Podcast.from_file`, or keep a
+    :func:`copy.deepcopy` of it.
+
+    Example::
+
+        >>> import podgen
+        >>> old = podgen.Podcast.from_file("feed.rss")
+        >>> changes = podgen.diff_episodes(old, p)
+        >>> for episode in changes.added:
+        ...     print("New episode: %s" % episode.title)
+
+    :param old: The previous version of the podcast.
+    :type old: :class:`~podgen.Podcast`
+    :param new: The current version of the podcast.
+    :type new: :class:`~podgen.Podcast`
+    :returns: The added and changed episodes of ``new``, and the GUIDs of the
+        removed episodes.
+    :rtype: :class:`~podgen.websub.FeedChanges`
+    """
+    old_items = _get_rendered_items(old)
+    added = []
+    changed = []
+    new_items = _get_rendered_items(new)
+    for guid, (episode, item) in new_items.items():
+        old_item = old_items.get(guid)
+        if old_item is None:
+            added.append(episode)
+        elif old_item[1] != item:
+            changed.append(episode)
+    removed = [guid for guid in old_items if guid not in new_items]
+    return FeedChanges(added, changed, removed)
+
+
+class _PendingFeed(object):
+    """A feed which the hub shall be notified about."""
+
+    def __init__(self, podcast, guids):
+        self.podcast = podcast
+        self.hub = podcast.pubsubhubbub
+        self.topic = podcast.feed_url
+        self.guids = guids
+        """GUIDs of the episodes to include in a fat ping, or None to send an
+        ordinary ping."""
+
+    def merge(self, other):
+        self.podcast = other.podcast
+        self.hub = other.hub
+        if self.guids is None or other.guids is None:
+            self.guids = None
+        else:
+            self.guids.update(other.guids)
+
+
+class HubNotifier(object):
+    """Notify WebSub (PubSubHubbub) hubs when feeds change.
+
+    Call :meth:`.notify` each time a feed has been written. The hubs are not
+    contacted right away; instead, the notifier waits until no feed has been
+    changed for ``delay`` seconds, so a burst of changes results in few
+    requests. Then all the pending feeds are sent together:
+
+    * Ordinary pings tell the hub the URLs of the feeds which have changed, so
+      it can fetch them. The feeds which use the same hub are sent in the same
+      request, as many hubs allow.
+    * Fat pings send the hub the changed episodes themselves, so it doesn't
+      need to fetch the feed. Each feed is sent in its own request, as an RSS
+      feed with only the added and changed episodes. This is supported by
+      some hubs only, so it must be enabled with ``fat_pings``. Feeds which
+      only had episodes removed get an ordinary ping.
+
+    The requests are made by a background thread, using one
+    :class:`requests.Session` which keeps connections alive. Use the notifier
+    as a context manager (or call :meth:`.close`) to send any pending pings
+    and stop the thread when you are done::
+
+        >>> import podgen
+        >>> with podgen.HubNotifier(delay=5) as notifier:
+        ...     for p in podcasts:
+        ...         old = podgen.Podcast.from_file(p.filename)
+        ...         p.rss_file(p.filename)
+        ...         notifier.notify(p, podgen.diff_episodes(old, p))
+
+    The podcasts must have :attr:`~.Podcast.feed_url` and
+    :attr:`~.Podcast.pubsubhubbub` set.
+
+    :param delay: The number of seconds to wait for more changes before the
+        hubs are notified.
+    :type delay: float
+    :param max_delay: The longest time in seconds a notification may be
+        delayed, even if changes keep coming. Defaults to ten times
+        ``delay``.
+    :type max_delay: float or None
+    :param fat_pings: Set to True to send the changed episodes to the hubs
+        when :meth:`.notify` is given the changes (default: False).
+    :type fat_pings: bool
+    :param max_topics: The maximum number of feeds to include in one ordinary
+        ping.
+    :type max_topics: int
+    :param requests_: The :class:`requests.Session` (or the :mod:`requests`
+        module) to use. Defaults to a new Session.
+    :type requests_: :class:`requests.Session`
+    :param callback: Function which is called with each
+        :class:`~podgen.websub.PingResult` from the background thread. When
+        not given, failed pings give a warning.
+    :type callback: callable or None
+    """
+
+    def __init__(self, delay=1.0, max_delay=None, fat_pings=False,
+                 max_topics=50, requests_=None, callback=None):
+        self.delay = delay
+        self.max_delay = max_delay if max_delay is not None else delay * 10
+        self.fat_pings = fat_pings
+        self.max_topics = max_topics
+        self.callback = callback
+        self._requests = requests_ or _get_new_pooled_session(10)
+        self._pending = collections.OrderedDict()
+        """Maps topic URLs to their _PendingFeed."""
+        self._first_pending = None
+        self._deadline = None
+        """When the pending feeds shall be sent, or None if none are
+        pending."""
+        self._thread = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._send_lock = threading.Lock()
+        """Held while pings are sent, so they're sent in order."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def notify(self, podcast, changes=None):
+        """Tell the podcast's hub that its feed has changed, once ``delay``
+        seconds have passed without further changes.
+
+        :param podcast: The podcast whose feed has changed.
+        :type podcast: :class:`~podgen.Podcast`
+        :param changes: What changed, as found by
+            :func:`~podgen.diff_episodes`. Required for fat pings, otherwise
+            an ordinary ping is sent.
+        :type changes: :class:`~podgen.websub.FeedChanges` or :obj:`None`
+        :raises: ValueError if the podcast has no feed_url or pubsubhubbub.
+        """
+        if not (podcast.feed_url and podcast.pubsubhubbub):
+            raise ValueError("Both feed_url and pubsubhubbub must be set to "
+                             "notify the hub")
+        guids = None
+        if changes is not None and self.fat_pings:
+            guids = set(_get_guid(e) for e in changes.added + changes.changed)
+        pending = _PendingFeed(podcast, guids)
+
+        with self._lock:
+            if pending.topic in self._pending:
+                self._pending[pending.topic].merge(pending)
+            else:
+                self._pending[pending.topic] = pending
+            now = time.time()
+            if self._first_pending is None:
+                self._first_pending = now
+            self._deadline = min(now + self.delay,
+                                 self._first_pending + self.max_delay)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """Notify the hubs about all pending changes right away.
+
+        :returns: The outcome of each request which was sent.
+        :rtype: :obj:`list` of :class:`~podgen.websub.PingResult`
+        """
+        with self._send_lock:
+            with self._lock:
+                self._deadline = None
+                pending = list(self._pending.values())
+                self._pending.clear()
+                self._first_pending = None
+            return self._send(pending)
+
+    def close(self):
+        """Notify the hubs about all pending changes, and close the
+        connections.
+
+        :returns: The outcome of each request which was sent.
+        :rtype: :obj:`list` of :class:`~podgen.websub.PingResult`
+        """
+        with self._condition:
+            thread = self._thread
+            self._stopping = True
+            self._condition.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._condition:
+            self._thread = None
+            self._stopping = False
+        results = self.flush()
+        close = getattr(self._requests, 'close', None)
+        if close is not None:
+            close()
+        return results
+
+    def _run(self):
+        """Wait for the deadline in the background thread, and send the
+        pending pings once it has passed. The thread is reused for all
+        notifications until the notifier is closed."""
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    if self._deadline is None:
+                        self._condition.wait()
+                        continue
+                    remaining = self._deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._stopping:
+                    return
+            self._send_in_background()
+
+    def _send_in_background(self):
+        for result in self.flush():
+            if self.callback is not None:
+                self.callback(result)
+            elif result.error is not None:
+                warnings.warn("Notifying the hub %s failed: %s"
+                              % (result.hub, result.error))
+
+    def _send(self, pending):
+        results = []
+        thin_pings = collections.OrderedDict()
+        for feed in pending:
+            body = self._get_fat_ping_body(feed)
+            if body is None:
+                thin_pings.setdefault(feed.hub, []).append(feed.topic)
+                continue
+            headers = {
+                'Content-Type': 'application/rss+xml; charset=UTF-8',
+                'Link': '<%s>; rel="hub", <%s>; rel="self"'
+                        % (feed.hub, feed.topic),
+            }
+            results.append(self._post(feed.hub, [feed.topic], data=body,
+                                      headers=headers))
+        for hub, topics in thin_pings.items():
+            for i in range(0, len(topics), self.max_topics):
+                batch = topics[i:i + self.max_topics]
+                data = [('hub.mode', 'publish')] + \
+                    [('hub.url', topic) for topic in batch]
+                results.append(self._post(hub, batch, data=data))
+        return results
+
+    def _get_fat_ping_body(self, feed):
+        """Return the feed with only the changed episodes, or :obj:`None` if
+        an ordinary ping shall be sent."""
+        if not feed.guids:
+            return None
+        podcast = feed.podcast
+        episodes = [e for e in podcast._get_episodes_to_render()
+                    if _get_guid(e) in feed.guids]
+        if not episodes:
+            return None
+        page = _FeedPage(None, podcast.feed_url, episodes, [], False)
+        return b"".join(podcast._generate_rss_chunks(minimize=True,
+                                                     page=page))
+
+    def _post(self, hub, topics, **kwargs):
+        try:
+            r = self._requests.post(hub, timeout=10.0, **kwargs)
+        except Exception as e:
+            return PingResult(hub, topics, None, e)
+        error = None
+        if not 200 <= r.status_code < 300:
+            error = "The hub responded with %d %s" % (r.status_code,
+                                                      r.reason)
+        return PingResult(hub, topics, r.status_code, error)
@@ -16,6 +16,7 @@ setup(
         license = 'FreeBSD and LGPLv3+',
         install_requires = ['lxml', 'dateutils', 'future', 'pytz', 'tinytag',
                             'requests'],
+        extras_require = {'brotli': ['brotli']},
         classifiers = [
             'Development Status :: 5 - Production/Stable',
             'Intended Audience :: Developers',